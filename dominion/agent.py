@@ -1,9 +1,12 @@
+import math
 import random
-import inspect
-import six
-import cards
+import time
 
 import click
+import numpy as np
+
+from dominion import cards
+from dominion.strategy import STRATEGIES, BIG_MONEY_ULTIMATE
 
 
 class Agent(object):
@@ -14,16 +17,9 @@ class Agent(object):
 
         self.player = None
 
-        # This function collects the names of all the classes from the
-        # cards module, i.e. all the card names.
-        card_names = [m[0] for m in inspect.getmembers(cards, inspect.isclass)
-                      if m[1].__module__ == 'dominion.cards']
-
-        cards_base_dict = {}
-        for card_name in card_names:
-            cards_base_dict[card_name] = 0
-
-        self.cards_base_dict = cards_base_dict
+        # Card counts are keyed by card class name, in the order given
+        # by the card registry.
+        self.cards_base_dict = dict.fromkeys(cards.CARD_CLASS_NAMES, 0)
 
     def _get_game_state(self):
         '''Retrieve the game state and encode it. The game state consists
@@ -33,48 +29,27 @@ class Agent(object):
         2) The number of cards in each of the supply piles
         3) The player's current hand
 
-        Information is first encoded in dictionaries which count the
-        number of all cards for each part of the game state. The
-        dictionaries are then converted to lists and concatenated to get
-        a single list containing a bunch of numbers the represents the
-        current game state.
+        Each part is a vector of card counts indexed by card id, which
+        the game keeps up to date as cards move around, so encoding the
+        state only needs to concatenate them. Card ids follow the same
+        alphabetical order as _dict_to_list, so
+        `_list_to_dict(list(part))` recovers the counts for each card.
 
         Return:
-            game_state (list): A list which contains the encoded game
-            state.
+            game_state (numpy.ndarray): An array which contains the
+            encoded game state.
         '''
         assert self.player is not None, 'player object is not instantiated!'
 
-        deck = self.player.deck.draw_pile + self.player.deck.discard_pile + \
-            self.player.hand.hand
-        supply_piles = self.player.game.supply_piles.supply_piles
-        hand = self.player.hand.hand
-
-        deck_dict = self.cards_base_dict.copy()
-        supply_piles_dict = self.cards_base_dict.copy()
-        hand_dict = self.cards_base_dict.copy()
-
-        for card in deck:
-            deck_dict[card.name] += 1
-
-        for card_name, supply_pile in six.iteritems(supply_piles):
-            supply_piles_dict[card_name] = len(supply_pile)
-
-        for card in hand:
-            hand_dict[card.name] += 1
-
-        deck_list = self._dict_to_list(deck_dict)
-        supply_pile_list = self._dict_to_list(supply_piles_dict)
-        hand_list = self._dict_to_list(hand_dict)
-
-        game_state = deck_list + supply_pile_list + hand_list
-        return game_state
+        return np.concatenate((self.player.deck.count_vector,
+                               self.player.game.supply_piles.count_vector,
+                               self.player.hand.count_vector))
 
     def _dict_to_list(self, card_dict):
         '''Converts a dictionary of cards and their corresponding counts
-        to a list of the card counts. Cards are sorted in alphabetical
-        order so that each index always contains the count for the same
-        card.
+        to a list of the card counts. Cards are in the order of the card
+        registry (alphabetical), so that each index always contains the
+        count for the same card.
 
         Args:
             card_dict (dict): A dictionary where the keys are card names
@@ -89,7 +64,8 @@ class Agent(object):
             'should have one index for each possible card (even ' + \
             'those not included in this game)'
 
-        card_list = [value for (key, value) in sorted(card_dict.items())]
+        card_list = [card_dict[class_name]
+                     for class_name in cards.CARD_CLASS_NAMES]
         return card_list
 
     def _list_to_dict(self, card_list):
@@ -109,9 +85,7 @@ class Agent(object):
             'should have one index for each possible card (even ' + \
             'those not included in this game)'
 
-        card_dict = {}
-        for key, value in zip(sorted(self.cards_base_dict.keys()), card_list):
-            card_dict[key] = value
+        card_dict = dict(zip(cards.CARD_CLASS_NAMES, card_list))
         return card_dict
 
     def select_action(self, valid_actions):
@@ -217,10 +191,20 @@ class HMIAgent(Agent):
 
 
 class RandomAgent(Agent):
-    def __init__(self):
-        '''Agent that makes decisions randomly.'''
+    def __init__(self, rng=None):
+        '''Agent that makes decisions randomly.
+
+        Args:
+            rng (random.Random): Random number generator used to make
+            decisions. If None, the global random module is used.
+            Default: None.
+        '''
         super(RandomAgent, self).__init__()
 
+        if rng is None:
+            rng = random
+        self.rng = rng
+
     def select_action(self, valid_actions):
         '''Randomly select an action from the list of valid actions.
 
@@ -228,7 +212,7 @@ class RandomAgent(Agent):
             valid_actions (list): Contains the actions that can be
             played this turn.
         '''
-        selected_action = random.choice(valid_actions)
+        selected_action = self.rng.choice(valid_actions)
         return selected_action
 
     def select_buy(self, valid_buys):
@@ -238,7 +222,7 @@ class RandomAgent(Agent):
             valid_buys (list): Contains the cards that can be purchased
             this turn.
         '''
-        selected_buy = random.choice(valid_buys)
+        selected_buy = self.rng.choice(valid_buys)
         return selected_buy
 
     def select_gain(self, valid_gains):
@@ -247,7 +231,7 @@ class RandomAgent(Agent):
         Args:
             valid_gain (list): Contains the card that will be gained.
         '''
-        selected_gain = random.choice(valid_gains)
+        selected_gain = self.rng.choice(valid_gains)
         return selected_gain
 
     def select_discard(self, valid_discard):
@@ -256,7 +240,7 @@ class RandomAgent(Agent):
         Args:
             valid_discard (list): Contains the card that will be discarded.
         '''
-        selected_discard = random.choice(valid_discard)
+        selected_discard = self.rng.choice(valid_discard)
         return selected_discard
 
     def select_trash(self, valid_trash):
@@ -265,7 +249,7 @@ class RandomAgent(Agent):
         Args:
             valid_trash (list): Contains the card that will be trashed.
         '''
-        selected_trash = random.choice(valid_trash)
+        selected_trash = self.rng.choice(valid_trash)
         return selected_trash
 
     def select_shuffle(self, valid_options=['Yes', 'No']):
@@ -276,5 +260,550 @@ class RandomAgent(Agent):
             valid_options (list): Should always be a list containing
             'yes' and 'no'.
         '''
-        selected_shuffle = random.choice(valid_options)
+        selected_shuffle = self.rng.choice(valid_options)
         return selected_shuffle
+
+
+class BigMoneyAgent(Agent):
+    def __init__(self):
+        '''Agent that follows a fixed, fast strategy based on "Big
+        Money": buy Provinces, then Gold, then Silver, with Duchies once
+        the Provinces start to run out. Actions are played as they come,
+        those giving extra actions first. Used as the rollout policy of
+        MCTSAgent, and as a simple baseline opponent.'''
+        super(BigMoneyAgent, self).__init__()
+
+        self._turn = None
+        self._n_played = 0
+
+    def select_action(self, valid_actions):
+        '''Play the action card giving the most extra actions, then the
+        most expensive. Only ends the action phase when there is nothing
+        else to play, or when as many cards have been played this turn
+        as the player owns: played cards go straight to the discard pile,
+        so a deck of cards like Village could otherwise be reshuffled and
+        played forever.
+
+        Args:
+            valid_actions (list): Contains the actions that can be
+            played this turn.
+        '''
+        card_names = [name for name in valid_actions
+                      if name in cards.CARDS_BY_NAME]
+        if not card_names or not self._count_play():
+            return valid_actions[0]
+        return max(card_names, key=_action_priority)
+
+    def _count_play(self):
+        '''Count a card about to be played this turn.
+
+        Return:
+            can_play (bool): False if as many cards have already been
+            played this turn as the player owns, in which case the card
+            should not be played.
+        '''
+        game = self.player.game
+        if self._turn != game.n_turns:
+            self._turn = game.n_turns
+            self._n_played = 0
+
+        if self._n_played >= self.player.deck.n_cards:
+            return False
+        self._n_played += 1
+        return True
+
+    def select_buy(self, valid_buys):
+        '''Buy a Province if possible, otherwise Gold or Silver. Once
+        there are four or fewer Provinces left, Duchies are bought ahead
+        of Gold.
+
+        Args:
+            valid_buys (list): Contains the cards that can be purchased
+            this turn.
+        '''
+        if self.player.game.supply_piles.counts['Province'] <= 4:
+            priorities = ['Province', 'Duchy', 'Gold', 'Silver']
+        else:
+            priorities = ['Province', 'Gold', 'Silver']
+
+        for card_name in priorities:
+            if card_name in valid_buys:
+                return card_name
+        return 'end_buy_phase'
+
+    def select_gain(self, valid_gains):
+        '''Gain the most expensive card available, preferring Treasure
+        cards of the same cost.
+
+        Args:
+            valid_gains (list): Contains the cards that can be gained.
+        '''
+        return max(valid_gains, key=_gain_priority)
+
+    def select_discard(self, valid_discard):
+        '''Discard Curse and Victory cards first, then stop if allowed,
+        and otherwise discard the cheapest card.
+
+        Args:
+            valid_discard (list): Contains the cards that can be
+            discarded, and possibly an option to stop discarding or to
+            keep the card.
+        '''
+        return _select_cheapest(valid_discard,
+                                ['end_discard_phase', 'keep_card'])
+
+    def select_trash(self, valid_trash):
+        '''Trash Curses, Estates and Coppers, then stop if allowed, and
+        otherwise trash the cheapest card.
+
+        Args:
+            valid_trash (list): Contains the cards that can be trashed,
+            and possibly an option to stop trashing.
+        '''
+        for card_name in ['Curse', 'Estate', 'Copper']:
+            if card_name in valid_trash:
+                return card_name
+        return _select_cheapest(valid_trash, ['end_trash_phase'])
+
+    def select_shuffle(self, valid_options=['Yes', 'No']):
+        '''Never put the deck in the discard pile.
+
+        Args:
+            valid_options (list): Should always be a list containing
+            'yes' and 'no'.
+        '''
+        return valid_options[-1]
+
+
+def _action_priority(card_name):
+    '''Sort key for the action cards BigMoneyAgent plays.'''
+    info = cards.CARDS_BY_NAME[card_name]
+    return (info.effect.plus_actions, info.cost)
+
+
+def _gain_priority(card_name):
+    '''Sort key for the cards BigMoneyAgent gains.'''
+    info = cards.CARDS_BY_NAME.get(card_name)
+    if info is None:
+        return (-1, False)
+    return (info.cost, bool(info.flags & cards.TREASURE))
+
+
+def _select_cheapest(options, stop_options):
+    '''Select the first Curse or Victory card in options, otherwise an
+    option from stop_options if there is one, otherwise the cheapest
+    card.'''
+    card_names = [name for name in options if name in cards.CARDS_BY_NAME]
+    for card_name in card_names:
+        if cards.CARDS_BY_NAME[card_name].flags & (cards.VICTORY | cards.CURSE):
+            return card_name
+    for option in options:
+        if option in stop_options:
+            return option
+    if not card_names:
+        return options[0]
+    return min(card_names, key=lambda name: cards.CARDS_BY_NAME[name].cost)
+
+
+class RuleAgent(BigMoneyAgent):
+    def __init__(self, strategy=BIG_MONEY_ULTIMATE):
+        '''Agent that follows a scripted Strategy (see strategy.py): it
+        buys the card of the first buy rule which holds, and plays the
+        first action card in the strategy's action_priority which is in
+        its hand. Like BigMoneyAgent, it stops playing actions once it
+        has played as many cards this turn as it owns, and decisions
+        asked for while a card is resolving are made as by BigMoneyAgent.
+
+        The rules are compiled when the agent is created. For each number
+        of coins, a table gives the rules the player can afford. Each rule
+        comes with its conditions on the supply piles and on the cards
+        owned, as a closure, or None if it has none. Choosing a buy only
+        walks the rules for the player's coins, without interpreting
+        them. This makes the agent cheap enough to be the rollout policy
+        of MCTSAgent, e.g. with
+        rollout_agent=functools.partial(RuleAgent, SMITHY_BIG_MONEY).
+
+        Args:
+            strategy (Strategy or str): The strategy to follow, or the
+            name of one in STRATEGIES. Default: BIG_MONEY_ULTIMATE.
+        '''
+        super(RuleAgent, self).__init__()
+
+        if isinstance(strategy, str):
+            if strategy not in STRATEGIES:
+                raise ValueError('Unknown strategy: {}.'.format(strategy))
+            strategy = STRATEGIES[strategy]
+        self.strategy = strategy
+        self._buy_table = _compile_buy_table(strategy.buy_rules)
+        self._actions = _compile_action_priority(strategy.action_priority)
+
+    def select_action(self, valid_actions):
+        '''Play the first card in the strategy's action priority which
+        is in the hand.
+
+        Args:
+            valid_actions (list): Contains the actions that can be
+            played this turn.
+        '''
+        hand_counts = self.player.hand.count_vector
+        for card_name, card_id in self._actions:
+            if hand_counts[card_id] > 0:
+                if self._count_play():
+                    return card_name
+                break
+        return valid_actions[0]
+
+    def select_buy(self, valid_buys):
+        '''Buy the card of the first buy rule which holds, out of those
+        the player can afford, or stop buying if none do.
+
+        Args:
+            valid_buys (list): Contains the cards that can be purchased
+            this turn.
+        '''
+        buy_table = self._buy_table
+        coins = self.player.turn_state['coins']
+        rules = buy_table[min(coins, len(buy_table) - 1)]
+
+        supply_counts = self.player.game.supply_piles.counts
+        owned_counts = self.player.deck.count_vector
+        for card_name, condition in rules:
+            if supply_counts.get(card_name, 0) > 0 and \
+                    (condition is None or
+                     condition(supply_counts, owned_counts)):
+                return card_name
+        return valid_buys[0]
+
+
+def _compile_action_priority(action_priority):
+    '''Pair each card in a strategy's action priority with its card id,
+    checking that they are all action cards.'''
+    actions = []
+    for card_name in action_priority:
+        info = cards.CARDS_BY_NAME.get(card_name)
+        if info is None or not info.flags & cards.ACTION:
+            raise ValueError('Not an action card: {}.'.format(card_name))
+        actions.append((card_name, info.card_id))
+    return tuple(actions)
+
+
+def _compile_buy_table(buy_rules):
+    '''Compile a strategy's buy rules into a table of the rules which
+    can be used with each number of coins.
+
+    Args:
+        buy_rules (tuple): The strategy's BuyRules, in order of priority.
+
+    Return:
+        buy_table (tuple): Entry c holds the rules which need at most c
+        coins, in order, as (card name, condition) pairs (see
+        _compile_condition). The last entry is for that many coins or
+        more.
+    '''
+    min_coins = [max(rule.min_coins, cards.CARDS_BY_NAME[rule.card].cost)
+                 for rule in buy_rules]
+    compiled = [(rule.card, _compile_condition(rule)) for rule in buy_rules]
+
+    buy_table = []
+    for coins in range(max(min_coins + [0]) + 1):
+        buy_table.append(tuple(compiled[i] for i in range(len(compiled))
+                               if min_coins[i] <= coins))
+    return tuple(buy_table)
+
+
+def _compile_condition(rule):
+    '''Compile the conditions of a buy rule on the supply piles and on
+    the cards owned into a single function.
+
+    Args:
+        rule (BuyRule): The rule.
+
+    Return:
+        condition (function): Takes the supply pile counts (keyed by
+        card name) and the count vector of the cards owned, and returns
+        whether the rule holds. None if the rule has no conditions.
+    '''
+    pile = rule.pile
+    checks = []
+    if rule.min_left is not None:
+        min_left = rule.min_left
+        checks.append(lambda supply_counts, owned_counts:
+                      supply_counts.get(pile, 0) >= min_left)
+    if rule.max_left is not None:
+        max_left = rule.max_left
+        checks.append(lambda supply_counts, owned_counts:
+                      supply_counts.get(pile, 0) <= max_left)
+    if rule.max_owned is not None:
+        card_id = cards.CARDS_BY_NAME[rule.card].card_id
+        max_owned = rule.max_owned
+        checks.append(lambda supply_counts, owned_counts:
+                      owned_counts[card_id] < max_owned)
+
+    if not checks:
+        return None
+    condition = checks[0]
+    for check in checks[1:]:
+        condition = _both(condition, check)
+    return condition
+
+
+def _both(first, second):
+    '''Combine two conditions into one which holds when both do.'''
+    return lambda supply_counts, owned_counts: (
+        first(supply_counts, owned_counts) and
+        second(supply_counts, owned_counts))
+
+
+class MCTSAgent(Agent):
+    def __init__(self, n_rollouts=100, time_limit=None, exploration=1.4,
+                 max_rollout_turns=20, rollout_agent=BigMoneyAgent,
+                 rng=None):
+        '''Agent that makes each decision with a Monte Carlo tree search
+        over the options, using determinized rollouts.
+
+        For every rollout the game is cloned, and the information the
+        player can not see is re-dealt at random: each opponent's hand
+        and draw pile are shuffled together and their hand dealt again,
+        the player's own draw pile is shuffled, and the clone's random
+        number generator is reseeded. An option is chosen with the UCB1
+        rule, applied to the clone, and the game is then played on by
+        rollout agents for every player. The reward is based on the
+        player's share of the win and their lead in victory points (see
+        _rollout). The option with the highest mean reward is selected.
+
+        Action and buy decisions in the action and buy phases are
+        searched exactly. Decisions asked for while a card is resolving
+        are approximated: the option's own effect is applied to the
+        clone (the card chosen for Throne Room is played twice, the card
+        revealed by Spy is kept or discarded from the right player's
+        deck, and gains, discards, trashes and shuffles are made), and
+        the rest of the card's effect is skipped.
+
+        Args:
+            n_rollouts (int): Number of rollouts per decision, used if
+            time_limit is None. Default: 100.
+            time_limit (float): Number of seconds to spend on each
+            decision. At least one rollout is always played. Default:
+            None.
+            exploration (float): The exploration constant of UCB1.
+            Default: 1.4.
+            max_rollout_turns (int): Rollouts stop after this many turns
+            (over all players), and are then scored on the victory
+            points so far. None plays rollouts to the end of the game.
+            Default: 20.
+            rollout_agent (callable): Returns a new agent to play a seat
+            in a rollout, e.g. a RuleAgent for a strategy. Default:
+            BigMoneyAgent.
+            rng (random.Random): Random number generator used to seed
+            the determinizations. If None, the global random module is
+            used. Default: None.
+        '''
+        super(MCTSAgent, self).__init__()
+
+        if rng is None:
+            rng = random
+        self.n_rollouts = n_rollouts
+        self.time_limit = time_limit
+        self.exploration = exploration
+        self.max_rollout_turns = max_rollout_turns
+        self.rollout_agent = rollout_agent
+        self.rng = rng
+
+    def select_action(self, valid_actions):
+        # Throne Room offers 'no_action' instead of ending the phase
+        if valid_actions[0] == 'no_action':
+            return self._search('throne_room', valid_actions)
+        return self._search('action', valid_actions)
+
+    def select_buy(self, valid_buys):
+        return self._search('buy', valid_buys)
+
+    def select_gain(self, valid_gains):
+        return self._search('gain', valid_gains)
+
+    def select_discard(self, valid_discard):
+        return self._search('discard', valid_discard)
+
+    def select_trash(self, valid_trash):
+        return self._search('trash', valid_trash)
+
+    def select_shuffle(self, valid_options=['Yes', 'No']):
+        return self._search('shuffle', valid_options)
+
+    def _search(self, kind, options):
+        '''Run the search for one decision.
+
+        Args:
+            kind (str): The kind of decision, e.g. 'action' or 'buy', or
+            'throne_room' for the card to play with Throne Room.
+            options (list): The options to choose from.
+
+        Return:
+            selection (str): The option with the highest mean reward.
+        '''
+        if len(options) == 1:
+            return options[0]
+
+        n_options = len(options)
+        n_visits = [0] * n_options
+        total_reward = [0.0] * n_options
+        # The j-th rollout of every option is played in the same
+        # determinized world, so that options are compared on equal terms.
+        world_seeds = []
+        if self.time_limit is not None:
+            deadline = time.time() + self.time_limit
+
+        n = 0
+        while True:
+            if self.time_limit is None:
+                if n >= self.n_rollouts:
+                    break
+            elif n > 0 and time.time() >= deadline:
+                break
+
+            if n < n_options:
+                # Try every option once before using UCB1
+                i = n
+            else:
+                log_n = math.log(n)
+                i = max(range(n_options),
+                        key=lambda i: total_reward[i] / n_visits[i] +
+                        self.exploration * math.sqrt(log_n / n_visits[i]))
+
+            if n_visits[i] == len(world_seeds):
+                world_seeds.append(self.rng.random())
+            world_rng = random.Random(world_seeds[n_visits[i]])
+            total_reward[i] += self._rollout(kind, options[i], world_rng)
+            n_visits[i] += 1
+            n += 1
+
+        best = max((i for i in range(n_options) if n_visits[i] > 0),
+                   key=lambda i: total_reward[i] / n_visits[i])
+        return options[best]
+
+    def _rollout(self, kind, option, world_rng):
+        '''Play out one determinized rollout after choosing option.
+
+        Args:
+            kind (str): The kind of decision, as for _search.
+            option (str): The option chosen.
+            world_rng (random.Random): Random number generator used to
+            determinize the game and play out the rollout.
+
+        Return:
+            reward (float): Between 0 and 1. Half is the player's share
+            of the win at the end of the rollout (1 for a win, 1/k for a
+            k-way tie, 0 for a loss), and half is a logistic function of
+            their lead over the best opponent, which tells options apart
+            even when the rollouts are too short to decide the game.
+        '''
+        game = self.player.game
+        seat = game.players.index(self.player)
+        agents = dict((player.player_id, self.rollout_agent())
+                      for player in game.players)
+        rollout_game = game.clone(agents)
+
+        # A card revealed from the top of a deck is known, so it stays
+        # there when the clone is determinized
+        target = None
+        if game.decision is not None and game.decision.target is not None:
+            target = game.players.index(game.decision.target)
+        self._determinize(rollout_game, seat, world_rng, revealed=target)
+        if target is not None:
+            target = rollout_game.players[target]
+
+        self._apply_option(rollout_game, rollout_game.players[seat], kind,
+                           option, target=target)
+
+        if self.max_rollout_turns is None:
+            rollout_game.play_game()
+        else:
+            rollout_game.play_game(
+                max_turns=rollout_game.n_turns + self.max_rollout_turns)
+
+        scores = [player.victory_points for player in rollout_game.players]
+        best_score = max(scores)
+        if scores[seat] < best_score:
+            win_share = 0.0
+        else:
+            win_share = 1.0 / scores.count(best_score)
+
+        margin = scores[seat] - max(scores[:seat] + scores[seat + 1:])
+        return 0.5 * win_share + 0.5 / (1.0 + math.exp(-margin / 10.0))
+
+    def _determinize(self, game, seat, rng, revealed=None):
+        '''Re-deal the hidden information in a clone of the game.
+
+        Args:
+            game (Game): The clone.
+            seat (int): The position of this agent's player.
+            rng (random.Random): Random number generator used to re-deal
+            the cards and reseed the clone.
+            revealed (int): The position of a player the top card of
+            whose draw pile has been revealed, and so is left in place.
+            Default: None.
+        '''
+        for i, player in enumerate(game.players):
+            draw_pile = player.deck.draw_pile
+            top_card = None
+            if i == revealed and draw_pile:
+                top_card = draw_pile.pop()
+            if i == seat:
+                rng.shuffle(draw_pile)
+            else:
+                n_hand = len(player.hand.hand)
+                unseen = draw_pile + player.hand.hand
+                rng.shuffle(unseen)
+                player.hand.set_cards(unseen[:n_hand])
+                draw_pile[:] = unseen[n_hand:]
+            if top_card is not None:
+                draw_pile.append(top_card)
+        game.rng.seed(rng.random())
+
+    def _apply_option(self, game, player, kind, option, target=None):
+        '''Apply an option for one of the player's decisions to a clone
+        of the game.
+
+        Args:
+            game (Game): The clone.
+            player (Player): The clone's copy of this agent's player.
+            kind (str): The kind of decision, as for _search.
+            option (str): The option chosen.
+            target (Player): The clone's copy of the player whose top
+            card the decision is about (see Decision), if any. Default:
+            None.
+        '''
+        if kind in ('action', 'buy'):
+            if game.phase == kind:
+                game.apply_decision(option)
+                game.clear_undo_log()
+        elif kind == 'throne_room':
+            # The Throne Room has already left the hand. The chosen card
+            # is played twice, then the Throne Room uses up its action.
+            if option != 'no_action':
+                card = player.hand.find_card(option)
+                if card is not None:
+                    player.hand.discard_card(card)
+                    for _ in range(2):
+                        game.run_steps(game._resolve_effect(player, card))
+            player.turn_state['actions'] -= 1
+        elif kind == 'discard' and target is not None:
+            # Spy: keeping a card on top of an opponent's deck means
+            # discarding it, as in Spy.special_ability
+            if (option == 'keep_card') != (target is player):
+                target.deck.discard_top_card()
+        elif kind == 'gain':
+            card = game.supply_piles.take(option)
+            if card is not None:
+                player.deck.gain_card(card)
+        elif kind == 'discard':
+            card = player.hand.find_card(option)
+            if card is not None:
+                player.hand.discard_card(card)
+        elif kind == 'trash':
+            card = player.hand.find_card(option)
+            if card is not None:
+                player.hand.trash_card(card)
+        elif kind == 'shuffle':
+            if option == 'Yes':
+                player.deck.shuffle_deck()
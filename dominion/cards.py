@@ -1,10 +1,40 @@
-import six
+import collections
+
+
+class Decision(collections.namedtuple('Decision',
+                                      ['player', 'kind', 'options', 'target'],
+                                      defaults=(None,))):
+    '''A request for a player to make a decision, yielded by the game
+    engine's steps (see Game.play_game_steps). The option selected is
+    sent back into the steps.
+
+    Args:
+        player (instance): The player who makes the decision.
+        kind (str): The kind of decision: 'action', 'buy', 'gain',
+        'discard', 'trash' or 'shuffle'. Each kind is made by the
+        agent's select_<kind> method.
+        options (list): The options to select from.
+        target (instance): For a decision about the card on top of a
+        player's deck (e.g. one revealed by Spy), that player. Default:
+        None.
+    '''
+    __slots__ = ()
+
+    def ask_agent(self):
+        '''Ask the player's agent to make the decision.
+
+        Return:
+            selection (str): The option selected by the agent.
+        '''
+        return getattr(self.player.agent, 'select_' + self.kind)(self.options)
 
 
 def gain_card(player, supply_piles, cost_limit=99, valid_gains=None,
               destination='discard_pile'):
     '''The player gets to gain a card for free, as long as there are
-    enough left, and it is below the cost limit.
+    enough left, and it is below the cost limit. Like the other helpers
+    which ask the player to choose, this is a generator which yields the
+    Decision (use `yield from`).
 
     Args:
         player (instance): The player who gets the free card.
@@ -12,44 +42,33 @@ def gain_card(player, supply_piles, cost_limit=99, valid_gains=None,
         will be taken.
         cost_limit (int): The maximum allowed cost of the free card. If
         not specified, then there is (effectively) no limit. Default: 99.
-        valid_gains (list): List of card names that can be gained. If
-        None, all cards in the player's hand are valid. Default: None.
+        valid_gains (list): List of card names that can be gained, if
+        they are available within the cost limit. If None, all cards in
+        the supply piles are valid. Default: None.
         destination (str): Where the gained card will be placed. Options
         are 'discard_pile' and 'hand'. Default: 'discard_pile'.
     '''
     assert destination in ['discard_pile', 'hand'], 'destination must be \
         either "discard_pile" or "hand"'
 
+    available = supply_piles.available_cards(cost_limit)
     if valid_gains is None:
-        valid_gains = []
-        for card_name, supply_pile in six.iteritems(supply_piles):
-            if len(supply_pile) > 0:
-                card = supply_pile[0]
-                if card.cost <= cost_limit:
-                    valid_gains.append(card.name)
+        valid_gains = list(available)
     else:
-        for card_name, supply_pile in six.iteritems(supply_piles):
-            if card_name in valid_gains:
-                if len(supply_pile) == 0:
-                    valid_gains.remove(card_name)
-                else:
-                    card = supply_pile[0]
-                    if card.cost > cost_limit:
-                        valid_gains.remove(card_name)
-
-    selected_gain = player.agent.select_gain(valid_gains=valid_gains)
-
-    for card_name, supply_pile in six.iteritems(supply_piles):
-        if len(supply_pile) > 0:
-            card = supply_pile[0]
-            if card.name == selected_gain:
-                supply_piles[card_name].remove(card)
-
-                if destination == 'discard_pile':
-                    player.deck.discard_pile.append(card)
-                elif destination == 'hand':
-                    player.hand.hand.append(card)
-                break
+        valid_gains = [card_name for card_name in available
+                       if card_name in valid_gains]
+
+    if len(valid_gains) == 0:
+        return
+
+    selected_gain = yield Decision(player, 'gain', valid_gains)
+
+    card = supply_piles.take(selected_gain)
+    if card is not None:
+        if destination == 'discard_pile':
+            player.deck.gain_card(card)
+        elif destination == 'hand':
+            player.hand.gain_card(card)
 
 
 def discard_card(player, valid_discard=None, optional=False):
@@ -64,24 +83,19 @@ def discard_card(player, valid_discard=None, optional=False):
         not discard a card.
     '''
     if valid_discard is None:
-        valid_discard = []
-        for card in player.hand.hand:
-            if card.name not in valid_discard:
-                valid_discard.append(card.name)
+        valid_discard = [card.name for card in player.hand.card_counts]
 
     if optional:
         valid_discard.insert(0, 'end_discard_phase')
 
-    selected_discard = player.agent.select_discard(valid_discard=valid_discard)
+    selected_discard = yield Decision(player, 'discard', valid_discard)
 
     if selected_discard == 'end_discard_phase':
         return 'end_discard_phase'
 
-    for card in player.hand.hand:
-        if card.name == selected_discard:
-            player.hand.hand.remove(card)
-            player.deck.discard_pile.append(card)
-            break
+    card = player.hand.find_card(selected_discard)
+    if card is not None:
+        player.hand.discard_card(card)
 
     return card
 
@@ -100,23 +114,19 @@ def trash_card(player, valid_trash=None, optional=False):
         card (instance): The card that was trashed.
     '''
     if valid_trash is None:
-        valid_trash = []
-        for card in player.hand.hand:
-            if card.name not in valid_trash:
-                valid_trash.append(card.name)
+        valid_trash = [card.name for card in player.hand.card_counts]
 
     if optional:
         valid_trash.insert(0, 'end_trash_phase')
 
-    selected_trash = player.agent.select_trash(valid_trash=valid_trash)
+    selected_trash = yield Decision(player, 'trash', valid_trash)
 
     if selected_trash == 'end_trash_phase':
         return 'end_trash_phase'
 
-    for card in player.hand.hand:
-        if card.name == selected_trash:
-            player.hand.hand.remove(card)
-            break
+    card = player.hand.find_card(selected_trash)
+    if card is not None:
+        player.hand.trash_card(card)
 
     return card
 
@@ -132,82 +142,115 @@ def successful_attack(player):
         successful_attack (bool): True if the attack is successful,
         False if the atack fails.
     '''
-    for card in player.hand.hand:
-        if card.name == 'Moat':
+    for card in player.hand.card_counts:
+        if card.flags & REACTION:
             return False
     return True
 
 
-class Copper(object):
-    def __init__(self):
-        self.name = 'Copper'
-        self.cost = 0
-        self.card_type = 'Treasure'
-        self.card_subtype = None
-        self.coins = 1
-
-
-class Silver(object):
-    def __init__(self):
-        self.name = 'Silver'
-        self.cost = 3
-        self.card_type = 'Treasure'
-        self.card_subtype = None
-        self.coins = 2
-
-
-class Gold(object):
-    def __init__(self):
-        self.name = 'Gold'
-        self.cost = 6
-        self.card_type = 'Treasure'
-        self.card_subtype = None
-        self.coins = 3
-
-
-class Estate(object):
-    def __init__(self):
-        self.name = 'Estate'
-        self.cost = 2
-        self.card_type = 'Victory'
-        self.card_subtype = None
-        self.victory_points = 1
-
-
-class Duchy(object):
-    def __init__(self):
-        self.name = 'Duchy'
-        self.cost = 5
-        self.card_type = 'Victory'
-        self.card_subtype = None
-        self.victory_points = 3
-
-
-class Province(object):
-    def __init__(self):
-        self.name = 'Province'
-        self.cost = 8
-        self.card_type = 'Victory'
-        self.card_subtype = None
-        self.victory_points = 6
-
-
-class Curse(object):
-    def __init__(self):
-        self.name = 'Curse'
-        self.cost = 0
-        self.card_type = 'Curse'
-        self.card_subtype = None
-        self.victory_points = -1
-
-
-class Cellar(object):
-    def __init__(self):
-        self.name = 'Cellar'
-        self.cost = 2
-        self.card_type = 'Action'
-        self.card_subtype = None
-        self.plus_actions = 1
+class Card(object):
+    '''Base class for all cards. Every copy of a card is identical, so
+    each card class has a single shared instance: creating a card, e.g.
+    `Copper()`, always returns the same object. Card properties are class
+    attributes, and instances have no attributes of their own, so cards
+    cannot be modified.
+
+    `card_id`, `flags` (the card type bit flags) and `effect` (what
+    happens when the card is played) are filled in from the card registry
+    when this module is imported.
+    '''
+    __slots__ = ()
+
+    card_id = None
+    flags = 0
+    effect = None
+
+    def __new__(cls):
+        instance = cls.__dict__.get('_instance')
+        if instance is None:
+            instance = super(Card, cls).__new__(cls)
+            cls._instance = instance
+        return instance
+
+
+class Copper(Card):
+    __slots__ = ()
+
+    name = 'Copper'
+    cost = 0
+    card_type = 'Treasure'
+    card_subtype = None
+    coins = 1
+
+
+class Silver(Card):
+    __slots__ = ()
+
+    name = 'Silver'
+    cost = 3
+    card_type = 'Treasure'
+    card_subtype = None
+    coins = 2
+
+
+class Gold(Card):
+    __slots__ = ()
+
+    name = 'Gold'
+    cost = 6
+    card_type = 'Treasure'
+    card_subtype = None
+    coins = 3
+
+
+class Estate(Card):
+    __slots__ = ()
+
+    name = 'Estate'
+    cost = 2
+    card_type = 'Victory'
+    card_subtype = None
+    victory_points = 1
+
+
+class Duchy(Card):
+    __slots__ = ()
+
+    name = 'Duchy'
+    cost = 5
+    card_type = 'Victory'
+    card_subtype = None
+    victory_points = 3
+
+
+class Province(Card):
+    __slots__ = ()
+
+    name = 'Province'
+    cost = 8
+    card_type = 'Victory'
+    card_subtype = None
+    victory_points = 6
+
+
+class Curse(Card):
+    __slots__ = ()
+
+    name = 'Curse'
+    cost = 0
+    card_type = 'Curse'
+    card_subtype = None
+    victory_points = -1
+
+
+class Cellar(Card):
+    __slots__ = ()
+
+    name = 'Cellar'
+    cost = 2
+    card_type = 'Action'
+    card_subtype = None
+    plus_actions = 1
 
     def special_ability(self, game, player):
         '''Player discards any number of cards, then draws that many.
@@ -220,20 +263,21 @@ class Cellar(object):
         n = 0
 
         while discarded_card != 'end_discard_phase':
-            discarded_card = discard_card(player=player, optional=True)
+            discarded_card = yield from discard_card(player=player,
+                                                     optional=True)
             if discarded_card != 'end_discard_phase':
                 n += 1
 
-        for i in range(n):
-            player.hand.draw_card()
+        player.hand.draw_cards(n)
 
 
-class Chapel(object):
-    def __init__(self):
-        self.name = 'Chapel'
-        self.cost = 2
-        self.card_type = 'Action'
-        self.card_subtype = None
+class Chapel(Card):
+    __slots__ = ()
+
+    name = 'Chapel'
+    cost = 2
+    card_type = 'Action'
+    card_subtype = None
 
     def special_ability(self, game, player):
         '''Player can trash up to 4 cards, as long as they have that
@@ -244,28 +288,31 @@ class Chapel(object):
             player (instance): The player who played the card
         '''
         for i in range(4):
-            trashed_card = trash_card(player=player, optional=True)
+            trashed_card = yield from trash_card(player=player,
+                                                 optional=True)
 
             if trashed_card == 'end_trash_phase':
                 break
 
 
-class Moat(object):
-    def __init__(self):
-        self.name = 'Moat'
-        self.cost = 2
-        self.card_type = 'Action'
-        self.card_subtype = 'Reaction'
-        self.plus_cards = 2
+class Moat(Card):
+    __slots__ = ()
+
+    name = 'Moat'
+    cost = 2
+    card_type = 'Action'
+    card_subtype = 'Reaction'
+    plus_cards = 2
+
 
+class Chancellor(Card):
+    __slots__ = ()
 
-class Chancellor(object):
-    def __init__(self):
-        self.name = 'Chancellor'
-        self.cost = 3
-        self.card_type = 'Action'
-        self.card_subtype = None
-        self.coins = 2
+    name = 'Chancellor'
+    cost = 3
+    card_type = 'Action'
+    card_subtype = None
+    coins = 2
 
     def special_ability(self, game, player):
         '''Player may immediately put their deck into their discard pile.
@@ -274,37 +321,40 @@ class Chancellor(object):
             game (instance): The current game.
             player (instance): The player who played the card.
         '''
-        selected_shuffle = player.agent.select_shuffle()
+        selected_shuffle = yield Decision(player, 'shuffle', ['Yes', 'No'])
         if selected_shuffle == 'Yes':
             player.deck.shuffle_deck()
 
 
-class Village(object):
-    def __init__(self):
-        self.name = 'Village'
-        self.cost = 3
-        self.card_type = 'Action'
-        self.card_subtype = None
-        self.plus_cards = 1
-        self.plus_actions = 2
+class Village(Card):
+    __slots__ = ()
+
+    name = 'Village'
+    cost = 3
+    card_type = 'Action'
+    card_subtype = None
+    plus_cards = 1
+    plus_actions = 2
+
+
+class Woodcutter(Card):
+    __slots__ = ()
 
+    name = 'Woodcutter'
+    cost = 3
+    card_type = 'Action'
+    card_subtype = None
+    plus_buys = 1
+    coins = 2
 
-class Woodcutter(object):
-    def __init__(self):
-        self.name = 'Woodcutter'
-        self.cost = 3
-        self.card_type = 'Action'
-        self.card_subtype = None
-        self.plus_buys = 1
-        self.coins = 2
 
+class Workshop(Card):
+    __slots__ = ()
 
-class Workshop(object):
-    def __init__(self):
-        self.name = 'Workshop'
-        self.cost = 3
-        self.card_type = 'Action'
-        self.card_subtype = None
+    name = 'Workshop'
+    cost = 3
+    card_type = 'Action'
+    card_subtype = None
 
     def special_ability(self, game, player):
         '''Player gains a card worth up to 4 coins.
@@ -313,16 +363,17 @@ class Workshop(object):
             game (instance): The current game.
             player (instance): The player who played the card.
         '''
-        gain_card(player=player, supply_piles=game.supply_piles.supply_piles,
-                  cost_limit=4)
+        yield from gain_card(player=player, supply_piles=game.supply_piles,
+                             cost_limit=4)
 
 
-class Bureaucrat(object):
-    def __init__(self):
-        self.name = 'Bureaucrat'
-        self.cost = 4
-        self.card_type = 'Action'
-        self.card_subtype = 'Attack'
+class Bureaucrat(Card):
+    __slots__ = ()
+
+    name = 'Bureaucrat'
+    cost = 4
+    card_type = 'Action'
+    card_subtype = 'Attack'
 
     def special_ability(self, game, player_who_played_the_card):
         '''Player gains a Silver on the top of their deck. Each other
@@ -333,27 +384,27 @@ class Bureaucrat(object):
             game (instance): The current game.
             player (instance): The player who played the card.
         '''
-        silver_pile = game.supply_piles.supply_piles['Silver']
-        if len(silver_pile) > 0:
-            silver_card = silver_pile.pop(0)
-            player_who_played_the_card.deck.draw_pile.insert(0, silver_card)
+        silver_card = game.supply_piles.take('Silver')
+        if silver_card is not None:
+            player_who_played_the_card.deck.gain_card(
+                silver_card, destination='draw_pile')
 
         for player in game.players:
             if player is not player_who_played_the_card:
                 if successful_attack(player=player):
-                    for card in player.hand.hand:
-                        if card.card_type == 'Victory':
-                            player.hand.hand.remove(card)
-                            player.deck.draw_pile.insert(0, card)
+                    for card in player.hand.card_counts:
+                        if card.flags & VICTORY:
+                            player.hand.top_deck_card(card)
                             break
 
 
-class Feast(object):
-    def __init__(self):
-        self.name = 'Feast'
-        self.cost = 4
-        self.card_type = 'Action'
-        self.card_subtype = None
+class Feast(Card):
+    __slots__ = ()
+
+    name = 'Feast'
+    cost = 4
+    card_type = 'Action'
+    card_subtype = None
 
     def special_ability(self, game, player):
         '''Player gains a card worth up to 5 coins, and the Feast card
@@ -363,31 +414,31 @@ class Feast(object):
             game (instance): The current game.
             player (instance): The player who played the card
         '''
-        gain_card(player=player, supply_piles=game.supply_piles.supply_piles,
-                  cost_limit=5)
-        try:
-            player.deck.discard_pile.remove(self)
-        except ValueError:
-            # Thrown if a Throne Room is used on the Feast, since it
-            # cannot be removed from the deck twice. Just do nothing.
-            pass
+        yield from gain_card(player=player, supply_piles=game.supply_piles,
+                             cost_limit=5)
+        # Nothing is trashed if a Throne Room is used on the Feast, since
+        # it cannot be removed from the deck twice.
+        player.deck.trash_card(self)
+
+
+class Gardens(Card):
+    __slots__ = ()
 
+    name = 'Gardens'
+    cost = 4
+    card_type = 'Victory'
+    card_subtype = None
+    victory_points = 0
 
-class Gardens(object):
-    def __init__(self):
-        self.name = 'Gardens'
-        self.cost = 4
-        self.card_type = 'Victory'
-        self.card_subtype = None
 
+class Militia(Card):
+    __slots__ = ()
 
-class Militia(object):
-    def __init__(self):
-        self.name = 'Militia'
-        self.cost = 4
-        self.card_type = 'Action'
-        self.card_subtype = 'Attack'
-        self.coins = 2
+    name = 'Militia'
+    cost = 4
+    card_type = 'Action'
+    card_subtype = 'Attack'
+    coins = 2
 
     def special_ability(self, game, player_who_played_the_card):
         '''Each other player discards down to 3 cards, unless they have
@@ -401,15 +452,17 @@ class Militia(object):
             if player is not player_who_played_the_card:
                 if successful_attack(player=player):
                     while len(player.hand.hand) > 3:
-                        discard_card(player=player, optional=False)
+                        yield from discard_card(player=player,
+                                                optional=False)
 
 
-class Moneylender(object):
-    def __init__(self):
-        self.name = 'Moneylender'
-        self.cost = 4
-        self.card_type = 'Action'
-        self.card_subtype = None
+class Moneylender(Card):
+    __slots__ = ()
+
+    name = 'Moneylender'
+    cost = 4
+    card_type = 'Action'
+    card_subtype = None
 
     def special_ability(self, game, player):
         '''Player may trash a copper to gain 3 coins. It is assumed that
@@ -420,19 +473,19 @@ class Moneylender(object):
             game (instance): The current game.
             player (instance): The player who played the card
         '''
-        for card in player.hand.hand:
-            if card.name == 'Copper':
-                player.hand.hand.remove(card)
-                player.turn_state['coins'] += 3
-                break
+        copper = Copper()
+        if copper in player.hand.card_counts:
+            player.hand.trash_card(copper)
+            player.turn_state['coins'] += 3
+
 
+class Remodel(Card):
+    __slots__ = ()
 
-class Remodel(object):
-    def __init__(self):
-        self.name = 'Remodel'
-        self.cost = 4
-        self.card_type = 'Action'
-        self.card_subtype = None
+    name = 'Remodel'
+    cost = 4
+    card_type = 'Action'
+    card_subtype = None
 
     def special_ability(self, game, player):
         '''Players trashes a card, and then gains a card worth up to 2
@@ -443,29 +496,32 @@ class Remodel(object):
             player (instance): The player who played the card
         '''
         if len(player.hand.hand) > 0:
-            trashed_card = trash_card(player=player)
+            trashed_card = yield from trash_card(player=player)
             cost_limit = trashed_card.cost + 2
-            gain_card(player=player, supply_piles=game.supply_piles.supply_piles,
-                      cost_limit=cost_limit)
+            yield from gain_card(player=player,
+                                 supply_piles=game.supply_piles,
+                                 cost_limit=cost_limit)
+
+
+class Smithy(Card):
+    __slots__ = ()
 
+    name = 'Smithy'
+    cost = 4
+    card_type = 'Action'
+    card_subtype = None
+    plus_cards = 3
 
-class Smithy(object):
-    def __init__(self):
-        self.name = 'Smithy'
-        self.cost = 4
-        self.card_type = 'Action'
-        self.card_subtype = None
-        self.plus_cards = 3
 
+class Spy(Card):
+    __slots__ = ()
 
-class Spy(object):
-    def __init__(self):
-        self.name = 'Spy'
-        self.cost = 4
-        self.card_type = 'Action'
-        self.card_subtype = 'Attack'
-        self.plus_cards = 1
-        self.plus_actions = 1
+    name = 'Spy'
+    cost = 4
+    card_type = 'Action'
+    card_subtype = 'Attack'
+    plus_cards = 1
+    plus_actions = 1
 
     def special_ability(self, game, player_who_played_the_card):
         '''Each player reveals the top card of their deck. The player
@@ -487,37 +543,40 @@ class Spy(object):
                         player.deck.shuffle_deck()
 
                     if len(player.deck.draw_pile) > 0:
-                        card = player.deck.draw_pile[0]
+                        card = player.deck.draw_pile[-1]
                         valid_discard = ['keep_card', card.name]
-                        selected_discard = player_who_played_the_card.agent.select_discard(valid_discard)
+                        selected_discard = yield Decision(
+                            player_who_played_the_card, 'discard',
+                            valid_discard, target=player)
 
                         if selected_discard == 'keep_card':
                             # If we would want to keep the card if it was
                             # ours, that probably means we would want to
                             # discard it if it were our opponents
-                            player.deck.draw_pile.remove(card)
-                            player.deck.discard_pile.append(card)
+                            player.deck.discard_top_card()
 
             else:
                 if len(player_who_played_the_card.deck.draw_pile) == 0:
                     player_who_played_the_card.deck.shuffle_deck()
 
                 if len(player_who_played_the_card.deck.draw_pile) > 0:
-                    card = player_who_played_the_card.deck.draw_pile[0]
+                    card = player_who_played_the_card.deck.draw_pile[-1]
                     valid_discard = ['keep_card', card.name]
-                    selected_discard = player_who_played_the_card.agent.select_discard(valid_discard)
+                    selected_discard = yield Decision(
+                        player_who_played_the_card, 'discard', valid_discard,
+                        target=player_who_played_the_card)
 
                     if selected_discard != 'keep_card':
-                        player_who_played_the_card.deck.draw_pile.remove(card)
-                        player_who_played_the_card.deck.discard_pile.append(card)
+                        player_who_played_the_card.deck.discard_top_card()
 
 
-class Thief(object):
-    def __init__(self):
-        self.name = 'Thief'
-        self.cost = 4
-        self.card_type = 'Action'
-        self.card_subtype = 'Attack'
+class Thief(Card):
+    __slots__ = ()
+
+    name = 'Thief'
+    cost = 4
+    card_type = 'Action'
+    card_subtype = 'Attack'
 
     def special_ability(self, game, player_who_played_the_card):
         '''Each other player reveals the top 2 cards of their deck. If
@@ -538,12 +597,13 @@ class Thief(object):
                     pass
 
 
-class ThroneRoom(object):
-    def __init__(self):
-        self.name = 'Throne Room'
-        self.cost = 4
-        self.card_type = 'Action'
-        self.card_subtype = None
+class ThroneRoom(Card):
+    __slots__ = ()
+
+    name = 'Throne Room'
+    cost = 4
+    card_type = 'Action'
+    card_subtype = None
 
     def special_ability(self, game, player):
         '''Player can play an action card from their hand twice.
@@ -555,45 +615,33 @@ class ThroneRoom(object):
 
         # Change the text of the first valid action to distinguish
         # between throne room and the actual action phase
-        valid_actions = game._get_valid_actions(player.hand.hand)
+        valid_actions = game._get_valid_actions(player.hand)
         valid_actions[0] = 'no_action'
 
-        selected_action = player.agent.select_action(valid_actions)
+        selected_action = yield Decision(player, 'action', valid_actions)
 
         if selected_action == 'no_action':
             pass
         else:
-            for card in player.hand.hand:
-                if card.name == selected_action:
-                    # Remove the card from the hand first so that the player cannot
-                    # choose to discard or trash it after they have already played it
-                    player.hand.hand.remove(card)
-                    player.deck.discard_pile.append(card)
-
-                    for repeats in range(2):
-                        if hasattr(card, 'plus_cards'):
-                            for i in range(card.plus_cards):
-                                player.hand.draw_card()
-                        if hasattr(card, 'plus_actions'):
-                            player.turn_state['actions'] += card.plus_actions
-                        if hasattr(card, 'plus_buys'):
-                            player.turn_state['buys'] += card.plus_buys
-                        if hasattr(card, 'coins'):
-                            player.turn_state['coins'] += card.coins
-                        if hasattr(card, 'special_ability'):
-                            card.special_ability(game, player)
-
-                    break
-
-
-class CouncilRoom(object):
-    def __init__(self):
-        self.name = 'Council Room'
-        self.cost = 5
-        self.card_type = 'Action'
-        self.card_subtype = None
-        self.plus_cards = 4
-        self.plus_buys = 1
+            card = player.hand.find_card(selected_action)
+            if card is not None:
+                # Remove the card from the hand first so that the player cannot
+                # choose to discard or trash it after they have already played it
+                player.hand.discard_card(card)
+
+                for repeats in range(2):
+                    yield from game._resolve_effect(player, card)
+
+
+class CouncilRoom(Card):
+    __slots__ = ()
+
+    name = 'Council Room'
+    cost = 5
+    card_type = 'Action'
+    card_subtype = None
+    plus_cards = 4
+    plus_buys = 1
 
     def special_ability(self, game, player_who_played_the_card):
         '''Each other player draws a card.
@@ -608,33 +656,36 @@ class CouncilRoom(object):
                 player.hand.draw_card()
 
 
-class Festival(object):
-    def __init__(self):
-        self.name = 'Festival'
-        self.cost = 5
-        self.card_type = 'Action'
-        self.card_subtype = None
-        self.plus_actions = 2
-        self.plus_buys = 1
-        self.coins = 2
+class Festival(Card):
+    __slots__ = ()
+
+    name = 'Festival'
+    cost = 5
+    card_type = 'Action'
+    card_subtype = None
+    plus_actions = 2
+    plus_buys = 1
+    coins = 2
+
 
+class Laboratory(Card):
+    __slots__ = ()
 
-class Laboratory(object):
-    def __init__(self):
-        self.name = 'Laboratory'
-        self.cost = 5
-        self.card_type = 'Action'
-        self.card_subtype = None
-        self.plus_cards = 2
-        self.plus_actions = 1
+    name = 'Laboratory'
+    cost = 5
+    card_type = 'Action'
+    card_subtype = None
+    plus_cards = 2
+    plus_actions = 1
 
 
-class Library(object):
-    def __init__(self):
-        self.name = 'Library'
-        self.cost = 5
-        self.card_type = 'Action'
-        self.card_subtype = None
+class Library(Card):
+    __slots__ = ()
+
+    name = 'Library'
+    cost = 5
+    card_type = 'Action'
+    card_subtype = None
 
     def special_ability(self, game, player):
         '''Player draws until they have 7 cards. They can immediately
@@ -660,36 +711,39 @@ class Library(object):
             cards_drawn += 1
             card = player.hand.hand[-1]
 
-            if card.card_type == 'Action':
+            if card.flags & ACTION:
                 valid_discard = ['keep_card', card.name]
-                selected_discard = player.agent.select_discard(valid_discard=valid_discard)
+                selected_discard = yield Decision(player, 'discard',
+                                                  valid_discard)
 
                 if selected_discard != 'keep_card':
-                    player.hand.hand.remove(card)
+                    player.hand.remove_card(card)
                     discarded_cards.append(card)
 
         for card in discarded_cards:
-            player.deck.discard_pile.append(card)
+            player.deck.add_to_discard_pile(card)
+
 
+class Market(Card):
+    __slots__ = ()
 
-class Market(object):
-    def __init__(self):
-        self.name = 'Market'
-        self.cost = 5
-        self.card_type = 'Action'
-        self.card_subtype = None
-        self.plus_cards = 1
-        self.plus_actions = 1
-        self.plus_buys = 1
-        self.coins = 1
+    name = 'Market'
+    cost = 5
+    card_type = 'Action'
+    card_subtype = None
+    plus_cards = 1
+    plus_actions = 1
+    plus_buys = 1
+    coins = 1
 
 
-class Mine(object):
-    def __init__(self):
-        self.name = 'Mine'
-        self.cost = 5
-        self.card_type = 'Action'
-        self.card_subtype = None
+class Mine(Card):
+    __slots__ = ()
+
+    name = 'Mine'
+    cost = 5
+    card_type = 'Action'
+    card_subtype = None
 
     def special_ability(self, game, player):
         '''Players trashes a Treasure card, and then gains a card worth up to 3
@@ -699,31 +753,33 @@ class Mine(object):
             game (instance): The current game.
             player (instance): The player who played the card
         '''
-        valid_trash = []
-        for card in player.hand.hand:
-            if card.card_type == 'Treasure' and card.name not in valid_trash:
-                valid_trash.append(card.name)
+        valid_trash = [card.name for card in player.hand.card_counts
+                       if card.flags & TREASURE]
 
         if len(valid_trash) > 0:
-            trashed_card = trash_card(player=player, valid_trash=valid_trash,
-                                      optional=True)
+            trashed_card = yield from trash_card(player=player,
+                                                 valid_trash=valid_trash,
+                                                 optional=True)
 
             if trashed_card != 'end_trash_phase':
 
                 valid_gains = ['Copper', 'Silver', 'Gold']
                 cost_limit = trashed_card.cost + 3
-                gain_card(player=player, supply_piles=game.supply_piles.supply_piles,
-                          cost_limit=cost_limit, valid_gains=valid_gains,
-                          destination='hand')
+                yield from gain_card(player=player,
+                                     supply_piles=game.supply_piles,
+                                     cost_limit=cost_limit,
+                                     valid_gains=valid_gains,
+                                     destination='hand')
+
 
+class Witch(Card):
+    __slots__ = ()
 
-class Witch(object):
-    def __init__(self):
-        self.name = 'Witch'
-        self.cost = 5
-        self.card_type = 'Action'
-        self.card_subtype = 'Attack'
-        self.plus_cards = 2
+    name = 'Witch'
+    cost = 5
+    card_type = 'Action'
+    card_subtype = 'Attack'
+    plus_cards = 2
 
     def special_ability(self, game, player_who_played_the_card):
         '''Each other player discards down to 3 cards, unless they have
@@ -736,18 +792,18 @@ class Witch(object):
         for player in game.players:
             if player is not player_who_played_the_card:
                 if successful_attack(player=player):
-                    curse_pile = game.supply_piles.supply_piles['Curse']
-                    if len(curse_pile) > 0:
-                        curse_card = curse_pile.pop(0)
-                        player.deck.discard_pile.append(curse_card)
+                    curse_card = game.supply_piles.take('Curse')
+                    if curse_card is not None:
+                        player.deck.gain_card(curse_card)
+
 
+class Adventurer(Card):
+    __slots__ = ()
 
-class Adventurer(object):
-    def __init__(self):
-        self.name = 'Adventurer'
-        self.cost = 6
-        self.card_type = 'Action'
-        self.card_subtype = None
+    name = 'Adventurer'
+    cost = 6
+    card_type = 'Action'
+    card_subtype = None
 
     def special_ability(self, game, player):
         '''Player draws cards until they gain two Treasure cards.
@@ -769,8 +825,106 @@ class Adventurer(object):
             cards_drawn += 1
             card = player.hand.hand[-1]
 
-            if card.card_type == 'Treasure':
+            if card.flags & TREASURE:
                 treasures_drawn += 1
             else:
-                player.hand.hand.remove(card)
-                player.deck.discard_pile.append(card)
+                player.hand.discard_card(card)
+
+
+# Bit flags for the card types, so that a card's types can be checked
+# with a single integer comparison.
+TREASURE = 1
+ACTION = 2
+VICTORY = 4
+CURSE = 8
+ATTACK = 16
+REACTION = 32
+
+_TYPE_FLAGS = {'Treasure': TREASURE, 'Action': ACTION, 'Victory': VICTORY,
+               'Curse': CURSE, 'Attack': ATTACK, 'Reaction': REACTION,
+               None: 0}
+
+# Static information about a card, as stored in CARD_REGISTRY.
+CardInfo = collections.namedtuple('CardInfo', ['card_id', 'class_name',
+                                               'name', 'cost', 'card_type',
+                                               'card_subtype', 'flags',
+                                               'effect', 'card_class'])
+
+# What happens when a card is played: the number of extra cards, actions,
+# buys and coins it gives, and its special ability (a callable taking the
+# game and the player, or None). Special abilities which ask a player to
+# make a decision are generators which yield Decisions.
+CardEffect = collections.namedtuple('CardEffect', ['plus_cards',
+                                                   'plus_actions',
+                                                   'plus_buys', 'coins',
+                                                   'special_ability'])
+
+
+def _compile_effect(card_class):
+    '''Collect the effects of playing a card into a CardEffect, so that
+    they do not have to be looked up on the card every time it is played.
+
+    Args:
+        card_class (class): The class of the card.
+
+    Return:
+        effect (CardEffect): The effect of playing the card.
+    '''
+    card = card_class()
+    return CardEffect(plus_cards=getattr(card, 'plus_cards', 0),
+                      plus_actions=getattr(card, 'plus_actions', 0),
+                      plus_buys=getattr(card, 'plus_buys', 0),
+                      coins=getattr(card, 'coins', 0),
+                      special_ability=getattr(card, 'special_ability', None))
+
+
+def _build_registry(card_classes):
+    '''Build the card registry from a list of card classes. Cards are
+    given ids in alphabetical order of class name, the same order used
+    by Agent._dict_to_list. The id, type flags and effect of each card
+    are also set on its class.
+
+    Args:
+        card_classes (list): The classes of all of the cards.
+
+    Return:
+        registry (tuple): Contains a CardInfo for each card, where the
+        index of each entry is its card id.
+    '''
+    card_classes = sorted(card_classes,
+                          key=lambda card_class: card_class.__name__)
+
+    registry = []
+    for card_id, card_class in enumerate(card_classes):
+        flags = (_TYPE_FLAGS[card_class.card_type] |
+                 _TYPE_FLAGS[card_class.card_subtype])
+        effect = _compile_effect(card_class)
+        card_class.card_id = card_id
+        card_class.flags = flags
+        card_class.effect = effect
+
+        registry.append(CardInfo(card_id=card_id,
+                                 class_name=card_class.__name__,
+                                 name=card_class.name,
+                                 cost=card_class.cost,
+                                 card_type=card_class.card_type,
+                                 card_subtype=card_class.card_subtype,
+                                 flags=flags,
+                                 effect=effect,
+                                 card_class=card_class))
+    return tuple(registry)
+
+
+# Registry of every card in the game, built once when this module is
+# imported. The card id of each card is its index in CARD_REGISTRY, and
+# in the card count vectors used to describe the game state.
+CARD_REGISTRY = _build_registry([
+    Copper, Silver, Gold, Estate, Duchy, Province, Curse, Cellar, Chapel,
+    Moat, Chancellor, Village, Woodcutter, Workshop, Bureaucrat, Feast,
+    Gardens, Militia, Moneylender, Remodel, Smithy, Spy, Thief, ThroneRoom,
+    CouncilRoom, Festival, Laboratory, Library, Market, Mine, Witch,
+    Adventurer])
+N_CARDS = len(CARD_REGISTRY)
+CARD_CLASS_NAMES = tuple(info.class_name for info in CARD_REGISTRY)
+CARDS_BY_NAME = dict((info.name, info) for info in CARD_REGISTRY)
+CARD_IDS = dict((info.name, info.card_id) for info in CARD_REGISTRY)
@@ -0,0 +1,244 @@
+"""Builds training datasets from recorded games (see trajectory.py).
+
+Every recorded decision becomes a sample of SAMPLE_DTYPE: the player's
+observation, laid out as by Agent._get_game_state, a mask of the valid
+actions and the action taken, as indices in env.ACTION_NAMES, and the
+return, the final outcome of the game for the player. A model trained on
+these samples can drive a live Agent subclass, by feeding it
+`self._get_game_state()` and masking its output with
+env.encode_action_mask.
+
+Games are split between a training and a validation set by a hash of
+their game_id, so that all of a game's decisions land in the same set.
+Samples are streamed through a bounded shuffle buffer into shards of a
+fixed size, saved as .npy files, so the memory used does not depend on
+the number of games.
+"""
+import glob
+import os
+
+import numpy as np
+
+from dominion.env import N_ACTIONS
+from dominion.trajectory import TrajectoryReader, DECISION_DTYPE
+
+SAMPLE_DTYPE = np.dtype([('observation', '<i2',
+                          DECISION_DTYPE['observation'].shape),
+                         ('action_mask', '?', (N_ACTIONS,)),
+                         ('action', 'u1'),
+                         ('return', '<f4')])
+
+SPLITS = ('train', 'val')
+
+_ACTION_BITS = np.arange(N_ACTIONS, dtype=np.uint64)
+
+
+def game_returns(game):
+    '''The outcome of a recorded game for each seat: 1 for the only
+    player with the highest score, 0 for a player sharing it, and -1
+    otherwise, as the rewards of DominionEnv. Games which were stopped
+    before they were over return 0 for every seat.
+
+    Args:
+        game (numpy.void): The game's record.
+
+    Return:
+        returns (numpy.ndarray): The return of each seat.
+    '''
+    scores = game['scores'][:int(game['n_players'])]
+    returns = np.zeros(len(scores), dtype=np.float32)
+    if not game['game_over']:
+        return returns
+
+    best = scores == scores.max()
+    returns[~best] = -1.0
+    if best.sum() == 1:
+        returns[best] = 1.0
+    return returns
+
+
+def game_samples(game, decisions):
+    '''Turn a recorded game's decisions into samples.
+
+    Args:
+        game (numpy.void): The game's record.
+        decisions (numpy.ndarray): The game's decision records.
+
+    Return:
+        samples (numpy.ndarray): One SAMPLE_DTYPE sample per decision.
+    '''
+    samples = np.zeros(len(decisions), dtype=SAMPLE_DTYPE)
+    samples['observation'] = decisions['observation']
+    samples['action_mask'] = (decisions['options'][:, None] >>
+                              _ACTION_BITS) & np.uint64(1)
+    samples['action'] = decisions['choice']
+    samples['return'] = game_returns(game)[decisions['seat']]
+    return samples
+
+
+def in_validation_set(game_id, val_fraction):
+    '''Whether a game belongs to the validation set. Decided by a hash of
+    the game_id, so the split is the same however the games are ordered
+    or sharded.'''
+    # The finalizer of SplitMix64, to spread out consecutive ids
+    x = int(game_id) & 0xFFFFFFFFFFFFFFFF
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    x ^= x >> 31
+    return x < val_fraction * 2.0 ** 64
+
+
+class ShuffleBuffer(object):
+    def __init__(self, capacity, dtype, rng):
+        '''A bounded buffer which shuffles a stream of samples: once it
+        is full, each sample added pushes out one chosen at random from
+        the buffer. The order is random within a window of about
+        `capacity` samples.
+
+        Args:
+            capacity (int): The number of samples held.
+            dtype (numpy.dtype): The dtype of the samples.
+            rng (numpy.random.Generator): Random number generator used to
+            choose the samples pushed out.
+        '''
+        self.capacity = capacity
+        self.rng = rng
+        self._samples = np.zeros(capacity, dtype=dtype)
+        self._n_samples = 0
+
+    def add(self, samples):
+        '''Add samples to the buffer.
+
+        Args:
+            samples (numpy.ndarray): The samples to add.
+
+        Return:
+            samples (numpy.ndarray): The samples pushed out, in random
+            order. Empty until the buffer is full.
+        '''
+        n_free = self.capacity - self._n_samples
+        n_stored = min(n_free, len(samples))
+        self._samples[self._n_samples:self._n_samples + n_stored] = \
+            samples[:n_stored]
+        self._n_samples += n_stored
+
+        pushed_out = []
+        for start in range(n_stored, len(samples), self.capacity):
+            incoming = samples[start:start + self.capacity]
+            slots = self.rng.choice(self.capacity, size=len(incoming),
+                                    replace=False)
+            pushed_out.append(self._samples[slots])
+            self._samples[slots] = incoming
+        if not pushed_out:
+            return self._samples[:0]
+        return np.concatenate(pushed_out)
+
+    def drain(self):
+        '''Empty the buffer.
+
+        Return:
+            samples (numpy.ndarray): The samples left, in random order.
+        '''
+        samples = self._samples[:self._n_samples].copy()
+        self.rng.shuffle(samples)
+        self._n_samples = 0
+        return samples
+
+
+class ShardWriter(object):
+    def __init__(self, directory, split, shard_size):
+        '''Writes samples into .npy shards of shard_size samples each,
+        named `<split>-<shard>.npy`. The last shard may be smaller.
+
+        Args:
+            directory (str): The directory to write the shards to.
+            split (str): The name of the split, e.g. 'train'.
+            shard_size (int): Number of samples in each shard.
+        '''
+        self.directory = directory
+        self.split = split
+        self.n_samples = 0
+        self.n_shards = 0
+        self._samples = np.zeros(shard_size, dtype=SAMPLE_DTYPE)
+        self._n_buffered = 0
+
+    def write(self, samples):
+        '''Add samples, writing out each shard as it fills up.'''
+        shard_size = len(self._samples)
+        while len(samples):
+            n = min(shard_size - self._n_buffered, len(samples))
+            self._samples[self._n_buffered:self._n_buffered + n] = samples[:n]
+            self._n_buffered += n
+            samples = samples[n:]
+            if self._n_buffered == shard_size:
+                self.flush()
+
+    def flush(self):
+        '''Write out the samples buffered as a shard, if there are any.'''
+        if self._n_buffered == 0:
+            return
+        path = os.path.join(self.directory, '{}-{:05d}.npy'.format(
+            self.split, self.n_shards))
+        np.save(path, self._samples[:self._n_buffered])
+        self.n_samples += self._n_buffered
+        self.n_shards += 1
+        self._n_buffered = 0
+
+
+def build_dataset(record_dir, output_dir, val_fraction=0.05,
+                  buffer_size=100000, shard_size=100000, seed=None):
+    '''Turn recorded games into shuffled training and validation shards.
+
+    Args:
+        record_dir (str): The directory of recorded games, as written by
+        TrajectoryWriter.
+        output_dir (str): The directory to write the shards to. It is
+        created if needed.
+        val_fraction (float): The fraction of games put in the
+        validation set. Default: 0.05.
+        buffer_size (int): The number of samples held by each shuffle
+        buffer. Default: 100000.
+        shard_size (int): The number of samples in each shard. Default:
+        100000.
+        seed (int): Seed for the shuffling. Default: None.
+
+    Return:
+        n_samples (dict): The number of samples written to each split.
+    '''
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    rng = np.random.default_rng(seed)
+    buffers = dict((split, ShuffleBuffer(buffer_size, SAMPLE_DTYPE, rng))
+                   for split in SPLITS)
+    writers = dict((split, ShardWriter(output_dir, split, shard_size))
+                   for split in SPLITS)
+
+    for game, decisions in TrajectoryReader(record_dir).iter_games():
+        if in_validation_set(game['game_id'], val_fraction):
+            split = 'val'
+        else:
+            split = 'train'
+        samples = game_samples(game, decisions)
+        writers[split].write(buffers[split].add(samples))
+
+    n_samples = {}
+    for split in SPLITS:
+        writers[split].write(buffers[split].drain())
+        writers[split].flush()
+        n_samples[split] = writers[split].n_samples
+    return n_samples
+
+
+def load_shards(directory, split='train'):
+    '''Memory-map the shards of a split written by build_dataset.
+
+    Args:
+        directory (str): The directory holding the shards.
+        split (str): 'train' or 'val'. Default: 'train'.
+
+    Return:
+        shards (list): A read-only SAMPLE_DTYPE array for each shard.
+    '''
+    paths = sorted(glob.glob(os.path.join(directory, split + '-*.npy')))
+    return [np.load(path, mmap_mode='r') for path in paths]
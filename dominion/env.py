@@ -0,0 +1,342 @@
+"""A Gym-style environment, in which one player's decisions are made by
+calling step() instead of by an agent.
+"""
+import random
+
+import numpy as np
+
+from dominion import cards
+from dominion.agent import Agent, RandomAgent
+from dominion.game import Game, agent_seed, split_seed
+
+# Options which are not cards.
+SPECIAL_OPTIONS = ('end_action_phase', 'end_buy_phase', 'end_discard_phase',
+                   'end_trash_phase', 'keep_card', 'no_action', 'Yes', 'No')
+
+# The action space: every option a player can be offered, as the cards in
+# card id order followed by the special options. An action is an index
+# into ACTION_NAMES.
+ACTION_NAMES = tuple(info.name for info in cards.CARD_REGISTRY) + \
+    SPECIAL_OPTIONS
+ACTION_IDS = dict((name, action) for action, name in enumerate(ACTION_NAMES))
+N_ACTIONS = len(ACTION_NAMES)
+
+DECISION_KINDS = ('action', 'buy', 'gain', 'discard', 'trash', 'shuffle')
+
+# Observations are the player's card counts (as in Agent._get_game_state),
+# a one-hot encoding of the kind of decision, and the player's actions,
+# buys and coins.
+OBSERVATION_SIZE = 3 * cards.N_CARDS + len(DECISION_KINDS) + 3
+
+
+def encode_observation(player, decision, out):
+    '''Encode what a player can see when making a decision.
+
+    Args:
+        player (Player): The player making the decision.
+        decision (Decision): The decision, or None if the game is over.
+        out (numpy.ndarray): Array of length OBSERVATION_SIZE to write
+        the observation into.
+    '''
+    n = cards.N_CARDS
+    out[:n] = player.deck.count_vector
+    out[n:2 * n] = player.game.supply_piles.count_vector
+    out[2 * n:3 * n] = player.hand.count_vector
+
+    out[3 * n:] = 0
+    if decision is not None:
+        out[3 * n + DECISION_KINDS.index(decision.kind)] = 1
+
+    game = player.game
+    if game.phase is not None and game.players[game.current_player] is player:
+        turn_state = player.turn_state
+        out[-3] = turn_state['actions']
+        out[-2] = turn_state['buys']
+        out[-1] = turn_state['coins']
+
+
+def encode_action_mask(decision, out):
+    '''Mark the actions which are options for a decision.
+
+    Args:
+        decision (Decision): The decision, or None if the game is over,
+        in which case no actions are valid.
+        out (numpy.ndarray): Boolean array of length N_ACTIONS to write
+        the mask into.
+    '''
+    out[:] = False
+    if decision is not None:
+        for option in decision.options:
+            out[ACTION_IDS[option]] = True
+
+
+class DominionEnv(object):
+    def __init__(self, n_players=2, card_set='random', opponents=None,
+                 seat=0, max_turns=None, seed=None):
+        '''Environment in which the decisions of the player in one seat
+        are made through reset() and step(), in the style of OpenAI Gym.
+        The other players are played by agents, whose decisions are made
+        inside step() until it is the player's turn to decide again.
+
+        Actions are indices into ACTION_NAMES. Not every action is valid
+        for every decision: the valid ones are given by the boolean
+        `action_mask`, which is also returned in the info dict.
+
+        Args:
+            n_players (int): Number of players in each game. Default: 2.
+            card_set (str): The card set to play with, as for Game.
+            Default: 'random'.
+            opponents (list): Callables which return a new agent for
+            each of the other seats, in seat order, called for every
+            game. If None, RandomAgents are used, seeded by the game.
+            Default: None.
+            seat (int): The position of the player controlled through
+            step(). Default: 0.
+            max_turns (int): Games are truncated after this many turns
+            in total. Default: None (no limit).
+            seed (int): Seed for the environment. Game i is played with
+            seed split_seed(seed, i), unless a seed is given to reset().
+            If None, games are seeded randomly. Default: None.
+        '''
+        assert 0 <= seat < n_players, 'seat must be between 0 and n_players - 1'
+        if opponents is not None:
+            assert len(opponents) == n_players - 1, \
+                'need one opponent for each of the other seats'
+
+        self.n_players = n_players
+        self.card_set = card_set
+        self.opponents = opponents
+        self.seat = seat
+        self.max_turns = max_turns
+        self.seed = seed
+
+        self.n_games = 0
+        self.game = None
+        self.player = None
+        self.decision = None
+        self.scores = None
+        self.observation = np.zeros(OBSERVATION_SIZE, dtype=np.int16)
+        self.action_mask = np.zeros(N_ACTIONS, dtype=bool)
+        self._steps = None
+
+    def reset(self, seed=None):
+        '''Start a new game, and play it until the player has to make
+        their first decision.
+
+        Args:
+            seed (int): Seed for the game. Default: None (see seed in
+            __init__).
+
+        Return:
+            observation (numpy.ndarray): What the player can see.
+            info (dict): Contains the 'action_mask', the 'decision' kind
+            and its 'options'.
+        '''
+        if seed is None and self.seed is not None:
+            seed = split_seed(self.seed, self.n_games)
+        self.n_games += 1
+
+        agents = {}
+        opponents = iter(self.opponents or [])
+        for n in range(self.n_players):
+            player_id = 'Player ' + str(n)
+            if n == self.seat:
+                # Never asked to decide, since the steps are driven here
+                agents[player_id] = Agent()
+            elif self.opponents is not None:
+                agents[player_id] = next(opponents)()
+            elif seed is None:
+                agents[player_id] = RandomAgent()
+            else:
+                agents[player_id] = RandomAgent(
+                    rng=random.Random(agent_seed(seed, n)))
+
+        self.game = Game(n_players=self.n_players, agents=agents,
+                         card_set=self.card_set, seed=seed)
+        self.player = self.game.players[self.seat]
+        self.scores = None
+        self._steps = self.game.play_game_steps(max_turns=self.max_turns)
+        self._advance(None)
+        return self.observation.copy(), self._info()
+
+    def step(self, action):
+        '''Make the player's current decision, then play on until they
+        have to make another one or the game ends.
+
+        Args:
+            action (int): The index in ACTION_NAMES of the option
+            selected. Must be set in action_mask.
+
+        Return:
+            observation (numpy.ndarray): What the player can see.
+            reward (float): 0 until the game ends. Then 1 if the player
+            won, -1 if they lost, and 0 for a tie or if the game was
+            truncated.
+            terminated (bool): Whether the game is over.
+            truncated (bool): Whether the game was stopped by max_turns.
+            info (dict): Contains the 'action_mask', the 'decision' kind
+            and its 'options', and the final 'scores' once the game has
+            finished.
+        '''
+        assert self.decision is not None, 'call reset() to start a new game'
+        if not self.action_mask[action]:
+            raise ValueError('Invalid action: {} ({}).'.format(
+                action, ACTION_NAMES[action]))
+
+        self._advance(ACTION_NAMES[action])
+
+        reward = 0.0
+        terminated = False
+        truncated = False
+        if self.decision is None:
+            terminated = self.game.check_game_over()
+            truncated = not terminated
+            if terminated:
+                reward = self._final_reward()
+        return (self.observation.copy(), reward, terminated, truncated,
+                self._info())
+
+    def _advance(self, selection):
+        '''Send a selection into the game's steps, and run them until
+        the player has to make a decision, letting the other agents make
+        theirs. Updates the observation and action mask.'''
+        while True:
+            try:
+                decision = self._steps.send(selection)
+            except StopIteration as stop:
+                self.scores = stop.value
+                decision = None
+                break
+            if decision.player is self.player:
+                break
+            selection = decision.ask_agent()
+
+        self.decision = decision
+        encode_observation(self.player, decision, self.observation)
+        encode_action_mask(decision, self.action_mask)
+
+    def _final_reward(self):
+        '''1 if the player has the highest score alone, 0 if they share
+        it, and -1 otherwise.'''
+        score = self.scores[str(self.player.player_id)]
+        best_score = max(self.scores.values())
+        if score < best_score:
+            return -1.0
+        if list(self.scores.values()).count(best_score) > 1:
+            return 0.0
+        return 1.0
+
+    def _info(self):
+        '''The info dict returned by reset() and step().'''
+        info = {'action_mask': self.action_mask.copy()}
+        if self.decision is not None:
+            info['decision'] = self.decision.kind
+            info['options'] = self.decision.options
+        if self.scores is not None:
+            info['scores'] = self.scores
+        return info
+
+
+class VectorDominionEnv(object):
+    def __init__(self, n_envs, n_players=2, card_set='random', opponents=None,
+                 seat=0, max_turns=None, seed=None):
+        '''A batch of DominionEnvs stepped together. Observations, action
+        masks, rewards and done flags are returned stacked, with one row
+        per environment, and games which finish are reset automatically.
+
+        The arrays returned are allocated once and updated in place by
+        every call to reset() and step(): each environment encodes its
+        observation and mask straight into its row. Copy them if they
+        need to be kept.
+
+        Args:
+            n_envs (int): Number of environments.
+            n_players, card_set, opponents, seat, max_turns: As for
+            DominionEnv, and the same for every environment.
+            seed (int): Seed for the batch. Environment i is seeded with
+            split_seed(seed, i). If None, games are seeded randomly.
+            Default: None.
+        '''
+        self.n_envs = n_envs
+        self.observations = np.zeros((n_envs, OBSERVATION_SIZE),
+                                     dtype=np.int16)
+        self.action_masks = np.zeros((n_envs, N_ACTIONS), dtype=bool)
+        self.rewards = np.zeros(n_envs, dtype=np.float32)
+        self.terminated = np.zeros(n_envs, dtype=bool)
+        self.truncated = np.zeros(n_envs, dtype=bool)
+        self.final_scores = [None] * n_envs
+
+        self.envs = []
+        for i in range(n_envs):
+            if seed is None:
+                env_seed = None
+            else:
+                env_seed = split_seed(seed, i)
+            env = DominionEnv(n_players=n_players, card_set=card_set,
+                              opponents=opponents, seat=seat,
+                              max_turns=max_turns, seed=env_seed)
+            env.observation = self.observations[i]
+            env.action_mask = self.action_masks[i]
+            self.envs.append(env)
+
+    def reset(self):
+        '''Start a new game in every environment.
+
+        Return:
+            observations (numpy.ndarray): One row per environment.
+            info (dict): Contains the 'action_mask' of each environment.
+        '''
+        for env in self.envs:
+            env.reset()
+        return self.observations, {'action_mask': self.action_masks}
+
+    def step(self, actions):
+        '''Make the current decision in every environment, and play on to
+        the next. Environments whose game finishes are reset, and their
+        row of the observations is the first one of the new game.
+
+        Args:
+            actions (sequence): The action for each environment, as an
+            index in ACTION_NAMES.
+
+        Return:
+            observations (numpy.ndarray): One row per environment.
+            rewards (numpy.ndarray): The reward for each environment, as
+            in DominionEnv.step.
+            terminated (numpy.ndarray): Whether each game has ended.
+            truncated (numpy.ndarray): Whether each game was stopped by
+            max_turns.
+            info (dict): Contains the 'action_mask' of each environment,
+            and the 'final_scores' of each game which finished (None for
+            the others).
+        '''
+        rewards = self.rewards
+        terminated = self.terminated
+        truncated = self.truncated
+        action_masks = self.action_masks
+        final_scores = self.final_scores
+        rewards[:] = 0.0
+        terminated[:] = False
+        truncated[:] = False
+
+        for i, env in enumerate(self.envs):
+            action = actions[i]
+            if not action_masks[i, action]:
+                raise ValueError('Invalid action for environment {}: {} '
+                                 '({}).'.format(i, action,
+                                                ACTION_NAMES[action]))
+            env._advance(ACTION_NAMES[action])
+
+            if env.decision is None:
+                final_scores[i] = env.scores
+                if env.game.check_game_over():
+                    terminated[i] = True
+                    rewards[i] = env._final_reward()
+                else:
+                    truncated[i] = True
+                env.reset()
+            else:
+                final_scores[i] = None
+
+        return (self.observations, rewards, terminated, truncated,
+                {'action_mask': action_masks, 'final_scores': final_scores})
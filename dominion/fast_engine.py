@@ -0,0 +1,419 @@
+"""A fast simulation engine for strategies which make no choices beyond
+their buy rules (see strategy.py), which plays a whole batch of games at
+once with NumPy.
+
+Rather than lists of card instances, each player's draw pile, discard
+pile and hand are stored as arrays of card counts, with a column for each
+card in the game and a row for each game. Since a shuffled draw pile is
+in uniformly random order, drawing its top card is the same as drawing a
+card at random from its counts, so the order of the cards never has to
+be kept. Every turn, all of the unfinished games in the batch take the
+same seat's turn together: cards are drawn, actions played, coins
+counted and cards bought for every game with array operations.
+
+Only cards whose effects need no decisions are supported: the treasure,
+victory and curse cards, and the action cards in FAST_ACTION_CARDS.
+"""
+import numpy as np
+
+from dominion.cards import (CARD_REGISTRY, CARD_IDS, TREASURE,
+                            VICTORY, CURSE, ACTION, REACTION)
+from dominion.game import BASE_CARDS, SupplyPiles
+from dominion.simulation import SimulationResults
+
+# Action cards which can be played by the fast engine: those with no
+# special ability, and Council Room and Witch, whose abilities need no
+# decisions.
+FAST_ACTION_CARDS = ('Council Room', 'Festival', 'Laboratory', 'Market',
+                     'Moat', 'Smithy', 'Village', 'Witch', 'Woodcutter')
+
+_COUNCIL_ROOM = CARD_IDS['Council Room']
+_WITCH = CARD_IDS['Witch']
+_PROVINCE = CARD_IDS['Province']
+_GARDENS = CARD_IDS['Gardens']
+_CURSE = CARD_IDS['Curse']
+_STARTING_DECK = ((CARD_IDS['Copper'], 7), (CARD_IDS['Estate'], 3))
+
+
+def _card_table(value):
+    '''An array holding value(info) for every card, indexed by card id.'''
+    return np.array([value(info) for info in CARD_REGISTRY], dtype=np.int32)
+
+
+_COSTS = _card_table(lambda info: info.cost)
+_TREASURE_VALUES = _card_table(
+    lambda info: info.card_class.coins if info.flags & TREASURE else 0)
+_VICTORY_POINTS = _card_table(
+    lambda info: (info.card_class.victory_points
+                  if info.flags & (VICTORY | CURSE) else 0))
+_PLUS_CARDS = _card_table(lambda info: info.effect.plus_cards)
+_PLUS_ACTIONS = _card_table(lambda info: info.effect.plus_actions)
+_PLUS_BUYS = _card_table(lambda info: info.effect.plus_buys)
+_PLUS_COINS = _card_table(
+    lambda info: info.effect.coins if info.flags & ACTION else 0)
+_REACTIONS = np.array([bool(info.flags & REACTION) for info in CARD_REGISTRY])
+
+
+def default_kingdom(strategies):
+    '''The kingdom cards needed by a set of strategies: every card they
+    buy or play, other than the treasure, victory and curse cards which
+    are always in the supply.
+
+    Args:
+        strategies (list): The Strategy of each player.
+
+    Return:
+        kingdom (list): The names of the kingdom cards, in order of
+        first use.
+    '''
+    kingdom = []
+    for strategy in strategies:
+        card_names = [rule.card for rule in strategy.buy_rules]
+        card_names += list(strategy.action_priority)
+        for card_name in card_names:
+            if card_name not in BASE_CARDS and card_name not in kingdom:
+                kingdom.append(card_name)
+    return kingdom
+
+
+class _CompiledStrategy(object):
+    def __init__(self, strategy, columns):
+        '''A strategy's rules as arrays of card columns and thresholds,
+        so that they can be checked for a whole batch of games at once.
+
+        Args:
+            strategy (Strategy): The strategy to compile.
+            columns (dict): Maps the card id of every card used by the
+            strategy to its column in the engine's count arrays.
+        '''
+        for card_name in strategy.action_priority:
+            if card_name not in FAST_ACTION_CARDS:
+                raise ValueError('The fast engine can not play {} '
+                                 '(strategy {}).'.format(card_name,
+                                                         strategy.name))
+
+        no_limit = np.iinfo(np.int32).max
+        rules = strategy.buy_rules
+        self.action_columns = np.array(
+            [columns[CARD_IDS[card_name]]
+             for card_name in strategy.action_priority], dtype=np.intp)
+        self.buy_columns = np.array([columns[CARD_IDS[rule.card]]
+                                     for rule in rules], dtype=np.intp)
+        self.min_coins = np.array([max(rule.min_coins,
+                                       _COSTS[CARD_IDS[rule.card]])
+                                   for rule in rules], dtype=np.int32)
+        self.pile_columns = np.array([columns[CARD_IDS[rule.pile]]
+                                      for rule in rules], dtype=np.intp)
+        self.min_left = np.array([-1 if rule.min_left is None
+                                  else rule.min_left for rule in rules],
+                                 dtype=np.int32)
+        self.max_left = np.array([no_limit if rule.max_left is None
+                                  else rule.max_left for rule in rules],
+                                 dtype=np.int32)
+        self.max_owned = np.array([no_limit if rule.max_owned is None
+                                   else rule.max_owned for rule in rules],
+                                  dtype=np.int32)
+
+
+class FastEngine(object):
+    def __init__(self, strategies, n_games, kingdom=None, max_turns=None,
+                 seed=None):
+        '''A batch of games between players following fixed strategies,
+        played with array operations. The rules are the same as in Game,
+        with each player's decisions made as by the strategy's rules:
+
+        - Actions: while the player has actions left, play the first card
+          in the strategy's action_priority which is in the hand. As
+          with BigMoneyAgent, the action phase also ends once as many
+          cards have been played this turn as the player owns, since a
+          deck of cards like Village could otherwise be played forever.
+        - Buys: while the player has buys left, buy the card of the
+          first buy rule which holds (see BuyRule), and stop if none do.
+
+        Results match those of the same strategies playing Game
+        statistically, but not game for game, since the random numbers
+        are used differently.
+
+        The count arrays only have a column for each card which is in
+        the supply or used by a strategy (`card_ids` holds their card
+        ids), so that draws and buys only look at those.
+
+        Args:
+            strategies (list): The Strategy of each player, in seat order.
+            Between 2 and 4 players.
+            n_games (int): Number of games in the batch.
+            kingdom (list): The names of the kingdom cards. Default: None
+            (the cards the strategies use, see default_kingdom).
+            max_turns (int): Stop each game after this many turns in
+            total, even if it is not over. Default: None (no limit).
+            seed (int): Seed for the random number generator. Default:
+            None.
+        '''
+        n_players = len(strategies)
+        assert n_players >= 2 and n_players <= 4, "n_players must be between 2 and 4"
+        if kingdom is None:
+            kingdom = default_kingdom(strategies)
+
+        self.strategies = strategies
+        self.n_players = n_players
+        self.n_games = n_games
+        self.kingdom = list(kingdom)
+        self.max_turns = max_turns
+        self.rng = np.random.default_rng(seed)
+
+        supply_piles = SupplyPiles(n_players=n_players, card_set=self.kingdom)
+        used = supply_piles.count_vector > 0
+        for strategy in strategies:
+            for rule in strategy.buy_rules:
+                used[CARD_IDS[rule.card]] = True
+                used[CARD_IDS[rule.pile]] = True
+            for card_name in strategy.action_priority:
+                if not supply_piles.count_vector[CARD_IDS[card_name]]:
+                    raise ValueError('{} is not in the kingdom.'.format(
+                        card_name))
+        self.card_ids = np.flatnonzero(used)
+        columns = dict((card_id, column)
+                       for column, card_id in enumerate(self.card_ids))
+        self.compiled = [_CompiledStrategy(strategy, columns)
+                         for strategy in strategies]
+
+        card_ids = self.card_ids
+        self._costs = _COSTS[card_ids]
+        self._treasure_values = _TREASURE_VALUES[card_ids]
+        self._victory_points = _VICTORY_POINTS[card_ids]
+        self._plus_cards = _PLUS_CARDS[card_ids]
+        self._plus_actions = _PLUS_ACTIONS[card_ids]
+        self._plus_buys = _PLUS_BUYS[card_ids]
+        self._plus_coins = _PLUS_COINS[card_ids]
+        self._reactions = _REACTIONS[card_ids]
+        self._province = columns[_PROVINCE]
+        self._curse = columns[_CURSE]
+        self._gardens = columns.get(_GARDENS)
+        self._council_room = columns.get(_COUNCIL_ROOM, -1)
+        self._witch = columns.get(_WITCH, -1)
+
+        count_vector = supply_piles.count_vector[card_ids].astype(np.int32)
+        self.in_supply = count_vector > 0
+        self.supply = np.tile(count_vector, (n_games, 1))
+
+        shape = (n_games, n_players, len(card_ids))
+        self.draw_piles = np.zeros(shape, dtype=np.int32)
+        self.discard_piles = np.zeros(shape, dtype=np.int32)
+        self.hands = np.zeros(shape, dtype=np.int32)
+        self.owned = np.zeros(shape, dtype=np.int32)
+        for card_id, count in _STARTING_DECK:
+            self.draw_piles[:, :, columns[card_id]] = count
+            self.owned[:, :, columns[card_id]] = count
+
+        self.n_turns = np.zeros(n_games, dtype=np.int32)
+        self.finished = np.zeros(n_games, dtype=bool)
+        self.turn = 0
+
+        all_games = np.arange(n_games)
+        for seat in range(n_players):
+            self._draw(all_games, seat, 5)
+
+    def play(self):
+        '''Play every game in the batch to the end.
+
+        Return:
+            scores (numpy.ndarray): The final score of each player, with
+            one row per game.
+        '''
+        self.finished |= self._game_over()
+        while not self.finished.all():
+            if self.max_turns is not None and self.turn >= self.max_turns:
+                break
+            games = np.flatnonzero(~self.finished)
+            self._take_turn(games, self.turn % self.n_players)
+            self.n_turns[games] += 1
+            self.turn += 1
+            self.finished[games] |= self._game_over()[games]
+        return self.scores()
+
+    def scores(self):
+        '''The number of victory points each player has, counting
+        Gardens as 1 for every 10 cards owned.
+
+        Return:
+            scores (numpy.ndarray): One row per game, one column per seat.
+        '''
+        scores = self.owned.dot(self._victory_points)
+        if self._gardens is not None:
+            n_cards = self.owned.sum(axis=2)
+            scores += self.owned[:, :, self._gardens] * (n_cards // 10)
+        return scores
+
+    def _game_over(self):
+        '''Whether each game has run out of Provinces or three piles.'''
+        n_empty_piles = ((self.supply == 0) & self.in_supply).sum(axis=1)
+        return (self.supply[:, self._province] == 0) | (n_empty_piles >= 3)
+
+    def _take_turn(self, games, seat):
+        '''Play a turn for the player in the given seat of some games.
+
+        Args:
+            games (numpy.ndarray): The indices of the games.
+            seat (int): The seat of the player taking the turn.
+        '''
+        n = len(games)
+        actions = np.ones(n, dtype=np.int32)
+        buys = np.ones(n, dtype=np.int32)
+        coins = np.zeros(n, dtype=np.int32)
+
+        self._action_phase(games, seat, actions, buys, coins)
+        coins += self.hands[games, seat].dot(self._treasure_values)
+        self._buy_phase(games, seat, buys, coins)
+
+        self.discard_piles[games, seat] += self.hands[games, seat]
+        self.hands[games, seat] = 0
+        self._draw(games, seat, 5)
+
+    def _action_phase(self, games, seat, actions, buys, coins):
+        '''Play action cards in order of the strategy's priority.'''
+        action_columns = self.compiled[seat].action_columns
+        if len(action_columns) == 0:
+            return
+
+        n_played = np.zeros(len(games), dtype=np.int32)
+        n_owned = self.owned[games, seat].sum(axis=1)
+        while True:
+            playing = np.flatnonzero((actions > 0) & (n_played < n_owned))
+            in_hand = self.hands[games[playing], seat][:, action_columns] > 0
+            can_play = in_hand.any(axis=1)
+            playing = playing[can_play]
+            if len(playing) == 0:
+                return
+            played = action_columns[in_hand[can_play].argmax(axis=1)]
+
+            # The card is discarded before its effect, as in Game
+            g = games[playing]
+            self.hands[g, seat, played] -= 1
+            self.discard_piles[g, seat, played] += 1
+            n_played[playing] += 1
+            actions[playing] += self._plus_actions[played] - 1
+            buys[playing] += self._plus_buys[played]
+            coins[playing] += self._plus_coins[played]
+            self._draw(g, seat, self._plus_cards[played])
+
+            council_room = g[played == self._council_room]
+            witch = g[played == self._witch]
+            for other in range(self.n_players):
+                if other == seat:
+                    continue
+                if len(council_room):
+                    self._draw(council_room, other, 1)
+                if len(witch):
+                    self._give_curse(witch, other)
+
+    def _give_curse(self, games, seat):
+        '''Give the player in a seat a Curse, unless they have a
+        Reaction card in their hand or the Curses have run out.'''
+        curse = self._curse
+        defended = self.hands[games, seat][:, self._reactions].any(axis=1)
+        g = games[~defended & (self.supply[games, curse] > 0)]
+        self.supply[g, curse] -= 1
+        self.discard_piles[g, seat, curse] += 1
+        self.owned[g, seat, curse] += 1
+
+    def _buy_phase(self, games, seat, buys, coins):
+        '''Buy cards by the strategy's buy rules.'''
+        compiled = self.compiled[seat]
+        buying = np.flatnonzero(buys > 0)
+        while len(buying):
+            g = games[buying]
+            supply = self.supply[g]
+            pile_counts = supply[:, compiled.pile_columns]
+            holds = ((supply[:, compiled.buy_columns] > 0) &
+                     (coins[buying, None] >= compiled.min_coins) &
+                     (pile_counts >= compiled.min_left) &
+                     (pile_counts <= compiled.max_left) &
+                     (self.owned[g, seat][:, compiled.buy_columns] <
+                      compiled.max_owned))
+            can_buy = holds.any(axis=1)
+            buying = buying[can_buy]
+            if len(buying) == 0:
+                return
+            bought = compiled.buy_columns[holds[can_buy].argmax(axis=1)]
+
+            g = games[buying]
+            self.supply[g, bought] -= 1
+            self.discard_piles[g, seat, bought] += 1
+            self.owned[g, seat, bought] += 1
+            coins[buying] -= self._costs[bought]
+            buys[buying] -= 1
+            buying = buying[buys[buying] > 0]
+
+    def _draw(self, games, seat, n):
+        '''Draw cards into the hands of the player in a seat of some
+        games, reshuffling their discard pile into their draw pile when
+        it runs out.
+
+        Args:
+            games (numpy.ndarray): The indices of the games.
+            seat (int): The seat of the player drawing.
+            n (int or numpy.ndarray): The number of cards to draw, for
+            all of the games or for each of them.
+        '''
+        n = np.broadcast_to(n, games.shape)
+        for k in range(int(n.max()) if len(games) else 0):
+            self._draw_card(games[n > k], seat)
+
+    def _draw_card(self, games, seat):
+        '''Draw a single card for the player in a seat of some games.'''
+        draw_piles = self.draw_piles[games, seat]
+        n_left = draw_piles.sum(axis=1)
+
+        empty = n_left == 0
+        if empty.any():
+            g = games[empty]
+            draw_piles[empty] = self.discard_piles[g, seat]
+            self.draw_piles[g, seat] = draw_piles[empty]
+            self.discard_piles[g, seat] = 0
+            n_left[empty] = draw_piles[empty].sum(axis=1)
+
+        drawing = n_left > 0
+        positions = (self.rng.random(len(games)) * n_left).astype(np.int32)
+        drawn = (draw_piles.cumsum(axis=1) >
+                 positions[:, None]).argmax(axis=1)
+        g = games[drawing]
+        drawn = drawn[drawing]
+        self.draw_piles[g, seat, drawn] -= 1
+        self.hands[g, seat, drawn] += 1
+
+
+def simulate_fast(strategies, n_games, kingdom=None, max_turns=None,
+                  batch_size=10000, seed=None):
+    '''Play a batch of games between fixed strategies with the fast
+    engine, and collect the results in the same form as simulate.
+
+    Args:
+        strategies (list): The Strategy of each player, in seat order.
+        Players are named 'Player 0', 'Player 1', etc.
+        n_games (int): Number of games to play.
+        kingdom (list): The names of the kingdom cards. Default: None
+        (the cards the strategies use).
+        max_turns (int): Stop each game after this many turns in total.
+        Default: None (no limit).
+        batch_size (int): Number of games played at once. Default: 10000.
+        seed (int): Seed for the random number generator. Default: None.
+
+    Return:
+        results (SimulationResults): Win rates, score distributions and
+        game lengths aggregated over all games.
+    '''
+    player_ids = ['Player ' + str(n) for n in range(len(strategies))]
+    rng = np.random.default_rng(seed)
+    results = SimulationResults()
+
+    for first_game in range(0, n_games, batch_size):
+        engine = FastEngine(strategies,
+                            n_games=min(batch_size, n_games - first_game),
+                            kingdom=kingdom, max_turns=max_turns,
+                            seed=rng.integers(2 ** 63))
+        scores = engine.play()
+        for game_scores, n_turns in zip(scores.tolist(),
+                                        engine.n_turns.tolist()):
+            results.add_game(dict(zip(player_ids, game_scores)), n_turns)
+
+    return results
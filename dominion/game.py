@@ -1,15 +1,89 @@
 # useful guide for the rules
 #https://boardgamegeek.com/wiki/page/Complete_and_All-Encompassing_Dominion_FAQ
+import bisect
+import collections
 import random
-import six
+
+import numpy as np
 
 from dominion.player import Player
 from dominion.cards import *
 from dominion.agent import RandomAgent
+from dominion import zobrist
+
+# The largest base seed accepted by split_seed.
+MAX_SEED = 2 ** 32 - 1
+
+
+def split_seed(seed, index):
+    '''Derive a seed for one of a number of games from a base seed, e.g.
+    for every game in a batch (index = the game's position in the batch).
+
+    The derived seed is `seed * 2**32 + index`, so for
+    0 <= seed <= MAX_SEED and 0 <= index < 2**32 every (seed, index) pair
+    gets a distinct seed, which fits in 64 bits, and any game can be
+    replayed from its batch seed and index. Base seeds are checked with
+    check_seed where they are passed in. Derived seeds can be split again
+    (e.g. VectorDominionEnv splits its seed per environment, and each
+    environment per game), which still gives distinct seeds for distinct
+    indices under the same base seed. The seeds of agents are derived
+    with agent_seed instead, so that they never coincide with the seed
+    of a game.
+
+    Args:
+        seed (int): The base seed.
+        index (int): The index of the stream.
+
+    Return:
+        seed (int): The derived seed.
+    '''
+    return seed * 2 ** 32 + index
+
+
+def agent_seed(game_seed, seat):
+    '''Derive the seed for the random number generator of the agent in a
+    seat of a seeded game.
+
+    Agent seeds are strings, which random.Random hashes (with SHA-512)
+    into integers of more than 512 bits, so they never coincide with a
+    game seed from split_seed, and every (game_seed, seat) pair gets its
+    own seed.
+
+    Args:
+        game_seed (int): The game's seed.
+        seat (int): The agent's position in the game.
+
+    Return:
+        seed (str): The seed.
+    '''
+    return 'agent {} {}'.format(game_seed, seat)
+
+
+def check_seed(seed):
+    '''Check that a base seed can be used with split_seed: it must be
+    None or between 0 and MAX_SEED, or a ValueError is raised.
+
+    Args:
+        seed (int): The seed.
+    '''
+    if seed is not None and not 0 <= seed <= MAX_SEED:
+        raise ValueError('seed must be between 0 and {}, not {}.'.format(
+            MAX_SEED, seed))
+
+
+# A compact copy of the state of a game, made by Game.snapshot. Piles are
+# tuples of card instances (which are shared, since every copy of a card is
+# the same instance); the draw pile is stored top last, as in Deck.
+GameSnapshot = collections.namedtuple(
+    'GameSnapshot', ['supply_counts', 'players', 'current_player', 'phase',
+                     'n_turns', 'rng_state'])
+PlayerSnapshot = collections.namedtuple(
+    'PlayerSnapshot', ['draw_pile', 'discard_pile', 'hand', 'turn_state'])
 
 
 class Game(object):
-    def __init__(self, n_players, agents=None, card_set='random', verbose=False):
+    def __init__(self, n_players, agents=None, card_set='random', verbose=False,
+                 seed=None):
         '''Initialize a new game, with n players.
 
         Args:
@@ -19,10 +93,18 @@ class Game(object):
             game. The dict key is used as the player_id. If n_players is
             greater than the number of agents provided, RandomAgents
             will be used for the remaining players.
-            card_set (str): Indicates which pre-specified card set to
-            use. Options are 'random' and 'base'. Default: 'random'.
+            card_set (str or list): Indicates which pre-specified card
+            set to use. Options are 'random' and 'base', or a list of the
+            names of the kingdom cards. Default: 'random'.
             verbose (bool): Indicates whether to print game state as
             actions take place. Default: 'False'.
+            seed (int): Seed for the game's random number generator,
+            `rng`, which is used for all shuffling and for choosing the
+            random card set. The RandomAgents created for the remaining
+            players are seeded with agent_seed(seed, seat). Two games
+            with the same settings, seed and deterministic agents are
+            identical. If None, the game is seeded from the operating
+            system. Default: None.
         '''
         if agents is None:
             agents = {}
@@ -32,37 +114,94 @@ class Game(object):
         self.n_players = n_players
         self.card_set = card_set
         self.verbose = verbose
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.n_turns = 0
+        self.current_player = 0
+        self.phase = None
+        self._undo_log = None
+        self._undo_frames = []
+        self.decision = None
+        self.recorder = None
+        self.profiler = None
+        self.tree_stats = None
 
         players = []
-        for player_id, agent in six.iteritems(agents):
+        for player_id, agent in agents.items():
             players.append(Player(player_id=player_id, agent=agent, game=self))
 
         for n in range(len(agents), self.n_players):
+            if seed is None:
+                agent = RandomAgent()
+            else:
+                agent = RandomAgent(rng=random.Random(agent_seed(seed, n)))
             players.append(Player(player_id='Player ' + str(n),
-                                  agent=RandomAgent(), game=self))
+                                  agent=agent, game=self))
         self.players = players
 
         self.supply_piles = SupplyPiles(n_players=self.n_players,
-                                        card_set=self.card_set)
+                                        card_set=self.card_set,
+                                        rng=self.rng)
         if self.verbose:
             self.supply_piles.display_supply_pile_count()
 
-    def play_game(self):
+    def play_game(self, max_turns=None):
         '''Loop through players' turns until the game has finished.
-        Count victory points to determine a winner.
+        Count victory points to determine a winner. The scores are also
+        passed to the recorder, if one is attached, the game is timed by
+        the profiler, if one is attached, and its game tree statistics are
+        added up, if a TreeStats is attached.
+
+        Args:
+            max_turns (int): Stop once this many turns have been taken
+            in total (see n_turns), even if the game is not over.
+            Default: None (no limit).
 
         Return:
             victory_point_count (dict): Contains score for each player
         '''
+        steps = self.play_game_steps(max_turns=max_turns)
+        if self.profiler is not None:
+            steps = self.profiler.time_steps('game', steps)
+        victory_point_count = self.run_steps(steps)
+        if self.recorder is not None:
+            self.recorder.end_game(self, victory_point_count)
+        if self.tree_stats is not None:
+            self.tree_stats.end_game(self)
+        return victory_point_count
+
+    def play_game_steps(self, max_turns=None):
+        '''Play the game step by step. This is a generator which yields a
+        Decision whenever a player has to make one, instead of asking
+        their agent, and must then be sent the option selected. The game
+        can then be driven from outside, e.g. by a training loop or an
+        environment such as DominionEnv, without any agent callbacks.
+        play_game runs these steps with run_steps.
+
+        Args:
+            max_turns (int): Stop once this many turns have been taken
+            in total (see n_turns), even if the game is not over.
+            Default: None (no limit).
+
+        Return:
+            victory_point_count (dict): Contains score for each player,
+            as the value of the StopIteration raised at the end.
+        '''
         while not self.check_game_over():
-            for player in self.players:
+            if max_turns is not None and self.n_turns >= max_turns:
+                break
+            player = self.players[self.current_player]
+            if self.phase is None:
                 if self.verbose:
                     print(str(player.player_id) + "'s Turn")
-                self.take_turn(player)
-                if self.verbose:
-                    print("")
-                if self.check_game_over():
-                    break
+                yield from self.take_turn_steps(player)
+            else:
+                # Resuming a game restored part way through a turn
+                yield from self._finish_turn(player)
+            self.current_player = (self.current_player + 1) % self.n_players
+            self.n_turns += 1
+            if self.verbose:
+                print("")
 
         victory_point_count = {}
         for player in self.players:
@@ -72,10 +211,191 @@ class Game(object):
             print(victory_point_count)
         return victory_point_count
 
+    @property
+    def state_hash(self):
+        '''int: A 64-bit hash of the state of the game: the supply pile
+        counts, the cards each player owns and has in their hand, whose
+        turn it is, the phase and the current player's turn state. The
+        order of the draw and discard piles is not included. Parts of the
+        hash are updated as cards move (see zobrist.py), so this only
+        has to combine them.'''
+        hash_value = (self.supply_piles.zobrist_hash +
+                      zobrist.CURRENT_PLAYER_KEYS[self.current_player] +
+                      zobrist.PHASE_KEYS[self.phase])
+        for seat, player in enumerate(self.players):
+            hash_value += zobrist.SEAT_MULTIPLIERS[seat] * \
+                (player.deck.zobrist_hash + player.hand.zobrist_hash)
+
+        if self.phase is not None:
+            turn_state = self.players[self.current_player].turn_state
+            for key, value in turn_state.items():
+                hash_value += zobrist.TURN_STATE_KEYS[key] * value
+        return hash_value & zobrist.MASK
+
+    def run_steps(self, steps):
+        '''Run game steps (e.g. from play_game_steps) to the end, asking
+        the agents to make the decisions they yield. If a recorder is
+        attached to the game (see TrajectoryWriter.start_game), each
+        decision is passed to it along with the option selected, and
+        likewise to a TreeStats (see TreeStats.start_game). If a profiler
+        is attached (see set_profiler), the agents are timed. While an
+        agent decides, the decision is kept in `decision`, so that the
+        agent can see what the options refer to (e.g. whose card is
+        revealed).
+
+        Args:
+            steps (generator): The steps to run.
+
+        Return:
+            result: The return value of the steps.
+        '''
+        selection = None
+        while True:
+            try:
+                decision = steps.send(selection)
+            except StopIteration as stop:
+                return stop.value
+            self.decision = decision
+            if self.profiler is None:
+                selection = decision.ask_agent()
+            else:
+                selection = self.profiler.time_decision(decision)
+            self.decision = None
+            if self.recorder is not None:
+                self.recorder.record_decision(self, decision, selection)
+            if self.tree_stats is not None:
+                self.tree_stats.record_decision(self, decision)
+
+    def valid_decisions(self):
+        '''Find the options for the current player's next decision in
+        their action or buy phase, for use with `apply_decision`. If the
+        game is between turns, the next turn is started.
+
+        Return:
+            options (list): The valid actions during the action phase
+            (see _get_valid_actions), or valid buys during the buy phase
+            (see _get_valid_buys).
+        '''
+        player = self.players[self.current_player]
+        if self.phase is None:
+            self._begin_turn(player)
+        if self.phase == 'action':
+            return self._get_valid_actions(player.hand)
+        return self._get_valid_buys(player.turn_state['coins'])
+
+    def apply_decision(self, selection):
+        '''Make one of the current player's decisions in their action or
+        buy phase, in place, without asking their agent. The game then
+        moves on to the next decision: the end of a phase or turn is
+        resolved automatically, including cleanup and drawing the next
+        hand. Decisions asked for while a card is resolving (e.g. which
+        card to gain) are still made by the agents.
+
+        Every change made is recorded in an undo log, so the decision
+        can be reversed with `undo_decision`. Together they let a search
+        agent explore the game tree depth first without copying the
+        game. Logging starts with the first decision applied and
+        continues until `clear_undo_log` is called.
+
+        Args:
+            selection (str): One of the options from valid_decisions.
+        '''
+        player = self.players[self.current_player]
+        if self.phase is None:
+            self._begin_turn(player)
+        if self._undo_log is None:
+            self._set_undo_log([])
+
+        self._undo_frames.append((len(self._undo_log), self.current_player,
+                                  self.phase, self.n_turns,
+                                  dict(player.turn_state)))
+
+        end_phase = False
+        if self.phase == 'action':
+            if selection == 'end_action_phase':
+                end_phase = True
+            else:
+                card = player.hand.find_card(selection)
+                if card is None:
+                    raise ValueError('Invalid action: {}.'.format(selection))
+                self.run_steps(self._play_card(player, card))
+        else:
+            if selection == 'end_buy_phase':
+                end_phase = True
+            else:
+                self._buy_card(player, selection)
+
+        turn_state = player.turn_state
+        if self.phase == 'action' and (end_phase or
+                                       turn_state['actions'] <= 0):
+            turn_state['coins'] += self._count_coins(player.hand)
+            self.phase = 'buy'
+            end_phase = False
+
+        if self.phase == 'buy' and (end_phase or turn_state['buys'] <= 0):
+            player.hand.discard_hand()
+            player.hand.draw_hand()
+            self.phase = None
+            self.current_player = (self.current_player + 1) % self.n_players
+            self.n_turns += 1
+            if not self.check_game_over():
+                self._begin_turn(self.players[self.current_player])
+
+    def undo_decision(self):
+        '''Reverse the last decision made with `apply_decision`, putting
+        the game back exactly as it was, including the random number
+        generator. The agents are not changed, so an agent with its own
+        random number generator will not make the same choices again.
+        '''
+        assert self._undo_frames, 'no decisions to undo'
+        start, current_player, phase, n_turns, turn_state = \
+            self._undo_frames.pop()
+
+        undo_log = self._undo_log
+        self._set_undo_log(None)
+        while len(undo_log) > start:
+            entry = undo_log.pop()
+            entry[0](*entry[1:])
+        self._set_undo_log(undo_log)
+
+        self.current_player = current_player
+        self.phase = phase
+        self.n_turns = n_turns
+        self.players[current_player].turn_state = turn_state
+
+    def clear_undo_log(self):
+        '''Stop recording changes for undo_decision, and forget the
+        decisions recorded so far.'''
+        self._set_undo_log(None)
+        self._undo_frames = []
+
+    def _set_undo_log(self, undo_log):
+        '''Give the undo log to the game and each part of it which moves
+        cards, or None to stop recording changes.'''
+        self._undo_log = undo_log
+        self.supply_piles.undo_log = undo_log
+        for player in self.players:
+            player.deck.undo_log = undo_log
+            player.hand.undo_log = undo_log
+
+    def set_profiler(self, profiler):
+        '''Time the game's phases, card abilities, reshuffles and agent
+        decisions from now on (see profiler.py). Clones of the game are
+        not timed.
+
+        Args:
+            profiler (Profiler): The profiler to add the timings to, or
+            None to stop timing.
+        '''
+        self.profiler = profiler
+        for player in self.players:
+            player.deck.profiler = profiler
+
     def reset_game(self):
-        '''Begin a new game using the current settings.'''
+        '''Begin a new game using the current settings. A seeded game
+        starts again from the same seed, so it deals the same cards.'''
         self.__init__(n_players=self.n_players, card_set=self.card_set,
-                      verbose=self.verbose)
+                      verbose=self.verbose, seed=self.seed)
 
     def count_victory_points(self, player):
         '''Count the number of victory points in the given player's deck.
@@ -89,16 +409,7 @@ class Game(object):
             victory_points (int): Number of victory points in the
             player's deck
         '''
-
-        victory_points = 0
-        deck = player.deck.draw_pile + player.deck.discard_pile + player.hand.hand
-        num_cards = len(deck)
-        for card in deck:
-            if hasattr(card, 'victory_points'):
-                victory_points += card.victory_points
-            if card.name == 'Gardens':
-                victory_points += int(num_cards * 0.1)
-        return victory_points
+        return player.victory_points
 
     def check_game_over(self):
         '''Check to see if any of the game end conditions have been met.
@@ -108,17 +419,9 @@ class Game(object):
         Return (bool): Returns True if the game is over, False if the
             game is not over.
         '''
-        n_empty_piles = 0
-
-        for key, value in six.iteritems(self.supply_piles.supply_piles):
-            if len(value) == 0:
-                n_empty_piles += 1
-                if key == 'Province':
-                    return True
-        if n_empty_piles >= 3:
-            return True
-        else:
-            return False
+        supply_piles = self.supply_piles
+        return (supply_piles.counts['Province'] == 0 or
+                supply_piles.n_empty_piles >= 3)
 
     def take_turn(self, player):
         '''Player begins with one action and one buy. During the action
@@ -128,12 +431,148 @@ class Game(object):
         Args:
             player (instance): The player whose turn it is
         '''
+        self.run_steps(self.take_turn_steps(player))
+
+    def take_turn_steps(self, player):
+        '''Take a turn step by step, yielding the player's decisions (see
+        play_game_steps).
+
+        Args:
+            player (instance): The player whose turn it is
+        '''
+        self._begin_turn(player)
+        yield from self._finish_turn(player)
+
+    def _begin_turn(self, player):
+        '''Give the player a fresh turn state and start the action phase.
+
+        Args:
+            player (instance): The player whose turn it is
+        '''
+        if self._undo_log is not None:
+            self._undo_log.append((setattr, player, 'turn_state',
+                                   player.turn_state))
         player.turn_state = {'actions': 1, 'buys': 1, 'coins': 0}
-        self._action_phase(player)
-        self._buy_phase(player)
+        self.phase = 'action'
+
+    def _finish_turn(self, player):
+        '''Play the rest of the player's turn, starting from the current
+        phase, then clean up and draw a new hand.
+
+        Args:
+            player (instance): The player whose turn it is
+        '''
+        profiler = self.profiler
+        if self.phase == 'action':
+            if profiler is None:
+                yield from self._action_phase(player)
+            else:
+                yield from profiler.time_steps('phase: action',
+                                               self._action_phase(player))
+            self.phase = 'buy'
+        if self.phase == 'buy':
+            if profiler is None:
+                yield from self._buy_phase(player)
+            else:
+                yield from profiler.time_steps('phase: buy',
+                                               self._buy_phase(player))
 
         player.hand.discard_hand()
         player.hand.draw_hand()
+        self.phase = None
+
+    def snapshot(self):
+        '''Take a compact copy of the state of the game: the supply pile
+        counts, each player's draw pile (in order), discard pile, hand
+        and turn state, whose turn it is and the current phase, and the
+        state of the random number generator. The game can be put back
+        in this state with `restore`, e.g. by a search agent after
+        playing out a line of moves.
+
+        Snapshots are taken between decisions at the level of phases, so
+        a game restored during a player's action or buy phase resumes at
+        the start of that phase's next decision. Cards set aside part
+        way through resolving a card (e.g. by Library) are not captured.
+
+        Return:
+            snapshot (GameSnapshot): The state of the game.
+        '''
+        players = tuple(
+            PlayerSnapshot(tuple(player.deck.draw_pile),
+                           tuple(player.deck.discard_pile),
+                           tuple(player.hand.hand),
+                           tuple(player.turn_state.items()))
+            for player in self.players)
+        return GameSnapshot(self.supply_piles.count_vector.copy(), players,
+                            self.current_player, self.phase, self.n_turns,
+                            self.rng.getstate())
+
+    def restore(self, snapshot):
+        '''Put the game back in a state recorded by `snapshot`. The
+        snapshot must come from this game or a clone of it. The agents
+        are not changed.
+
+        Args:
+            snapshot (GameSnapshot): The state to restore.
+        '''
+        self.supply_piles.set_counts(snapshot.supply_counts)
+        for player, player_snapshot in zip(self.players, snapshot.players):
+            deck = player.deck
+            deck.draw_pile = list(player_snapshot.draw_pile)
+            deck.discard_pile = list(player_snapshot.discard_pile)
+            player.hand.set_cards(player_snapshot.hand)
+            deck._recount(player.hand.hand)
+            player.turn_state = dict(player_snapshot.turn_state)
+
+        self.clear_undo_log()
+        self.current_player = snapshot.current_player
+        self.phase = snapshot.phase
+        self.n_turns = snapshot.n_turns
+        self.rng.setstate(snapshot.rng_state)
+
+    def clone(self, agents=None):
+        '''Make an independent copy of the game, which can be played on
+        without changing this one. Piles and tallies are copied, but the
+        card instances are shared, so this is much cheaper than a deep
+        copy. The copy's random number generator starts in the same
+        state as this game's.
+
+        Args:
+            agents (dict): The agents who will play in the copy, keyed
+            by player_id. Agents keep a reference to their player, so
+            the copy can not share this game's agents. Players without
+            an agent are given a RandomAgent. Default: None.
+
+        Return:
+            game (Game): The copy. It never prints game state.
+        '''
+        if agents is None:
+            agents = {}
+
+        game = Game.__new__(Game)
+        game.n_players = self.n_players
+        game.card_set = self.card_set
+        game.verbose = False
+        game.seed = self.seed
+        game.rng = random.Random()
+        game.rng.setstate(self.rng.getstate())
+        game.n_turns = self.n_turns
+        game.current_player = self.current_player
+        game.phase = self.phase
+        game._undo_log = None
+        game._undo_frames = []
+        game.decision = None
+        game.recorder = None
+        game.profiler = None
+        game.tree_stats = None
+        game.players = []
+        for player in self.players:
+            agent = agents.get(player.player_id)
+            if agent is None:
+                agent = RandomAgent()
+            game.players.append(player.clone(game, agent))
+        game.supply_piles = self.supply_piles.clone()
+        return game
 
     def _buy_phase(self, player):
         '''Buy cards from the supply piles until out of money, or the
@@ -154,7 +593,7 @@ class Game(object):
                 print('Turn state: ' + str(player.turn_state))
                 print('Options: ' + str(valid_buys))
 
-            selected_buy = player.agent.select_buy(valid_buys)
+            selected_buy = yield Decision(player, 'buy', valid_buys)
 
             if self.verbose:
                 print('Selection: ' + str(selected_buy))
@@ -173,14 +612,10 @@ class Game(object):
             player (instance): The player who is playing the card
             selected_buy (str): The card that is being purchased
         '''
-        for key, value in six.iteritems(self.supply_piles.supply_piles):
-            if len(value) > 0:
-                card = value[0]
-                if card.name == selected_buy:
-                    player.turn_state['coins'] -= card.cost
-                    player.turn_state['buys'] -= 1
-                    self.supply_piles.supply_piles[key].remove(card)
-                    player.deck.discard_pile.append(card)
+        card = self.supply_piles.take(selected_buy)
+        player.turn_state['coins'] -= card.cost
+        player.turn_state['buys'] -= 1
+        player.deck.gain_card(card)
 
     def _get_valid_buys(self, coins):
         '''Find all supply piles which still have cards left, and which
@@ -195,12 +630,7 @@ class Game(object):
             has enough money to buy.
         '''
         valid_buys = ['end_buy_phase']
-
-        for key, value in six.iteritems(self.supply_piles.supply_piles):
-            if len(value) > 0:
-                card = value[0]
-                if card.cost <= coins:
-                    valid_buys.append(card.name)
+        valid_buys.extend(self.supply_piles.available_cards(coins))
         return valid_buys
 
     def _action_phase(self, player):
@@ -222,12 +652,12 @@ class Game(object):
                 print('Turn state: ' + str(player.turn_state))
                 player.display_hand()
 
-            valid_actions = self._get_valid_actions(player.hand.hand)
+            valid_actions = self._get_valid_actions(player.hand)
 
             if self.verbose:
                 print('Options: ' + str(valid_actions))
 
-            selected_action = player.agent.select_action(valid_actions)
+            selected_action = yield Decision(player, 'action', valid_actions)
 
             if self.verbose:
                 print('Selection: ' + str(selected_action))
@@ -235,15 +665,15 @@ class Game(object):
             if selected_action == 'end_action_phase':
                 end_action_phase = True
             else:
-                for card in player.hand.hand:
-                    if card.name == selected_action:
-                        self._play_card(player, card)
-                        break
+                card = player.hand.find_card(selected_action)
+                if card is not None:
+                    yield from self._play_card(player, card)
 
-        player.turn_state['coins'] += self._count_coins(player.hand.hand)
+        player.turn_state['coins'] += self._count_coins(player.hand)
 
     def _count_coins(self, hand):
-        '''Count value of Treasure cards in the player's hand
+        '''Count value of Treasure cards in the player's hand. The hand
+        keeps this as a running total, so no cards need to be checked.
 
         Args:
             hand (instance): The player's hand
@@ -252,11 +682,7 @@ class Game(object):
             coin_count (int): The number of coins the player's
             Treasure cards are worth
         '''
-        coin_count = 0
-        for card in hand:
-            if (card.card_type == 'Treasure'):
-                coin_count += card.coins
-        return coin_count
+        return hand.coins
 
     def _play_card(self, player, card):
         '''Play a card by triggering it's effects (draw cards, add
@@ -271,27 +697,51 @@ class Game(object):
 
         # Remove the card from the hand first so that the player cannot
         # choose to discard or trash it after they have already played it
-        player.hand.hand.remove(card)
-        player.deck.discard_pile.append(card)
-
-        if hasattr(card, 'plus_cards'):
-            for i in range(card.plus_cards):
-                player.hand.draw_card()
-        if hasattr(card, 'plus_actions'):
-            player.turn_state['actions'] += card.plus_actions
-        if hasattr(card, 'plus_buys'):
-            player.turn_state['buys'] += card.plus_buys
-        if hasattr(card, 'coins'):
-            player.turn_state['coins'] += card.coins
-        if hasattr(card, 'special_ability'):
-            card.special_ability(self, player)
+        player.hand.discard_card(card)
+        yield from self._resolve_effect(player, card)
 
         player.turn_state['actions'] -= 1
 
+    def _resolve_effect(self, player, card):
+        '''Apply the effects of a card that has been played: draw cards,
+        add actions, add buys, add coins and then trigger its special
+        ability, as given by the card's precompiled `effect`. Used for
+        normal plays, and for each repeat of a card played with Throne
+        Room.
+
+        Args:
+            player (instance): The player who is playing the card
+            card (instance): The card that is being played
+        '''
+        plus_cards, plus_actions, plus_buys, coins, special_ability = \
+            card.effect
+
+        if plus_cards:
+            player.hand.draw_cards(plus_cards)
+
+        turn_state = player.turn_state
+        if plus_actions:
+            turn_state['actions'] += plus_actions
+        if plus_buys:
+            turn_state['buys'] += plus_buys
+        if coins:
+            turn_state['coins'] += coins
+
+        if special_ability is not None:
+            if self.profiler is not None:
+                yield from self.profiler.time_ability(card, self, player)
+                return
+            # Abilities which ask for decisions are generators, and
+            # return their steps
+            steps = special_ability(self, player)
+            if steps is not None:
+                yield from steps
+
     def _get_valid_actions(self, hand):
         '''Find all action cards in a player's hand. If duplicates of
         a card exist, only one is shown. Ending the action phase is also
-        an option, which is always available.
+        an option, which is always available. Only the distinct cards in
+        the hand are checked.
 
         Args:
             hand (instance): A hand object, which contains the cards to
@@ -302,14 +752,21 @@ class Game(object):
             player can play this action phase.
         '''
         valid_actions = ['end_action_phase']
-        for card in hand:
-            if (card.card_type == 'Action') and (card.name not in valid_actions):
-                valid_actions.append(card.name)
+        if hand.n_actions > 0:
+            for card in hand.card_counts:
+                if card.flags & ACTION:
+                    valid_actions.append(card.name)
         return valid_actions
 
 
+# The names of the cards which are in the supply of every game, whatever
+# the kingdom cards.
+BASE_CARDS = ('Copper', 'Silver', 'Gold', 'Estate', 'Duchy', 'Province',
+              'Curse')
+
+
 class SupplyPiles(object):
-    def __init__(self, n_players, card_set='random'):
+    def __init__(self, n_players, card_set='random', rng=None):
         '''Initialize the supply piles.
 
         Action Cards: 10 different actions, 10 cards each
@@ -317,11 +774,29 @@ class SupplyPiles(object):
         Treasure Cards: 60 Coppers (minus 7 for each player), 40 Silvers, 30 Golds
         Curse Cards: 10 for 2 players, plus 10 for each extra player
 
+        Since every copy of a card is identical, each pile is stored as
+        a count of the cards remaining (`counts`) plus one instance of
+        the card (`cards`), both keyed by card name. The number of empty
+        piles is updated as cards are taken, so checking for the end of
+        the game does not need to look at every pile. `count_vector`
+        holds the same counts indexed by card id, with zeros for cards
+        which are not in this game, and `zobrist_hash` the sum of the
+        hash keys of the cards in the piles (see zobrist.py). If
+        `undo_log` is a list, taking a card appends an entry to it which
+        puts the card back.
+
         Args:
             n_players (int): Number of players in the game.
-            card_set (str): Indicates which pre-specified card set to
-            use. Options are 'random' and 'base'. Default: 'random'.
+            card_set (str or list): Indicates which pre-specified card
+            set to use. Options are 'random' and 'base', or a list of the
+            names of the kingdom cards. Default: 'random'.
+            rng (random.Random): Random number generator used to choose
+            the random card set. If None, the global random module is
+            used. Default: None.
         '''
+        if rng is None:
+            rng = random
+
         self.card_set = card_set
 
         if n_players == 2:
@@ -329,13 +804,20 @@ class SupplyPiles(object):
         else:
             n_victory_cards = 12
 
-        self.supply_piles = {'Copper': [Copper()] * (60 - 7 * n_players),
-                             'Silver': [Silver()] * 40,
-                             'Gold': [Gold()] * 30,
-                             'Estate': [Estate()] * n_victory_cards,
-                             'Duchy': [Duchy()] * n_victory_cards,
-                             'Province': [Province()] * n_victory_cards,
-                             'Curse': [Curse()] * (10 + 10 * (n_players - 2))}
+        self.cards = {}
+        self.counts = {}
+        self.count_vector = np.zeros(N_CARDS, dtype=np.int16)
+        self.n_empty_piles = 0
+        self.zobrist_hash = 0
+        self.undo_log = None
+
+        self._add_pile(Copper(), 60 - 7 * n_players)
+        self._add_pile(Silver(), 40)
+        self._add_pile(Gold(), 30)
+        self._add_pile(Estate(), n_victory_cards)
+        self._add_pile(Duchy(), n_victory_cards)
+        self._add_pile(Province(), n_victory_cards)
+        self._add_pile(Curse(), 10 + 10 * (n_players - 2))
 
         if self.card_set == 'random':
             card_options = [Cellar(), Chapel(), Moat(), Chancellor(), Village(),
@@ -344,31 +826,152 @@ class SupplyPiles(object):
                             Smithy(), Spy(), Thief(), ThroneRoom(), CouncilRoom(),
                             Festival(), Laboratory(), Library(), Market(), Mine(),
                             Witch(), Adventurer()]
-            random.shuffle(card_options)
+            rng.shuffle(card_options)
             card_options = card_options[:10]
 
         elif self.card_set == 'base':
             card_options = [Cellar(), Moat(), Village(), Woodcutter(),
                             Workshop(), Militia(), Remodel(), Smithy(),
                             Market(), Mine()]
+        elif isinstance(self.card_set, (list, tuple)):
+            card_options = []
+            for card_name in self.card_set:
+                if card_name not in CARDS_BY_NAME:
+                    raise ValueError('Unknown card: {}.'.format(card_name))
+                card_options.append(CARDS_BY_NAME[card_name].card_class())
         else:
             raise ValueError('Unsupported card set: {}.'.format(self.card_set))
 
         for card in card_options:
-            if card.card_type == 'Victory':
-                self.supply_piles[card.name] = [card] * n_victory_cards
+            if card.flags & VICTORY:
+                self._add_pile(card, n_victory_cards)
             else:
-                self.supply_piles[card.name] = [card] * 10
+                self._add_pile(card, 10)
+
+        self._build_cost_index()
+
+    def _add_pile(self, card, count):
+        '''Add a supply pile holding count copies of card.'''
+        self.cards[card.name] = card
+        self.counts[card.name] = count
+        self.count_vector[card.card_id] = count
+        self.zobrist_hash += zobrist.SUPPLY_KEYS[card.card_id] * count
+
+    def set_counts(self, count_vector):
+        '''Set the number of cards left in every pile, e.g. when
+        restoring a snapshot.
+
+        Args:
+            count_vector (numpy.ndarray): The number of cards left in
+            each pile, indexed by card id, as in `count_vector`.
+        '''
+        self.count_vector[:] = count_vector
+        self.n_empty_piles = 0
+        self.zobrist_hash = 0
+        for card_name, card in self.cards.items():
+            count = int(count_vector[card.card_id])
+            self.counts[card_name] = count
+            self.zobrist_hash += zobrist.SUPPLY_KEYS[card.card_id] * count
+            if count == 0:
+                self.n_empty_piles += 1
+        self._build_cost_index()
+
+    def clone(self):
+        '''Make a copy of the supply piles, sharing the card instances.
+
+        Return:
+            supply_piles (SupplyPiles): The copy.
+        '''
+        supply_piles = SupplyPiles.__new__(SupplyPiles)
+        supply_piles.__dict__.update(self.__dict__)
+        supply_piles.undo_log = None
+        supply_piles.counts = dict(self.counts)
+        supply_piles.count_vector = self.count_vector.copy()
+        supply_piles._index_costs = list(self._index_costs)
+        supply_piles._index_names = list(self._index_names)
+        supply_piles._prefix_cache = dict(self._prefix_cache)
+        return supply_piles
+
+    def take(self, card_name):
+        '''Remove one card from a supply pile, keeping track of how many
+        piles have been emptied.
+
+        Args:
+            card_name (str): The name of the card to take.
+
+        Return:
+            card (instance): The card taken, or None if the pile is
+            already empty.
+        '''
+        count = self.counts[card_name]
+        if count == 0:
+            return None
+
+        card = self.cards[card_name]
+        if self.undo_log is not None:
+            self.undo_log.append((self._put_back, card_name))
+        self.counts[card_name] = count - 1
+        self.count_vector[card.card_id] -= 1
+        self.zobrist_hash -= zobrist.SUPPLY_KEYS[card.card_id]
+        if count == 1:
+            self.n_empty_piles += 1
+            self._remove_from_cost_index(card_name)
+        return card
+
+    def _put_back(self, card_name):
+        '''Return a card to its supply pile, reversing take.'''
+        card = self.cards[card_name]
+        count = self.counts[card_name]
+        self.counts[card_name] = count + 1
+        self.count_vector[card.card_id] += 1
+        self.zobrist_hash += zobrist.SUPPLY_KEYS[card.card_id]
+        if count == 0:
+            self.n_empty_piles -= 1
+            self._build_cost_index()
+
+    def _build_cost_index(self):
+        '''Index the non-empty piles by cost. `_index_names` holds the
+        names of their cards ordered by cost (then card id), and
+        `_index_costs` the matching costs, so the cards costing at most
+        some amount are always a prefix of `_index_names`. Prefixes are
+        cached by length until a pile is emptied.'''
+        indexed = sorted((card.cost, card.card_id, card_name)
+                         for card_name, card in self.cards.items()
+                         if self.counts[card_name] > 0)
+        self._index_costs = [cost for cost, card_id, card_name in indexed]
+        self._index_names = [card_name for cost, card_id, card_name in indexed]
+        self._prefix_cache = {}
+
+    def _remove_from_cost_index(self, card_name):
+        '''Remove an empty pile from the cost index.'''
+        i = self._index_names.index(card_name)
+        del self._index_names[i]
+        del self._index_costs[i]
+        self._prefix_cache.clear()
+
+    def available_cards(self, cost_limit):
+        '''Find the cards which are left in the supply piles and cost at
+        most cost_limit.
+
+        Args:
+            cost_limit (int): The maximum cost of the cards.
+
+        Return:
+            card_names (tuple): The names of the cards, ordered by cost.
+        '''
+        n = bisect.bisect_right(self._index_costs, cost_limit)
+        card_names = self._prefix_cache.get(n)
+        if card_names is None:
+            card_names = tuple(self._index_names[:n])
+            self._prefix_cache[n] = card_names
+        return card_names
 
     def display_supply_pile_count(self):
         '''Print out the number of cards remaining in each supply pile.'''
-        base_cards = ['Copper', 'Silver', 'Gold', 'Estate', 'Duchy',
-                      'Province', 'Curse']
-
-        for key in base_cards:
-            print(key + ': ' + str(len(self.supply_piles[key])))
+        for key in BASE_CARDS:
+            print(key + ': ' + str(self.counts[key]))
 
-        for key, value in six.iteritems(self.supply_piles):
-            if key not in base_cards:
-                print(key + ': ' + str(len(value)))
+        for key, value in self.counts.items():
+            if key not in BASE_CARDS:
+                print(key + ': ' + str(value))
         print('')
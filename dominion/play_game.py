@@ -2,11 +2,25 @@
 """
 import click
 
-from dominion.game import Game
+from dominion.game import Game, MAX_SEED
 from dominion.agent import HMIAgent
+from dominion import simulation
+from dominion import tournament
+from dominion import dataset
+from dominion import replay
 
 
-@click.command()
+@click.group(invoke_without_command=True)
+@click.pass_context
+def cli(ctx):
+    """Dominion game engine. Plays an interactive game if no command is
+    given.
+    """
+    if ctx.invoked_subcommand is None:
+        ctx.invoke(play_game)
+
+
+@cli.command(name='play')
 @click.option('--card-set',
               default='base',
               help='The set of cards to play with, e.g. base or random.')
@@ -40,5 +54,213 @@ def play_game(card_set, num_players, verbose):
     demo_game.play_game()
 
 
+@cli.command(name='simulate')
+@click.option('--n-games',
+              default=1000,
+              help='Number of games to play.')
+@click.option('--card-set',
+              default='random',
+              help='The set of cards to play with, e.g. base or random.')
+@click.option('--num-players',
+              default=2,
+              help='Number of players in each game.')
+@click.option('--workers',
+              default=None,
+              type=int,
+              help='Number of worker processes (default: one per CPU).')
+@click.option('--chunksize',
+              default=None,
+              type=int,
+              help='Number of games sent to a worker at a time.')
+@click.option('--seed',
+              default=None,
+              type=click.IntRange(0, MAX_SEED),
+              help='Seed for the batch, to make the results reproducible.')
+@click.option('--record',
+              default=None,
+              help='Directory to record every decision made into.')
+@click.option('--profile',
+              is_flag=True,
+              help="""Time the phases, card abilities, reshuffles and agent
+                   decisions of the games, and print a report.""")
+@click.option('--profile-output',
+              default=None,
+              help='File to save the profiling report to, as JSON.')
+@click.option('--tree-stats',
+              is_flag=True,
+              help="""Count the decisions of the games and their options,
+                   overall and by kingdom card, and print a report.""")
+@click.option('--tree-stats-output',
+              default=None,
+              help='File to save the game tree statistics to, as JSON.')
+def simulate_games(n_games, card_set, num_players, workers, chunksize, seed,
+                   record, profile, profile_output, tree_stats,
+                   tree_stats_output):
+    """Plays a batch of games between machine players without any output
+    during play, then prints win rates, scores and game lengths.
+    """
+    results = simulation.simulate(n_games=n_games,
+                                  n_players=num_players,
+                                  card_set=card_set,
+                                  n_workers=workers,
+                                  chunksize=chunksize,
+                                  seed=seed,
+                                  record_dir=record,
+                                  profile=profile or profile_output is not None,
+                                  tree_stats=(tree_stats or
+                                              tree_stats_output is not None))
+    results.display()
+    if results.profiler is not None:
+        print()
+        results.profiler.display()
+        if profile_output is not None:
+            results.profiler.save(profile_output)
+    if results.tree_stats is not None:
+        print()
+        results.tree_stats.display()
+        if tree_stats_output is not None:
+            results.tree_stats.save(tree_stats_output)
+
+
+@cli.command(name='tournament')
+@click.option('--agent',
+              'agents',
+              multiple=True,
+              required=True,
+              help="""An entrant: random, big_money, mcts, the name of a
+                   strategy (e.g. "Smithy Big Money"), or module:attribute.
+                   Repeat for each entrant.""")
+@click.option('--kingdom',
+              'kingdoms',
+              multiple=True,
+              default=['base'],
+              help="""A card set to play with: base, random, or a comma
+                   separated list of card names. Repeat for several.""")
+@click.option('--num-players',
+              default=2,
+              help='Number of players at each table.')
+@click.option('--pairing',
+              default='round-robin',
+              type=click.Choice(tournament.PAIRINGS),
+              help='How entrants are paired.')
+@click.option('--rounds',
+              default=3,
+              help='Number of rounds of a Swiss tournament.')
+@click.option('--games-per-pairing',
+              default=1,
+              help="""Number of games each table plays for every seat
+                   rotation and kingdom.""")
+@click.option('--workers',
+              default=None,
+              type=int,
+              help='Number of worker processes (default: one per CPU).')
+@click.option('--seed',
+              default=None,
+              type=click.IntRange(0, MAX_SEED),
+              help='Seed for the tournament, to make the results reproducible.')
+@click.option('--checkpoint',
+              default=None,
+              help="""File to save progress to. If it already exists, the
+                   tournament is resumed from it.""")
+def run_tournament(agents, kingdoms, num_players, pairing, rounds,
+                   games_per_pairing, workers, seed, checkpoint):
+    """Plays a tournament between machine players, with Elo ratings,
+    then prints the standings.
+    """
+    card_sets = []
+    for kingdom in kingdoms:
+        if kingdom in ('base', 'random'):
+            card_sets.append(kingdom)
+        else:
+            card_sets.append([name.strip() for name in kingdom.split(',')])
+
+    event = tournament.Tournament(entrants=agents,
+                                  kingdoms=card_sets,
+                                  n_players=num_players,
+                                  pairing=pairing,
+                                  n_rounds=rounds,
+                                  games_per_pairing=games_per_pairing,
+                                  seed=seed,
+                                  checkpoint_path=checkpoint)
+    if event.results:
+        print('Resuming from {} ({} games played).'.format(
+            checkpoint, len(event.results)))
+    event.run(n_workers=workers)
+    event.display()
+
+
+@cli.command(name='dataset')
+@click.argument('record_dir')
+@click.argument('output_dir')
+@click.option('--val-fraction',
+              default=0.05,
+              help='Fraction of games put in the validation set.')
+@click.option('--buffer-size',
+              default=100000,
+              help='Number of samples held by each shuffle buffer.')
+@click.option('--shard-size',
+              default=100000,
+              help='Number of samples in each shard.')
+@click.option('--seed',
+              default=None,
+              type=int,
+              help='Seed for the shuffling.')
+def build_dataset(record_dir, output_dir, val_fraction, buffer_size,
+                  shard_size, seed):
+    """Turns games recorded with simulate --record into shuffled
+    training and validation shards of (observation, action mask, action,
+    return) samples.
+    """
+    n_samples = dataset.build_dataset(record_dir, output_dir,
+                                      val_fraction=val_fraction,
+                                      buffer_size=buffer_size,
+                                      shard_size=shard_size,
+                                      seed=seed)
+    for split in dataset.SPLITS:
+        print('{}: {} samples'.format(split, n_samples[split]))
+
+
+@cli.command(name='keyframes')
+@click.argument('record_dir')
+@click.option('--interval',
+              default=10,
+              help='Number of turns between keyframes.')
+def build_keyframes(record_dir, interval):
+    """Replays the games recorded with simulate --record, checking that
+    they play out the same, and stores keyframes to seek them quickly.
+    """
+    n_games = replay.build_keyframe_index(record_dir, interval=interval)
+    print('Indexed {} games.'.format(n_games))
+
+
+@cli.command(name='replay')
+@click.argument('record_dir')
+@click.argument('game_id', type=int)
+@click.option('--turn',
+              default=0,
+              help='The turn to show, counted from 0.')
+def replay_game(record_dir, game_id, turn):
+    """Replays a game recorded with simulate --record, and shows the
+    state of the game at the start of a turn, then plays out the turn.
+    """
+    game_replay = replay.replay_game(record_dir, game_id)
+    game = game_replay.seek(turn)
+
+    print('Turn {}'.format(game.n_turns))
+    game.supply_piles.display_supply_pile_count()
+    for player in game.players:
+        print('')
+        print(str(player.player_id))
+        player.display_hand()
+        player.display_draw_pile()
+        player.display_discard_pile()
+    print('')
+
+    for game, decision, selection in game_replay.turn_steps(turn):
+        print('{} {}: {} -> {}'.format(decision.player.player_id,
+                                       decision.kind, decision.options,
+                                       selection))
+
+
 if __name__ == '__main__':
-    play_game()
+    cli()
@@ -1,6 +1,10 @@
 import random
+import time
+
+import numpy as np
 
 from dominion.cards import *
+from dominion.zobrist import OWNED_KEYS, HAND_KEYS
 
 
 class Player(object):
@@ -17,12 +21,46 @@ class Player(object):
         self.agent = agent
         self.game = game  # circular reference?
         self.turn_state = {}
-        self.deck = Deck()
+        self.deck = Deck(rng=game.rng)
         self.hand = Hand(self.deck)
 
         self.agent.player = self  # circular reference?
         self.hand.draw_hand()
 
+    def clone(self, game, agent):
+        '''Make a copy of the player for a copy of the game. The piles,
+        hand and tallies are copied, while the cards themselves are
+        shared, since every copy of a card is the same instance.
+
+        Args:
+            game (instance): The game that the copy is part of.
+            agent (instance): The agent that will make decisions for the
+            copy. Agents keep a reference to their player, so the copy
+            can not share this player's agent.
+
+        Return:
+            player (Player): The copy.
+        '''
+        player = Player.__new__(Player)
+        player.player_id = self.player_id
+        player.agent = agent
+        player.game = game
+        player.turn_state = dict(self.turn_state)
+        player.deck = self.deck.clone(rng=game.rng)
+        player.hand = self.hand.clone(player.deck)
+
+        agent.player = player
+        return player
+
+    @property
+    def victory_points(self):
+        '''int: The number of victory points in the player's deck.
+        Gardens count as 1 victory point for every 10 cards in the
+        player's deck. Computed from tallies kept by the deck, so no
+        cards need to be counted.'''
+        deck = self.deck
+        return deck.card_victory_points + deck.n_gardens * (deck.n_cards // 10)
+
     def display_deck(self):
         '''Print out the name of each card in the deck, in order.'''
         deck = self.deck.draw_pile + self.deck.discard_pile + self.hand.hand
@@ -32,9 +70,10 @@ class Player(object):
         print('Deck: ' + str(cards))
 
     def display_draw_pile(self):
-        '''Print out the name of each card in the draw pile, in order.'''
+        '''Print out the name of each card in the draw pile, in order,
+        starting from the top.'''
         cards = []
-        for card in self.deck.draw_pile:
+        for card in reversed(self.deck.draw_pile):
             cards.append(card.name)
         print('Draw Pile: ' + str(cards))
 
@@ -54,19 +93,195 @@ class Player(object):
 
 
 class Deck(object):
-    def __init__(self):
+    def __init__(self, rng=None):
         '''Initialize deck with 7 Coppers and 3 Estates, then shuffle.
-        Cards start in the draw pile.'''
+        Cards start in the draw pile.
+
+        The draw pile is used as a stack: its top card is the last
+        element of the list, so that drawing a card or putting one on
+        top of the deck does not have to move the rest of the pile.
+
+        `count_vector` holds the number of each card the player owns
+        (draw pile, discard pile and hand), indexed by card id. It is
+        updated whenever a card is gained or trashed, so cards must only
+        enter or leave the deck through the Deck and Hand methods. The
+        same goes for the total number of cards owned (`n_cards`), the
+        number of Gardens (`n_gardens`) and the victory points printed on
+        the cards owned (`card_victory_points`), and for `zobrist_hash`,
+        the sum of the hash keys of the cards owned (see zobrist.py).
+
+        If `undo_log` is a list, every change made by the Deck methods
+        appends an entry to it which reverses the change: a function
+        followed by its arguments. Game uses this to undo decisions.
+        Likewise, if `profiler` is a Profiler, reshuffles are timed with
+        it (see Game.set_profiler).
+
+        Args:
+            rng (random.Random): Random number generator used to shuffle
+            the deck, normally the game's. If None, the global random
+            module is used. Default: None.
+        '''
+        if rng is None:
+            rng = random
+
+        self.rng = rng
         self.draw_pile = [Copper()] * 7 + [Estate()] * 3
         self.discard_pile = []
+        self.undo_log = None
+        self.profiler = None
+
+        self.count_vector = np.zeros(N_CARDS, dtype=np.int16)
+        self.n_cards = 0
+        self.n_gardens = 0
+        self.card_victory_points = 0
+        self.zobrist_hash = 0
+        for card in self.draw_pile:
+            self._update_owned(card, 1)
 
         self.shuffle_deck()
 
+    def _update_owned(self, card, delta):
+        '''Update the tallies of the cards owned by the player.
+
+        Args:
+            card (instance): The card that was gained or trashed.
+            delta (int): 1 if the card was gained, -1 if it was trashed.
+        '''
+        if self.undo_log is not None:
+            self.undo_log.append((self._update_owned, card, -delta))
+        self.count_vector[card.card_id] += delta
+        self.zobrist_hash += OWNED_KEYS[card.card_id] * delta
+        self.n_cards += delta
+        if card.flags & (VICTORY | CURSE):
+            self.card_victory_points += card.victory_points * delta
+            if card.card_id == Gardens.card_id:
+                self.n_gardens += delta
+
+    def _recount(self, hand_cards):
+        '''Recompute the tallies of the cards owned by the player from
+        the draw pile, discard pile and hand, e.g. after the piles have
+        been restored from a snapshot.
+
+        Args:
+            hand_cards (list): The cards in the player's hand.
+        '''
+        self.count_vector[:] = 0
+        self.n_cards = 0
+        self.n_gardens = 0
+        self.card_victory_points = 0
+        self.zobrist_hash = 0
+        for pile in (self.draw_pile, self.discard_pile, hand_cards):
+            for card in pile:
+                self._update_owned(card, 1)
+
+    def clone(self, rng):
+        '''Make a copy of the deck, sharing the card instances.
+
+        Args:
+            rng (random.Random): Random number generator used to shuffle
+            the copy.
+
+        Return:
+            deck (Deck): The copy.
+        '''
+        deck = Deck.__new__(Deck)
+        deck.__dict__.update(self.__dict__)
+        deck.rng = rng
+        deck.undo_log = None
+        deck.profiler = None
+        deck.draw_pile = list(self.draw_pile)
+        deck.discard_pile = list(self.discard_pile)
+        deck.count_vector = self.count_vector.copy()
+        return deck
+
     def shuffle_deck(self):
         '''Transfer the discard pile into the draw pile, then shuffle'''
+        if self.profiler is not None:
+            start = time.perf_counter()
+        if self.undo_log is not None:
+            self.undo_log.append((self._unshuffle, tuple(self.draw_pile),
+                                  self.discard_pile, self.rng.getstate()))
         self.draw_pile += self.discard_pile
         self.discard_pile = []
-        random.shuffle(self.draw_pile)
+        self.rng.shuffle(self.draw_pile)
+        if self.profiler is not None:
+            self.profiler.add('shuffle', time.perf_counter() - start)
+
+    def _unshuffle(self, draw_cards, discard_pile, rng_state):
+        '''Reverse shuffle_deck, given the piles and the state of the
+        random number generator from before the shuffle.'''
+        self.draw_pile[:] = draw_cards
+        self.discard_pile = discard_pile
+        self.rng.setstate(rng_state)
+
+    def top_deck(self, card):
+        '''Put a card on top of the draw pile.
+
+        Args:
+            card (instance): The card to put on the draw pile.
+        '''
+        self.draw_pile.append(card)
+        if self.undo_log is not None:
+            self.undo_log.append((self.draw_pile.pop,))
+
+    def add_to_discard_pile(self, card):
+        '''Put a card on top of the discard pile. The card must already
+        be owned by the player, e.g. one taken out of the hand.
+
+        Args:
+            card (instance): The card to discard.
+        '''
+        self.discard_pile.append(card)
+        if self.undo_log is not None:
+            self.undo_log.append((self.discard_pile.pop,))
+
+    def discard_top_card(self):
+        '''Move the top card of the draw pile to the discard pile.'''
+        self.discard_pile.append(self.draw_pile.pop())
+        if self.undo_log is not None:
+            self.undo_log.append((self._undo_discard_top_card,))
+
+    def _undo_discard_top_card(self):
+        '''Reverse discard_top_card.'''
+        self.draw_pile.append(self.discard_pile.pop())
+
+    def gain_card(self, card, destination='discard_pile'):
+        '''Add a new card to the deck, e.g. one bought or gained from
+        the supply piles.
+
+        Args:
+            card (instance): The card being gained.
+            destination (str): Where the card is placed. Options are
+            'discard_pile' and 'draw_pile' (on top). Default:
+            'discard_pile'.
+        '''
+        if destination == 'discard_pile':
+            self.add_to_discard_pile(card)
+        elif destination == 'draw_pile':
+            self.top_deck(card)
+        else:
+            raise ValueError('Unsupported destination: {}.'.format(destination))
+        self._update_owned(card, 1)
+
+    def trash_card(self, card):
+        '''Remove a card from the discard pile and from the game.
+
+        Args:
+            card (instance): The card being trashed.
+
+        Return:
+            trashed (bool): False if the card was not in the discard
+            pile, in which case nothing is done.
+        '''
+        try:
+            i = self.discard_pile.index(card)
+        except ValueError:
+            return False
+        del self.discard_pile[i]
+        if self.undo_log is not None:
+            self.undo_log.append((self.discard_pile.insert, i, card))
+        self._update_owned(card, -1)
+        return True
 
 
 class Hand(object):
@@ -74,12 +289,173 @@ class Hand(object):
         '''Initializes a new hand, which contains the cards that
          the player can play each turn.
 
+        Alongside the ordered list of cards in `hand`, the hand keeps
+        running tallies which are updated by the methods that move cards
+        in and out of it:
+
+        - `count_vector`: the number of each card, indexed by card id.
+        - `card_counts`: the number of each distinct card in the hand,
+          keyed by card, in the order in which the cards first appear
+          in `hand`. Options offered from the hand follow this order.
+        - `coins`: the total value of the Treasure cards.
+        - `n_actions`: the number of Action cards.
+        - `zobrist_hash`: the sum of the hash keys of the cards (see
+          zobrist.py).
+
+        Like the deck, the hand appends entries which reverse its changes
+        to `undo_log` if it is a list.
+
         Args:
             deck (Deck instance): The deck that cards will be drawn from,
             and discarded to.
         '''
         self.hand = []
         self.deck = deck
+        self.count_vector = np.zeros(N_CARDS, dtype=np.int16)
+        self.card_counts = {}
+        self.coins = 0
+        self.n_actions = 0
+        self.zobrist_hash = 0
+        self.undo_log = None
+
+    def clone(self, deck):
+        '''Make a copy of the hand, sharing the card instances.
+
+        Args:
+            deck (Deck instance): The copy of the deck that the copy of
+            the hand belongs to.
+
+        Return:
+            hand (Hand): The copy.
+        '''
+        hand = Hand.__new__(Hand)
+        hand.__dict__.update(self.__dict__)
+        hand.deck = deck
+        hand.undo_log = None
+        hand.hand = list(self.hand)
+        hand.count_vector = self.count_vector.copy()
+        hand.card_counts = dict(self.card_counts)
+        return hand
+
+    def set_cards(self, cards):
+        '''Replace the contents of the hand, e.g. when restoring a
+        snapshot. The deck's tallies of the cards owned are not changed.
+
+        Args:
+            cards (list): The cards to put in the hand.
+        '''
+        self.hand = []
+        self.count_vector[:] = 0
+        self.card_counts.clear()
+        self.coins = 0
+        self.n_actions = 0
+        self.zobrist_hash = 0
+        self._add_cards(list(cards))
+
+    def _add_cards(self, cards):
+        '''Put cards into the hand, after any cards already there.'''
+        if self.undo_log is not None:
+            self.undo_log.append((self._remove_last_cards, len(cards)))
+        self.hand += cards
+        count_vector = self.count_vector
+        card_counts = self.card_counts
+        for card in cards:
+            count_vector[card.card_id] += 1
+            self.zobrist_hash += HAND_KEYS[card.card_id]
+            card_counts[card] = card_counts.get(card, 0) + 1
+            if card.flags & TREASURE:
+                self.coins += card.coins
+            elif card.flags & ACTION:
+                self.n_actions += 1
+
+    def _remove_last_cards(self, n):
+        '''Take the last n cards out of the hand, reversing _add_cards.'''
+        count_vector = self.count_vector
+        card_counts = self.card_counts
+        for card in self.hand[-n:]:
+            count_vector[card.card_id] -= 1
+            self.zobrist_hash -= HAND_KEYS[card.card_id]
+            count = card_counts[card]
+            if count == 1:
+                del card_counts[card]
+            else:
+                card_counts[card] = count - 1
+            if card.flags & TREASURE:
+                self.coins -= card.coins
+            elif card.flags & ACTION:
+                self.n_actions -= 1
+        if n > 0:
+            del self.hand[-n:]
+
+    def remove_card(self, card):
+        '''Take a card out of the hand. The caller is responsible for
+        putting it somewhere else.
+
+        Args:
+            card (instance): The card to remove.
+        '''
+        # The first copy of the card is removed, so if there are others,
+        # the card moves in card_counts to where the next copy is.
+        i = self.hand.index(card)
+        del self.hand[i]
+        self.count_vector[card.card_id] -= 1
+        self.zobrist_hash -= HAND_KEYS[card.card_id]
+
+        count = self.card_counts[card]
+        if count == 1:
+            reorder = True
+            del self.card_counts[card]
+        else:
+            self.card_counts[card] = count - 1
+            reorder = self.hand[i] is not card
+            if reorder:
+                self._order_card_counts()
+        if self.undo_log is not None:
+            self.undo_log.append((self._insert_card, i, card, reorder))
+
+        if card.flags & TREASURE:
+            self.coins -= card.coins
+        elif card.flags & ACTION:
+            self.n_actions -= 1
+
+    def _insert_card(self, i, card, reorder):
+        '''Put a card back into the hand at position i, reversing
+        remove_card. reorder indicates whether removing the card changed
+        the order of card_counts.'''
+        self.hand.insert(i, card)
+        self.count_vector[card.card_id] += 1
+        self.zobrist_hash += HAND_KEYS[card.card_id]
+
+        self.card_counts[card] = self.card_counts.get(card, 0) + 1
+        if reorder:
+            self._order_card_counts()
+
+        if card.flags & TREASURE:
+            self.coins += card.coins
+        elif card.flags & ACTION:
+            self.n_actions += 1
+
+    def _order_card_counts(self):
+        '''Put card_counts back in the order in which the cards first
+        appear in the hand.'''
+        card_counts = self.card_counts
+        order = dict.fromkeys(self.hand)
+        self.card_counts = dict((card, card_counts[card]) for card in order)
+
+    def find_card(self, card_name):
+        '''Find a card in the hand by name.
+
+        Args:
+            card_name (str): The name of the card.
+
+        Return:
+            card (instance): The card, or None if there is no card with
+            that name in the hand.
+        '''
+        for card in self.card_counts:
+            if card.name == card_name:
+                return card
+        return None
 
     def draw_card(self):
         '''Move a single card from the draw pile to the player's hand.
@@ -90,17 +466,114 @@ class Hand(object):
             self.deck.shuffle_deck()
 
         if len(self.deck.draw_pile) > 0:
-            next_card = self.deck.draw_pile.pop(0)
-            self.hand.append(next_card)
+            next_card = self.deck.draw_pile.pop()
+            if self.undo_log is not None:
+                self.undo_log.append((self.deck.draw_pile.append, next_card))
+            self._add_cards([next_card])
+
+    def draw_cards(self, n):
+        '''Move n cards from the draw pile to the player's hand, in the
+        same order as drawing them one at a time. If the draw pile runs
+        out part way through, the deck is reshuffled once and drawing
+        continues. If there are not enough cards available, as many as
+        possible are drawn.
+
+        Args:
+            n (int): The number of cards to draw.
+        '''
+        if n <= 0:
+            return
+
+        draw_pile = self.deck.draw_pile
+        drawn = []
+        if len(draw_pile) < n:
+            n -= len(draw_pile)
+            if self.undo_log is not None:
+                self.undo_log.append((draw_pile.extend, tuple(draw_pile)))
+            draw_pile.reverse()
+            drawn += draw_pile
+            del draw_pile[:]
+
+            self.deck.shuffle_deck()
+            draw_pile = self.deck.draw_pile
+            n = min(n, len(draw_pile))
+
+        if n > 0:
+            # The top of the draw pile is the end of the list, so the
+            # last n cards are taken in reverse order.
+            drawn += draw_pile[:-n - 1:-1]
+            if self.undo_log is not None:
+                self.undo_log.append((draw_pile.extend, draw_pile[-n:]))
+            del draw_pile[-n:]
+        self._add_cards(drawn)
 
     def draw_hand(self):
         '''Move 5 cards from the draw pile to the player's hand'''
         assert len(self.hand) == 0, 'Hand must be empty before drawing a new one'
 
-        for i in range(5):
-            self.draw_card()
+        self.draw_cards(5)
 
     def discard_hand(self):
         '''Move cards from the hand into discard pile'''
+        if self.undo_log is not None:
+            self.undo_log.append((self._undo_discard_hand, self.hand,
+                                  self.card_counts, self.coins,
+                                  self.n_actions))
         self.deck.discard_pile += self.hand
         self.hand = []
+        self.count_vector[:] = 0
+        self.card_counts = {}
+        self.coins = 0
+        self.n_actions = 0
+        self.zobrist_hash = 0
+
+    def _undo_discard_hand(self, hand, card_counts, coins, n_actions):
+        '''Reverse discard_hand, given the hand's contents and tallies
+        from before it was discarded.'''
+        if hand:
+            del self.deck.discard_pile[-len(hand):]
+        self.hand = hand
+        for card in hand:
+            self.count_vector[card.card_id] += 1
+            self.zobrist_hash += HAND_KEYS[card.card_id]
+        self.card_counts = card_counts
+        self.coins = coins
+        self.n_actions = n_actions
+
+    def discard_card(self, card):
+        '''Move a card from the hand into the discard pile. This is also
+        where cards go when they are played.
+
+        Args:
+            card (instance): The card to discard.
+        '''
+        self.remove_card(card)
+        self.deck.add_to_discard_pile(card)
+
+    def trash_card(self, card):
+        '''Remove a card from the hand and from the game.
+
+        Args:
+            card (instance): The card to trash.
+        '''
+        self.remove_card(card)
+        self.deck._update_owned(card, -1)
+
+    def top_deck_card(self, card):
+        '''Move a card from the hand to the top of the draw pile.
+
+        Args:
+            card (instance): The card to put back on the deck.
+        '''
+        self.remove_card(card)
+        self.deck.top_deck(card)
+
+    def gain_card(self, card):
+        '''Add a new card, e.g. one gained from the supply piles,
+        directly to the hand.
+
+        Args:
+            card (instance): The card being gained.
+        '''
+        self._add_cards([card])
+        self.deck._update_owned(card, 1)
@@ -0,0 +1,132 @@
+"""Collects wall time and call counts for parts of the game engine, to
+find out whether a slow batch of games is spent in the engine, a
+particular card, or an agent.
+
+Profiling is opt-in: a Profiler is attached to a game with
+Game.set_profiler, and a game without one only checks for it at each
+hook. Timings are kept under names such as:
+
+- 'game': whole games played with Game.play_game.
+- 'phase: action' and 'phase: buy': action and buy phases.
+- 'card: <name>': the special ability of a card.
+- 'shuffle': reshuffles of a player's deck.
+- 'agent: <class>.select_<kind>': an agent making a decision.
+
+The times of games, phases and card abilities include the decisions made
+during them, which are also timed separately under 'agent: ...'.
+"""
+import json
+import time
+
+
+class Profiler(object):
+    def __init__(self):
+        '''Totals of the number of calls (`calls`) and the wall time in
+        seconds (`seconds`) for each part of the engine timed, keyed by
+        name. Profilers filled in separately (e.g. by different worker
+        processes) can be combined with `merge`.'''
+        self.calls = {}
+        self.seconds = {}
+
+    def add(self, name, seconds):
+        '''Record a call.
+
+        Args:
+            name (str): What was called.
+            seconds (float): How long it took.
+        '''
+        self.calls[name] = self.calls.get(name, 0) + 1
+        self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def time_steps(self, name, steps):
+        '''Run game steps (see Game.play_game_steps), passing on their
+        decisions, and record the time taken from start to end.
+
+        Args:
+            name (str): The name to record the time under.
+            steps (generator): The steps to run.
+
+        Return:
+            result: The return value of the steps.
+        '''
+        start = time.perf_counter()
+        result = yield from steps
+        self.add(name, time.perf_counter() - start)
+        return result
+
+    def time_ability(self, card, game, player):
+        '''Trigger a card's special ability, passing on the decisions it
+        asks for, and record the time taken.
+
+        Args:
+            card (instance): The card being played.
+            game (Game): The game.
+            player (Player): The player who played the card.
+        '''
+        start = time.perf_counter()
+        steps = card.effect.special_ability(game, player)
+        if steps is not None:
+            yield from steps
+        self.add('card: ' + card.name, time.perf_counter() - start)
+
+    def time_decision(self, decision):
+        '''Ask an agent to make a decision, and record the time taken.
+
+        Args:
+            decision (Decision): The decision.
+
+        Return:
+            selection (str): The option selected.
+        '''
+        start = time.perf_counter()
+        selection = decision.ask_agent()
+        self.add('agent: {}.select_{}'.format(
+            type(decision.player.agent).__name__, decision.kind),
+            time.perf_counter() - start)
+        return selection
+
+    def merge(self, other):
+        '''Add the timings collected by another Profiler to this one.
+
+        Args:
+            other (Profiler): The timings to merge in.
+        '''
+        for name, calls in other.calls.items():
+            self.calls[name] = self.calls.get(name, 0) + calls
+            self.seconds[name] = self.seconds.get(name, 0.0) + \
+                other.seconds[name]
+
+    def report(self):
+        '''Summarize the timings, slowest first.
+
+        Return:
+            report (list): Contains a dict for each name, with its
+            'name', number of 'calls', total 'seconds' and
+            'mean_microseconds' per call.
+        '''
+        report = [{'name': name,
+                   'calls': self.calls[name],
+                   'seconds': self.seconds[name],
+                   'mean_microseconds': 1e6 * self.seconds[name] /
+                   self.calls[name]}
+                  for name in self.calls]
+        report.sort(key=lambda entry: -entry['seconds'])
+        return report
+
+    def display(self):
+        '''Print out the report.'''
+        print('{:<40} {:>10} {:>10} {:>12}'.format('Profile', 'calls',
+                                                 'seconds', 'mean (us)'))
+        for entry in self.report():
+            print('{:<40} {:>10} {:>10.3f} {:>12.1f}'.format(
+                entry['name'], entry['calls'], entry['seconds'],
+                entry['mean_microseconds']))
+
+    def save(self, path):
+        '''Write the report to a file, as JSON.
+
+        Args:
+            path (str): The file to write.
+        '''
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
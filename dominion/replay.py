@@ -0,0 +1,318 @@
+"""Replays recorded games (see trajectory.py) without any agents, to
+reconstruct the state of a game at any turn.
+
+A game is replayed from its seed, by sending the recorded choices into
+Game.play_game_steps in place of the agents' decisions. Each decision the
+replay asks for is checked against the recording, so a change to the
+rules which makes a game play out differently is caught at the first
+decision it affects.
+
+To seek without replaying a whole game, keyframes (snapshots of the game
+at the start of every few turns) can be stored alongside each shard:
+`<shard>.keyframes` holds the pickled keyframes of each game, one after
+another, and `<shard>.keyframe_index` one KEYFRAME_INDEX_DTYPE record per
+game giving where they are, so that only one game's keyframes are read.
+"""
+import collections
+import os
+import pickle
+
+import numpy as np
+
+from dominion.env import ACTION_NAMES, DECISION_KINDS
+from dominion.game import Game
+from dominion.trajectory import (CARD_SETS, TrajectoryReader, decode_options,
+                                 kingdom_cards, options_mask)
+
+# A snapshot of a game at the start of a turn, and the index of the first
+# recorded decision after it.
+Keyframe = collections.namedtuple('Keyframe', ['turn', 'decision_index',
+                                               'snapshot'])
+
+KEYFRAME_INDEX_DTYPE = np.dtype([('game_id', '<u8'),
+                                 ('offset', '<u8'),
+                                 ('length', '<u4')])
+
+
+class Replay(object):
+    def __init__(self, game_record, decisions, keyframes=None):
+        '''Replay of a recorded game.
+
+        Args:
+            game_record (numpy.void): The game's record. The game must
+            have been seeded.
+            decisions (numpy.ndarray): The game's decision records.
+            keyframes (list): Keyframes of the game, e.g. from
+            load_keyframes. Default: None (seek from the start).
+        '''
+        if not game_record['seeded']:
+            raise ValueError('Game {} was not seeded, so it can not be '
+                             'replayed.'.format(int(game_record['game_id'])))
+
+        self.game_id = int(game_record['game_id'])
+        self.seed = int(game_record['seed'])
+        self.n_players = int(game_record['n_players'])
+        self.n_turns = int(game_record['n_turns'])
+        self.scores = [int(score) for score
+                       in game_record['scores'][:self.n_players]]
+        card_set = CARD_SETS[game_record['card_set']]
+        if card_set == 'list':
+            card_set = kingdom_cards(game_record['kingdom'])
+        self.card_set = card_set
+
+        self.turns = decisions['turn'].tolist()
+        self.kinds = [DECISION_KINDS[kind] for kind in decisions['kind']]
+        self.options = decisions['options'].tolist()
+        self.choices = [ACTION_NAMES[choice] for choice in decisions['choice']]
+        self.keyframes = sorted(keyframes or [], key=lambda frame: frame.turn)
+
+    def new_game(self):
+        '''Create the game as it was at the start.'''
+        return Game(n_players=self.n_players, card_set=self.card_set,
+                    seed=self.seed)
+
+    def seek(self, turn):
+        '''Reconstruct the game at the start of a turn, by restoring the
+        last keyframe before it and replaying from there.
+
+        Args:
+            turn (int): The turn, counted as in Game.n_turns from 0.
+
+        Return:
+            game (Game): The game, before the turn is taken.
+        '''
+        return self._seek(turn)[0]
+
+    def _seek(self, turn):
+        '''Reconstruct the game at the start of a turn.
+
+        Return:
+            game (Game): The game.
+            decision_index (int): The index of the turn's first recorded
+            decision.
+        '''
+        game = self.new_game()
+        start = None
+        for keyframe in self.keyframes:
+            if keyframe.turn > turn:
+                break
+            start = keyframe
+
+        decision_index = 0
+        if start is not None:
+            game.restore(start.snapshot)
+            decision_index = start.decision_index
+        return game, self._run(game, decision_index, max_turns=turn)
+
+    def turn_steps(self, turn):
+        '''Replay a single turn decision by decision, e.g. to watch a card
+        resolve. Setting the game's `verbose` flag before continuing
+        prints the turn as it is played.
+
+        Args:
+            turn (int): The turn to replay.
+
+        Yields:
+            game (Game): The game, as it was when the decision was asked
+            for.
+            decision (Decision): The decision.
+            selection (str): The option that was selected.
+        '''
+        game, decision_index = self._seek(turn)
+        steps = game.play_game_steps(max_turns=turn + 1)
+        selection = None
+        while True:
+            try:
+                decision = steps.send(selection)
+            except StopIteration:
+                return
+            self._check(decision, decision_index)
+            selection = self.choices[decision_index]
+            decision_index += 1
+            yield game, decision, selection
+
+    def play(self):
+        '''Replay the whole game, and check that it ends with the
+        recorded scores.
+
+        Return:
+            victory_point_count (dict): The final score of each player.
+        '''
+        game = self.new_game()
+        return self._finish(game, 0)
+
+    def build_keyframes(self, interval=10):
+        '''Replay the whole game, taking a keyframe at the start of every
+        interval turns, and check that it ends with the recorded scores.
+        Each keyframe is checked to restore to the game it was taken
+        from, so that seeking from it reaches the same state as
+        replaying from the start.
+
+        Args:
+            interval (int): The number of turns between keyframes.
+            Default: 10.
+
+        Return:
+            keyframes (list): The keyframes, which are also kept for
+            seeking.
+        '''
+        game = self.new_game()
+        decision_index = 0
+        keyframes = []
+        for turn in range(interval, self.n_turns, interval):
+            decision_index = self._run(game, decision_index, max_turns=turn)
+            keyframe = Keyframe(turn, decision_index, game.snapshot())
+            self._check_keyframe(game, keyframe)
+            keyframes.append(keyframe)
+        self._finish(game, decision_index)
+
+        self.keyframes = keyframes
+        return keyframes
+
+    def _check_keyframe(self, game, keyframe):
+        '''Check that restoring a keyframe gives the game it was taken
+        from: the same state_hash, and the cards in each hand in the same
+        order (which decides the order of the options offered).'''
+        restored = self.new_game()
+        restored.restore(keyframe.snapshot)
+        hands = [list(player.hand.card_counts) for player in game.players]
+        restored_hands = [list(player.hand.card_counts)
+                          for player in restored.players]
+        if (restored.state_hash != game.state_hash or
+                restored_hands != hands):
+            raise ValueError('The keyframe of game {} at turn {} does not '
+                             'restore to the game replayed from the '
+                             'start.'.format(self.game_id, keyframe.turn))
+
+    def _finish(self, game, decision_index):
+        '''Replay the rest of the game, and check the final scores.'''
+        steps = game.play_game_steps(max_turns=self.n_turns)
+        victory_point_count = self._send_choices(game, steps, decision_index)[1]
+        scores = [victory_point_count[str(player.player_id)]
+                  for player in game.players]
+        if scores != self.scores:
+            raise ValueError('Replay of game {} ended with scores {}, but '
+                             '{} were recorded.'.format(self.game_id, scores,
+                                                        self.scores))
+        return victory_point_count
+
+    def _run(self, game, decision_index, max_turns):
+        '''Replay the game until the start of turn max_turns.
+
+        Return:
+            decision_index (int): The index of the next decision.
+        '''
+        steps = game.play_game_steps(max_turns=max_turns)
+        return self._send_choices(game, steps, decision_index)[0]
+
+    def _send_choices(self, game, steps, decision_index):
+        '''Run game steps to the end, sending them the recorded choices.
+
+        Return:
+            decision_index (int): The index of the next decision.
+            result: The return value of the steps.
+        '''
+        selection = None
+        while True:
+            try:
+                decision = steps.send(selection)
+            except StopIteration as stop:
+                return decision_index, stop.value
+            self._check(decision, decision_index)
+            selection = self.choices[decision_index]
+            decision_index += 1
+
+    def _check(self, decision, decision_index):
+        '''Check that a decision asked for by the replay is the one
+        recorded.'''
+        if decision_index >= len(self.choices):
+            raise ValueError('Replay of game {} asked for more decisions '
+                             'than were recorded.'.format(self.game_id))
+        if (decision.kind != self.kinds[decision_index] or
+                options_mask(decision.options) !=
+                self.options[decision_index]):
+            raise ValueError('Replay of game {} diverged at decision {} (turn '
+                             '{}): asked for {} with options {}, but {} with '
+                             'options {} was recorded.'.format(
+                                 self.game_id, decision_index,
+                                 self.turns[decision_index], decision.kind,
+                                 decision.options, self.kinds[decision_index],
+                                 decode_options(self.options[decision_index])))
+
+
+def build_keyframe_index(record_dir, interval=10):
+    '''Replay every seeded game in a directory of recorded games, and
+    store keyframes for them next to each shard.
+
+    Args:
+        record_dir (str): The directory of recorded games.
+        interval (int): The number of turns between keyframes. Default:
+        10.
+
+    Return:
+        n_games (int): The number of games indexed.
+    '''
+    reader = TrajectoryReader(record_dir)
+    n_games = 0
+    for (games, decisions), shard_path in zip(reader.shards,
+                                              reader.shard_paths):
+        index = []
+        with open(shard_path + '.keyframes', 'wb') as f:
+            for game in games:
+                if not game['seeded']:
+                    continue
+                first = int(game['first_decision'])
+                replay = Replay(game, decisions[first:first +
+                                                int(game['n_decisions'])])
+                data = pickle.dumps(replay.build_keyframes(interval),
+                                    protocol=pickle.HIGHEST_PROTOCOL)
+                index.append((game['game_id'], f.tell(), len(data)))
+                f.write(data)
+        np.array(index, dtype=KEYFRAME_INDEX_DTYPE).tofile(
+            shard_path + '.keyframe_index')
+        n_games += len(index)
+    return n_games
+
+
+def load_keyframes(reader, game_id):
+    '''Load the keyframes stored for a game, if there are any.
+
+    Args:
+        reader (TrajectoryReader): The reader of the game's directory.
+        game_id (int): The game's game_id.
+
+    Return:
+        keyframes (list): The game's keyframes, or an empty list if none
+        were stored.
+    '''
+    shard, _ = reader.locate_game(game_id)
+    shard_path = reader.shard_paths[shard]
+    if not os.path.exists(shard_path + '.keyframe_index'):
+        return []
+
+    index = np.fromfile(shard_path + '.keyframe_index',
+                        dtype=KEYFRAME_INDEX_DTYPE)
+    matches = np.flatnonzero(index['game_id'] == game_id)
+    if len(matches) == 0:
+        return []
+    entry = index[matches[0]]
+    with open(shard_path + '.keyframes', 'rb') as f:
+        f.seek(int(entry['offset']))
+        return pickle.loads(f.read(int(entry['length'])))
+
+
+def replay_game(record_dir, game_id):
+    '''Set up the replay of a recorded game, with its keyframes if they
+    were stored.
+
+    Args:
+        record_dir (str): The directory of recorded games.
+        game_id (int): The game's game_id.
+
+    Return:
+        replay (Replay): The replay.
+    '''
+    reader = TrajectoryReader(record_dir)
+    game_record, decisions = reader.find_game(game_id)
+    return Replay(game_record, decisions,
+                  keyframes=load_keyframes(reader, game_id))
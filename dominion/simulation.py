@@ -0,0 +1,302 @@
+"""Runs batches of headless games across a pool of worker processes, and
+aggregates the results.
+"""
+import multiprocessing
+import random
+
+from dominion.game import Game, check_seed, split_seed
+from dominion.profiler import Profiler
+from dominion.trajectory import TrajectoryWriter
+from dominion.tree_stats import TreeStats
+
+
+class SimulationResults(object):
+    def __init__(self):
+        '''Aggregated results of a batch of games. Results collected
+        separately (e.g. by different worker processes) can be combined
+        with `merge`.
+
+        Ties are shared: if k players have the highest score, each of
+        them is credited with 1/k of a win.
+
+        If the games were profiled, `profiler` holds their timings (see
+        profiler.py), and is otherwise None. Likewise, `tree_stats` holds
+        their game tree statistics if they were collected (see
+        tree_stats.py).
+        '''
+        self.n_games = 0
+        self.wins = {}
+        self.scores = {}
+        self.game_lengths = {}
+        self.profiler = None
+        self.tree_stats = None
+
+    def add_game(self, victory_point_count, n_turns):
+        '''Record the outcome of a single game.
+
+        Args:
+            victory_point_count (dict): The final score for each player,
+            as returned by Game.play_game.
+            n_turns (int): The number of turns taken in the game, summed
+            over all players.
+        '''
+        self.n_games += 1
+
+        best_score = max(victory_point_count.values())
+        winners = [player_id for player_id, score
+                   in victory_point_count.items()
+                   if score == best_score]
+
+        for player_id, score in victory_point_count.items():
+            self.wins.setdefault(player_id, 0.0)
+            if player_id in winners:
+                self.wins[player_id] += 1.0 / len(winners)
+
+            score_counts = self.scores.setdefault(player_id, {})
+            score_counts[score] = score_counts.get(score, 0) + 1
+
+        self.game_lengths[n_turns] = self.game_lengths.get(n_turns, 0) + 1
+
+    def merge(self, other):
+        '''Add the results collected in another SimulationResults to
+        this one.
+
+        Args:
+            other (instance): The results to merge in.
+        '''
+        self.n_games += other.n_games
+
+        for player_id, wins in other.wins.items():
+            self.wins[player_id] = self.wins.get(player_id, 0.0) + wins
+
+        for player_id, other_counts in other.scores.items():
+            score_counts = self.scores.setdefault(player_id, {})
+            for score, count in other_counts.items():
+                score_counts[score] = score_counts.get(score, 0) + count
+
+        for n_turns, count in other.game_lengths.items():
+            self.game_lengths[n_turns] = \
+                self.game_lengths.get(n_turns, 0) + count
+
+        if other.profiler is not None:
+            if self.profiler is None:
+                self.profiler = Profiler()
+            self.profiler.merge(other.profiler)
+
+        if other.tree_stats is not None:
+            if self.tree_stats is None:
+                self.tree_stats = TreeStats()
+            self.tree_stats.merge(other.tree_stats)
+
+    @property
+    def win_rates(self):
+        '''dict: The fraction of games won by each player.'''
+        return dict((player_id, wins / self.n_games)
+                    for player_id, wins in self.wins.items())
+
+    @property
+    def mean_scores(self):
+        '''dict: The mean final score of each player.'''
+        return dict((player_id, _mean(score_counts))
+                    for player_id, score_counts in self.scores.items())
+
+    @property
+    def mean_game_length(self):
+        '''float: The mean number of turns per game.'''
+        return _mean(self.game_lengths)
+
+    def display(self):
+        '''Print out a summary of the results.'''
+        if self.n_games == 0:
+            print('No games played.')
+            return
+
+        print('Games: {}'.format(self.n_games))
+        print('Game length (turns): mean {:.1f}, min {}, max {}'.format(
+            self.mean_game_length, min(self.game_lengths),
+            max(self.game_lengths)))
+
+        win_rates = self.win_rates
+        mean_scores = self.mean_scores
+        for player_id in sorted(self.scores):
+            score_counts = self.scores[player_id]
+            print('{}: win rate {:.3f}, score mean {:.1f}, min {}, '
+                  'max {}'.format(player_id, win_rates[player_id],
+                                  mean_scores[player_id], min(score_counts),
+                                  max(score_counts)))
+
+
+def _mean(value_counts):
+    '''Mean of a distribution stored as a dict of value: count.'''
+    total = sum(value_counts.values())
+    return float(sum(value * count for value, count
+                     in value_counts.items())) / total
+
+
+# Game settings for the current worker process, set once when the worker
+# starts so that each task only has to carry the number of games to play.
+_worker_settings = {}
+
+
+def _init_worker(n_players, card_set, agent_factories, seed, record_dir,
+                 profile, tree_stats):
+    '''Prepare a worker process to play games with the given settings.
+
+    Workers forked from the parent process inherit its global random
+    state, so it is reseeded here to keep workers from playing identical
+    games.
+    '''
+    random.seed()
+    _set_worker_settings(n_players, card_set, agent_factories, seed,
+                         record_dir, profile, tree_stats)
+
+
+def _set_worker_settings(n_players, card_set, agent_factories, seed,
+                         record_dir, profile, tree_stats):
+    '''Store the settings used by _play_games in this process.'''
+    _worker_settings['n_players'] = n_players
+    _worker_settings['card_set'] = card_set
+    _worker_settings['agent_factories'] = agent_factories
+    _worker_settings['seed'] = seed
+    _worker_settings['record_dir'] = record_dir
+    _worker_settings['profile'] = profile
+    _worker_settings['tree_stats'] = tree_stats
+
+
+def _play_games(chunk):
+    '''Play a chunk of games using the worker's settings.
+
+    Args:
+        chunk (tuple): The index of the first game in the chunk (within
+        the whole batch), and the number of games to play.
+
+    Return:
+        results (SimulationResults): The results of the games played.
+    '''
+    first_game, n_games = chunk
+    agent_factories = _worker_settings['agent_factories']
+    seed = _worker_settings['seed']
+    record_dir = _worker_settings['record_dir']
+    results = SimulationResults()
+    if _worker_settings['profile']:
+        results.profiler = Profiler()
+    if _worker_settings['tree_stats']:
+        results.tree_stats = TreeStats()
+
+    writer = None
+    if record_dir is not None:
+        # Named after the chunk, so that workers never share a file
+        writer = TrajectoryWriter(record_dir,
+                                  prefix='games-{:010d}'.format(first_game))
+
+    for game_index in range(first_game, first_game + n_games):
+        agents = dict((player_id, agent_factory())
+                      for player_id, agent_factory
+                      in agent_factories.items())
+        if seed is None:
+            game_seed = None
+        else:
+            game_seed = split_seed(seed, game_index)
+        game = Game(n_players=_worker_settings['n_players'],
+                    agents=agents,
+                    card_set=_worker_settings['card_set'],
+                    seed=game_seed)
+        if writer is not None:
+            writer.start_game(game, game_id=game_index)
+        if results.profiler is not None:
+            game.set_profiler(results.profiler)
+        if results.tree_stats is not None:
+            results.tree_stats.start_game(game)
+        victory_point_count = game.play_game()
+        results.add_game(victory_point_count, game.n_turns)
+
+    if writer is not None:
+        writer.close()
+    return results
+
+
+def _split_games(n_games, chunksize):
+    '''Split n_games into chunks of at most chunksize games.
+
+    Return:
+        chunks (list): Contains a tuple for each chunk, with the index
+        of its first game and its number of games.
+    '''
+    return [(first_game, min(chunksize, n_games - first_game))
+            for first_game in range(0, n_games, chunksize)]
+
+
+def simulate(n_games, n_players=2, card_set='random', agent_factories=None,
+             n_workers=None, chunksize=None, seed=None, record_dir=None,
+             profile=False, tree_stats=False):
+    '''Play a batch of games without any human players, spread across a
+    pool of worker processes.
+
+    Args:
+        n_games (int): Number of games to play.
+        n_players (int): Number of players in each game. Default: 2.
+        card_set (str): The card set to play with, as for Game.
+        Default: 'random'.
+        agent_factories (dict): Maps a player_id to a callable which
+        returns a new agent for that player, e.g. an Agent subclass.
+        A new agent is created for every game. Seats without a factory
+        are filled with RandomAgents. Factories must be picklable.
+        Default: None.
+        n_workers (int): Number of worker processes. If 1, games are
+        played in the current process. Default: one per CPU.
+        chunksize (int): Number of games sent to a worker at a time.
+        Default: enough for about four chunks per worker.
+        seed (int): Seed for the batch, between 0 and game.MAX_SEED.
+        Game i of the batch is played with seed split_seed(seed, i),
+        however the games are divided between workers, so a single game
+        can be replayed by creating a Game with that seed. The results
+        are reproducible as long as the agents are deterministic given
+        the game (e.g. the RandomAgents filling empty seats, which are
+        seeded by the game with game.agent_seed). If None, games are
+        seeded randomly. Default: None.
+        record_dir (str): If given, every decision made is recorded into
+        binary shards in this directory (see trajectory.py), with each
+        game's index in the batch as its game_id. Default: None.
+        profile (bool): Whether to time the games' phases, card
+        abilities, reshuffles and agent decisions, into the results'
+        `profiler`. Default: False.
+        tree_stats (bool): Whether to count the games' decisions and
+        their options, into the results' `tree_stats`. Default: False.
+
+    Return:
+        results (SimulationResults): Win rates, score distributions and
+        game lengths aggregated over all games.
+    '''
+    if agent_factories is None:
+        agent_factories = {}
+    if n_workers is None:
+        n_workers = multiprocessing.cpu_count()
+    if chunksize is None:
+        chunksize = max(1, n_games // (4 * n_workers))
+
+    assert n_workers >= 1, 'n_workers must be at least 1'
+    assert chunksize >= 1, 'chunksize must be at least 1'
+    check_seed(seed)
+
+    chunks = _split_games(n_games, chunksize)
+    settings = (n_players, card_set, agent_factories, seed, record_dir,
+                profile, tree_stats)
+    results = SimulationResults()
+
+    if n_workers == 1:
+        _set_worker_settings(*settings)
+        for chunk in chunks:
+            results.merge(_play_games(chunk))
+        return results
+
+    pool = multiprocessing.Pool(processes=n_workers,
+                                initializer=_init_worker,
+                                initargs=settings)
+    try:
+        for chunk_results in pool.imap_unordered(_play_games, chunks):
+            results.merge(chunk_results)
+    finally:
+        pool.close()
+        pool.join()
+
+    return results
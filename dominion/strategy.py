@@ -0,0 +1,88 @@
+"""Scripted strategies, declared as priority rules for which cards to buy
+and which actions to play. The same strategy can be simulated by the fast
+array-based engine, or played in a normal game by a rule-table agent.
+"""
+import collections
+
+from dominion.cards import CARDS_BY_NAME
+
+
+class BuyRule(collections.namedtuple('BuyRule', ['card', 'min_coins', 'pile',
+                                                 'min_left', 'max_left',
+                                                 'max_owned'])):
+    '''A rule to buy a card when some conditions hold. A strategy's rules
+    are checked in order, and the first rule which holds, for a card the
+    player can afford and which is still in the supply, is used.
+
+    Args:
+        card (str): The name of the card to buy.
+        min_coins (int): Only buy with at least this many coins. Default:
+        the cost of the card.
+        pile (str): The supply pile which min_left and max_left refer
+        to. Default: 'Province'.
+        min_left (int): Only buy while at least this many cards are left
+        in the pile. Default: None (no limit).
+        max_left (int): Only buy once at most this many cards are left
+        in the pile. Default: None (no limit).
+        max_owned (int): Only buy while the player owns fewer than this
+        many copies of the card. Default: None (no limit).
+    '''
+    __slots__ = ()
+
+    def __new__(cls, card, min_coins=None, pile='Province', min_left=None,
+                max_left=None, max_owned=None):
+        if card not in CARDS_BY_NAME:
+            raise ValueError('Unknown card: {}.'.format(card))
+        if min_coins is None:
+            min_coins = CARDS_BY_NAME[card].cost
+        return super(BuyRule, cls).__new__(cls, card, min_coins, pile,
+                                           min_left, max_left, max_owned)
+
+
+# A strategy: its buy rules in order of priority, and the action cards it
+# plays, in order of priority. Action cards which are not listed are never
+# played.
+Strategy = collections.namedtuple('Strategy', ['name', 'buy_rules',
+                                               'action_priority'])
+
+
+BIG_MONEY = Strategy(
+    name='Big Money',
+    buy_rules=(BuyRule('Province'),
+               BuyRule('Gold'),
+               BuyRule('Silver')),
+    action_priority=())
+
+BIG_MONEY_ULTIMATE = Strategy(
+    name='Big Money Ultimate',
+    buy_rules=(BuyRule('Province'),
+               BuyRule('Duchy', max_left=4),
+               BuyRule('Estate', max_left=2),
+               BuyRule('Gold'),
+               BuyRule('Duchy', max_left=6),
+               BuyRule('Silver')),
+    action_priority=())
+
+SMITHY_BIG_MONEY = Strategy(
+    name='Smithy Big Money',
+    buy_rules=(BuyRule('Province'),
+               BuyRule('Duchy', max_left=4),
+               BuyRule('Estate', max_left=2),
+               BuyRule('Gold'),
+               BuyRule('Smithy', max_owned=1),
+               BuyRule('Silver')),
+    action_priority=('Smithy',))
+
+WITCH_BIG_MONEY = Strategy(
+    name='Witch Big Money',
+    buy_rules=(BuyRule('Province'),
+               BuyRule('Duchy', max_left=4),
+               BuyRule('Estate', max_left=2),
+               BuyRule('Witch', max_owned=2),
+               BuyRule('Gold'),
+               BuyRule('Silver')),
+    action_priority=('Witch',))
+
+STRATEGIES = dict((strategy.name, strategy)
+                  for strategy in [BIG_MONEY, BIG_MONEY_ULTIMATE,
+                                   SMITHY_BIG_MONEY, WITCH_BIG_MONEY])
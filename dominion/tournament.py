@@ -0,0 +1,423 @@
+"""Runs tournaments between agents: schedules round-robin or Swiss
+pairings on a pool of worker processes, keeps Elo ratings up to date as
+results come in, and checkpoints its progress so that a run can be
+resumed after it is stopped.
+"""
+import importlib
+import itertools
+import json
+import multiprocessing
+import os
+import random
+
+from dominion.agent import RandomAgent, BigMoneyAgent, MCTSAgent, RuleAgent
+from dominion.game import Game, agent_seed, check_seed, split_seed
+from dominion.strategy import STRATEGIES
+
+# Agents which can be entered by name. Each is called with a seed for the
+# agent's random number generator (or None), and returns a new agent.
+BUILTIN_AGENTS = {
+    'random': lambda seed: RandomAgent(rng=random.Random(seed)),
+    'big_money': lambda seed: BigMoneyAgent(),
+    'mcts': lambda seed: MCTSAgent(rng=random.Random(seed)),
+}
+
+PAIRINGS = ('round-robin', 'swiss')
+
+
+def make_agent(spec, seed=None):
+    '''Create an agent from a specification, which is one of:
+
+    - The name of a built-in agent: 'random', 'big_money' or 'mcts'.
+    - The name of a strategy in STRATEGIES, e.g. 'Smithy Big Money',
+      played by a RuleAgent.
+    - 'module:attribute', a callable in an importable module which
+      returns a new agent, e.g. an Agent subclass.
+
+    Args:
+        spec (str): The specification.
+        seed (int or str): Seed for the agent's random number generator,
+        for the built-in agents which use one (see game.agent_seed).
+        Default: None.
+
+    Return:
+        agent (Agent): The new agent.
+    '''
+    if spec in BUILTIN_AGENTS:
+        return BUILTIN_AGENTS[spec](seed)
+    if spec in STRATEGIES:
+        return RuleAgent(STRATEGIES[spec])
+    if ':' in spec:
+        module_name, attribute = spec.split(':', 1)
+        module = importlib.import_module(module_name)
+        return getattr(module, attribute)()
+    raise ValueError('Unknown agent: {}.'.format(spec))
+
+
+class EloRatings(object):
+    def __init__(self, names, k_factor=32.0, initial_rating=1500.0):
+        '''Elo ratings for a set of players. A game between more than two
+        players is rated as a match between every pair of them, decided
+        by their scores, with the K-factor divided by the number of
+        opponents so that each game moves a rating by as much as a
+        two-player game.
+
+        Args:
+            names (list): The names of the players.
+            k_factor (float): The largest change of rating from a game.
+            Default: 32.
+            initial_rating (float): The rating of every player at the
+            start. Default: 1500.
+        '''
+        self.k_factor = k_factor
+        self.ratings = dict((name, initial_rating) for name in names)
+
+    def update(self, names, scores):
+        '''Update the ratings with the result of a game.
+
+        Args:
+            names (list): The players in the game.
+            scores (list): Their final scores, in the same order.
+        '''
+        ratings = self.ratings
+        k = self.k_factor / (len(names) - 1)
+        changes = [0.0] * len(names)
+        for i, j in itertools.combinations(range(len(names)), 2):
+            expected = 1.0 / (1.0 + 10.0 ** ((ratings[names[j]] -
+                                              ratings[names[i]]) / 400.0))
+            if scores[i] > scores[j]:
+                actual = 1.0
+            elif scores[i] == scores[j]:
+                actual = 0.5
+            else:
+                actual = 0.0
+            changes[i] += k * (actual - expected)
+            changes[j] -= k * (actual - expected)
+
+        for name, change in zip(names, changes):
+            ratings[name] += change
+
+
+class Tournament(object):
+    def __init__(self, entrants, kingdoms=('base',), n_players=2,
+                 pairing='round-robin', n_rounds=3, games_per_pairing=1,
+                 seed=None, checkpoint_path=None, k_factor=32.0):
+        '''A tournament between agents. Games are played at tables of
+        n_players entrants, and every table plays a match: a game with
+        each rotation of the seats, in each kingdom, games_per_pairing
+        times, so that every entrant at the table plays from every seat.
+
+        Pairings are either round-robin, where every possible table plays
+        once, or Swiss, where in each of n_rounds rounds the entrants are
+        sorted by rating and seated with those closest to them, avoiding
+        entrants they have already played where possible. Entrants left
+        over when they do not fill a table sit the round out.
+
+        If checkpoint_path is given, the schedule, the results so far and
+        the ratings are saved there as the tournament runs. A tournament
+        created with the same settings and checkpoint_path resumes from
+        the checkpoint, and only plays the games which had not finished.
+
+        Args:
+            entrants (list): The agent specifications of the entrants,
+            as for make_agent. Each is also the entrant's name.
+            kingdoms (list): The card sets to play with, each as for
+            Game: 'base', 'random', or a list of card names. Default:
+            ('base',).
+            n_players (int): Number of players at each table, between 2
+            and 4. Default: 2.
+            pairing (str): 'round-robin' or 'swiss'. Default:
+            'round-robin'.
+            n_rounds (int): Number of rounds of a Swiss tournament.
+            Default: 3.
+            games_per_pairing (int): Number of times each table plays
+            each seat rotation in each kingdom. Default: 1.
+            seed (int): Seed for the tournament, between 0 and
+            game.MAX_SEED. Game i of the schedule is played with seed
+            split_seed(seed, i), and the agents in it seeded with
+            agent_seed of that and their seat. If None, games are seeded
+            randomly. Default: None.
+            checkpoint_path (str): Where to save the checkpoint. Default:
+            None (no checkpoint).
+            k_factor (float): The K-factor of the Elo ratings. Default:
+            32.
+        '''
+        assert n_players >= 2 and n_players <= 4, "n_players must be between 2 and 4"
+        assert len(set(entrants)) == len(entrants), 'entrants must be distinct'
+        assert len(entrants) >= n_players, 'need at least n_players entrants'
+        if pairing not in PAIRINGS:
+            raise ValueError('Unsupported pairing: {}.'.format(pairing))
+        check_seed(seed)
+
+        self.entrants = list(entrants)
+        self.kingdoms = [kingdom if isinstance(kingdom, str) else list(kingdom)
+                         for kingdom in kingdoms]
+        self.n_players = n_players
+        self.pairing = pairing
+        self.n_rounds = n_rounds if pairing == 'swiss' else 1
+        self.games_per_pairing = games_per_pairing
+        self.seed = seed
+        self.checkpoint_path = checkpoint_path
+
+        self.ratings = EloRatings(self.entrants, k_factor=k_factor)
+        self.schedule = []
+        self.results = {}
+        self.stats = dict((name, {'games': 0, 'wins': 0.0, 'score': 0})
+                          for name in self.entrants)
+
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            self._load_checkpoint()
+
+    @property
+    def settings(self):
+        '''dict: The settings which a checkpoint must have been made with
+        to be resumed by this tournament.'''
+        return {'entrants': self.entrants,
+                'kingdoms': self.kingdoms,
+                'n_players': self.n_players,
+                'pairing': self.pairing,
+                'n_rounds': self.n_rounds,
+                'games_per_pairing': self.games_per_pairing,
+                'seed': self.seed,
+                'k_factor': self.ratings.k_factor}
+
+    @property
+    def current_round(self):
+        '''int: The number of rounds scheduled so far.'''
+        if not self.schedule:
+            return 0
+        return self.schedule[-1]['round'] + 1
+
+    def run(self, n_workers=None, checkpoint_every=10):
+        '''Play the rest of the tournament.
+
+        Args:
+            n_workers (int): Number of worker processes. If 1, games are
+            played in the current process. Default: one per CPU.
+            checkpoint_every (int): Save a checkpoint after this many
+            games have finished, as well as after each round. Default:
+            10.
+
+        Return:
+            standings (list): See standings().
+        '''
+        if n_workers is None:
+            n_workers = multiprocessing.cpu_count()
+        assert n_workers >= 1, 'n_workers must be at least 1'
+
+        settings = (self.n_players, self.seed)
+        pool = None
+        if n_workers > 1:
+            pool = multiprocessing.Pool(processes=n_workers,
+                                        initializer=_init_worker,
+                                        initargs=settings)
+        else:
+            _set_worker_settings(*settings)
+
+        try:
+            for round_index in range(self.n_rounds):
+                if round_index == self.current_round:
+                    self._schedule_round(round_index)
+                games = [game for game in self.schedule
+                         if game['round'] == round_index and
+                         game['index'] not in self.results]
+                if pool is None:
+                    results = (_play_game(game) for game in games)
+                else:
+                    # In schedule order, so that the ratings do not depend
+                    # on which worker finishes first
+                    results = pool.imap(_play_game, games)
+
+                for n_finished, result in enumerate(results, 1):
+                    self._record(*result)
+                    if n_finished % checkpoint_every == 0:
+                        self.save_checkpoint()
+                self.save_checkpoint()
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        return self.standings()
+
+    def _schedule_round(self, round_index):
+        '''Add the games of a round to the schedule.'''
+        if self.pairing == 'round-robin':
+            tables = list(itertools.combinations(self.entrants,
+                                                 self.n_players))
+        else:
+            tables = self._swiss_tables()
+
+        for table in tables:
+            for kingdom in self.kingdoms:
+                for _ in range(self.games_per_pairing):
+                    for rotation in range(self.n_players):
+                        seats = table[rotation:] + table[:rotation]
+                        self.schedule.append({'index': len(self.schedule),
+                                              'round': round_index,
+                                              'kingdom': kingdom,
+                                              'seats': list(seats)})
+
+    def _swiss_tables(self):
+        '''Seat the entrants for a round of a Swiss tournament.
+
+        Return:
+            tables (list): Contains a tuple of entrants for each table.
+        '''
+        n_met = dict(((a, b), 0) for a in self.entrants for b in self.entrants)
+        for game in self.schedule:
+            for a, b in itertools.permutations(game['seats'], 2):
+                n_met[(a, b)] += 1
+
+        ratings = self.ratings.ratings
+        unseated = sorted(self.entrants,
+                          key=lambda name: (-ratings[name],
+                                            self.entrants.index(name)))
+        tables = []
+        while len(unseated) >= self.n_players:
+            leader = unseated.pop(0)
+            # Closest in rating among those the leader has met least
+            others = sorted(unseated,
+                            key=lambda name: n_met[(leader, name)])
+            table = [leader] + others[:self.n_players - 1]
+            for name in table[1:]:
+                unseated.remove(name)
+            tables.append(tuple(table))
+        return tables
+
+    def _record(self, index, scores, n_turns):
+        '''Record the result of a game, and update the ratings.
+
+        Args:
+            index (int): The index of the game in the schedule.
+            scores (list): The final score of each seat.
+            n_turns (int): The number of turns taken in the game.
+        '''
+        seats = self.schedule[index]['seats']
+        self.results[index] = {'scores': scores, 'n_turns': n_turns}
+        self.ratings.update(seats, scores)
+
+        best_score = max(scores)
+        n_winners = scores.count(best_score)
+        for name, score in zip(seats, scores):
+            stats = self.stats[name]
+            stats['games'] += 1
+            stats['score'] += score
+            if score == best_score:
+                stats['wins'] += 1.0 / n_winners
+
+    def standings(self):
+        '''The entrants ordered by rating.
+
+        Return:
+            standings (list): Contains a dict for each entrant, with its
+            'name', 'rating', number of 'games', 'win_rate' (ties are
+            shared) and 'mean_score'.
+        '''
+        standings = []
+        for name in self.entrants:
+            stats = self.stats[name]
+            n_games = max(stats['games'], 1)
+            standings.append({'name': name,
+                              'rating': self.ratings.ratings[name],
+                              'games': stats['games'],
+                              'win_rate': stats['wins'] / n_games,
+                              'mean_score': float(stats['score']) / n_games})
+        standings.sort(key=lambda entry: -entry['rating'])
+        return standings
+
+    def display(self):
+        '''Print out the standings.'''
+        print('Games: {} of {}'.format(len(self.results), len(self.schedule)))
+        for rank, entry in enumerate(self.standings(), 1):
+            print('{}. {}: rating {:.0f}, games {}, win rate {:.3f}, '
+                  'score mean {:.1f}'.format(rank, entry['name'],
+                                             entry['rating'], entry['games'],
+                                             entry['win_rate'],
+                                             entry['mean_score']))
+
+    def save_checkpoint(self):
+        '''Save the schedule, results and ratings to checkpoint_path, if
+        it is set. The file is replaced atomically, so a run stopped
+        while saving leaves the previous checkpoint intact.'''
+        if self.checkpoint_path is None:
+            return
+
+        checkpoint = {'settings': self.settings,
+                      'schedule': self.schedule,
+                      'results': dict((str(index), result) for index, result
+                                      in self.results.items()),
+                      'ratings': self.ratings.ratings,
+                      'stats': self.stats}
+        temp_path = self.checkpoint_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.checkpoint_path)
+
+    def _load_checkpoint(self):
+        '''Resume from the checkpoint at checkpoint_path.'''
+        with open(self.checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint['settings'] != self.settings:
+            raise ValueError('The checkpoint {} was made with different '
+                             'settings.'.format(self.checkpoint_path))
+
+        self.schedule = checkpoint['schedule']
+        self.results = dict((int(index), result) for index, result
+                            in checkpoint['results'].items())
+        self.ratings.ratings = checkpoint['ratings']
+        self.stats = checkpoint['stats']
+
+
+# Tournament settings for the current worker process, set once when the
+# worker starts.
+_worker_settings = {}
+
+
+def _init_worker(n_players, seed):
+    '''Prepare a worker process to play tournament games. Workers forked
+    from the parent process inherit its global random state, so it is
+    reseeded here to keep workers from playing identical games.'''
+    random.seed()
+    _set_worker_settings(n_players, seed)
+
+
+def _set_worker_settings(n_players, seed):
+    '''Store the settings used by _play_game in this process.'''
+    _worker_settings['n_players'] = n_players
+    _worker_settings['seed'] = seed
+
+
+def _play_game(game):
+    '''Play one game of the schedule.
+
+    Args:
+        game (dict): The game, as in Tournament.schedule.
+
+    Return:
+        index (int): The index of the game in the schedule.
+        scores (list): The final score of each seat.
+        n_turns (int): The number of turns taken in the game.
+    '''
+    seed = _worker_settings['seed']
+    if seed is None:
+        game_seed = None
+    else:
+        game_seed = split_seed(seed, game['index'])
+
+    agents = {}
+    for seat, name in enumerate(game['seats']):
+        if game_seed is None:
+            seat_seed = None
+        else:
+            seat_seed = agent_seed(game_seed, seat)
+        agents[name] = make_agent(name, seed=seat_seed)
+
+    dominion_game = Game(n_players=_worker_settings['n_players'],
+                         agents=agents, card_set=game['kingdom'],
+                         seed=game_seed)
+    victory_point_count = dominion_game.play_game()
+    scores = [victory_point_count[name] for name in game['seats']]
+    return game['index'], scores, dominion_game.n_turns
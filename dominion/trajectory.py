@@ -0,0 +1,347 @@
+"""Records the decisions made in games into compact binary shards, and
+reads them back by memory-mapping the shards.
+
+A shard is a pair of files of fixed-width records, with no header, so
+that they can be appended to cheaply and memory-mapped as NumPy arrays
+without parsing:
+
+- `<prefix>-<shard>.decisions`: one DECISION_DTYPE record per decision,
+  in the order they were made.
+- `<prefix>-<shard>.games`: one GAME_DTYPE record per finished game,
+  pointing at the game's decisions in the same shard.
+
+Options and choices are stored as indices in env.ACTION_NAMES: the
+options of a decision as a bit mask (so their order is not kept), and the
+choice as an index. The observation is the player's game state at the
+time, laid out as by Agent._get_game_state.
+"""
+import glob
+import os
+
+import numpy as np
+
+from dominion.cards import N_CARDS, CARD_REGISTRY
+from dominion.env import ACTION_IDS, ACTION_NAMES, DECISION_KINDS
+from dominion.game import BASE_CARDS
+
+DECISION_DTYPE = np.dtype([('game_id', '<u8'),
+                           ('turn', '<u4'),
+                           ('seat', 'u1'),
+                           ('kind', 'u1'),
+                           ('choice', 'u1'),
+                           ('n_options', 'u1'),
+                           ('options', '<u8'),
+                           ('observation', '<i2', (3 * N_CARDS,))])
+
+GAME_DTYPE = np.dtype([('game_id', '<u8'),
+                       ('seed', '<u8'),
+                       ('seeded', 'u1'),
+                       ('card_set', 'u1'),
+                       ('n_players', 'u1'),
+                       ('game_over', 'u1'),
+                       ('kingdom', '<u8'),
+                       ('n_turns', '<u4'),
+                       ('scores', '<i2', (4,)),
+                       ('first_decision', '<u8'),
+                       ('n_decisions', '<u4')])
+
+# Values of the card_set field: how the kingdom was chosen. A list of
+# cards is stored as 'list', with the cards in the kingdom field, which
+# holds the card ids of the cards in the supply other than BASE_CARDS as a
+# bit mask.
+CARD_SETS = ('random', 'base', 'list')
+
+_KIND_IDS = dict((kind, kind_id) for kind_id, kind in enumerate(DECISION_KINDS))
+
+
+def options_mask(options):
+    '''Encode a list of options as a bit mask of their indices in
+    env.ACTION_NAMES.'''
+    mask = 0
+    for option in options:
+        mask |= 1 << ACTION_IDS[option]
+    return mask
+
+
+def decode_options(mask):
+    '''Decode a bit mask of options, as stored in a decision record.
+
+    Return:
+        options (list): The options, in the order of env.ACTION_NAMES.
+    '''
+    mask = int(mask)
+    return [name for action, name in enumerate(ACTION_NAMES)
+            if mask >> action & 1]
+
+
+def kingdom_cards(kingdom):
+    '''Decode the kingdom field of a game record.
+
+    Return:
+        card_names (list): The names of the kingdom cards, in card id
+        order.
+    '''
+    kingdom = int(kingdom)
+    return [info.name for info in CARD_REGISTRY if kingdom >> info.card_id & 1]
+
+
+class TrajectoryWriter(object):
+    def __init__(self, directory, prefix='trajectories', shard_size=1000000,
+                 buffer_size=4096):
+        '''Writes the decisions made in games into binary shards (see the
+        module docstring). Start recording a game with start_game before
+        playing it with Game.play_game. Shards are only split between
+        games, once they hold at least shard_size decisions.
+
+        Several writers can share a directory, as long as each is given
+        its own prefix, e.g. one per worker process.
+
+        Args:
+            directory (str): The directory to write the shards to. It is
+            created if needed.
+            prefix (str): The start of the names of the shard files.
+            Default: 'trajectories'.
+            shard_size (int): Number of decisions after which a new
+            shard is started. Default: 1000000.
+            buffer_size (int): Number of decisions buffered in memory
+            between writes. Default: 4096.
+        '''
+        # Writers in several worker processes may create the directory
+        # at once
+        os.makedirs(directory, exist_ok=True)
+
+        self.directory = directory
+        self.prefix = prefix
+        self.shard_size = shard_size
+        self.n_games = 0
+
+        # Decisions are buffered as tuples of their scalar fields, and
+        # an array of their observations, and only packed into records
+        # when they are written, which is much faster than filling in
+        # each record's fields one at a time.
+        self.buffer_size = buffer_size
+        self._rows = []
+        self._observations = np.zeros((buffer_size, 3 * N_CARDS),
+                                      dtype=np.int16)
+        self._shard = -1
+        self._decision_file = None
+        self._game_file = None
+        self._n_shard_decisions = 0
+        self._game = None
+        self._game_id = None
+        self._seats = None
+        self._new_shard()
+
+    def _new_shard(self):
+        '''Close the current shard's files, and open the next shard.'''
+        self._close_files()
+        self._shard += 1
+        path = os.path.join(self.directory, '{}-{:05d}'.format(self.prefix,
+                                                              self._shard))
+        self._decision_file = open(path + '.decisions', 'wb')
+        self._game_file = open(path + '.games', 'wb')
+        self._n_shard_decisions = 0
+
+    def start_game(self, game, game_id=None):
+        '''Start recording a game: the recorder is attached to the game,
+        which then passes it every decision made in run_steps, and the
+        final scores at the end of play_game.
+
+        Args:
+            game (Game): The game, before it is played.
+            game_id (int): An identifier for the game, e.g. its index
+            in a batch. Default: the number of games started by this
+            writer.
+        '''
+        if game.seed is not None and not 0 <= game.seed < 2 ** 64:
+            # e.g. a game seeded with split_seed from a base seed which
+            # check_seed would reject
+            raise ValueError('Can not record the seed {} of a game: seeds '
+                             'must be between 0 and 2**64 - 1.'.format(
+                                 game.seed))
+        if game_id is None:
+            game_id = self.n_games
+        self.n_games += 1
+
+        kingdom = 0
+        for card_name, card in game.supply_piles.cards.items():
+            if card_name not in BASE_CARDS:
+                kingdom |= 1 << card.card_id
+
+        record = np.zeros((), dtype=GAME_DTYPE)
+        record['game_id'] = game_id
+        if game.seed is not None:
+            record['seed'] = game.seed
+            record['seeded'] = 1
+        if isinstance(game.card_set, str):
+            record['card_set'] = CARD_SETS.index(game.card_set)
+        else:
+            record['card_set'] = CARD_SETS.index('list')
+        record['n_players'] = game.n_players
+        record['kingdom'] = kingdom
+        record['first_decision'] = self._n_shard_decisions
+
+        self._game = record
+        self._game_id = game_id
+        self._seats = dict((id(player), seat)
+                           for seat, player in enumerate(game.players))
+        game.recorder = self
+
+    def record_decision(self, game, decision, selection):
+        '''Record a decision, with the deciding player's game state.
+        Called by Game.run_steps.
+
+        Args:
+            game (Game): The game.
+            decision (Decision): The decision.
+            selection (str): The option selected.
+        '''
+        player = decision.player
+        observation = self._observations[len(self._rows)]
+        observation[:N_CARDS] = player.deck.count_vector
+        observation[N_CARDS:2 * N_CARDS] = game.supply_piles.count_vector
+        observation[2 * N_CARDS:] = player.hand.count_vector
+
+        self._rows.append((self._game_id, game.n_turns,
+                           self._seats[id(player)], _KIND_IDS[decision.kind],
+                           ACTION_IDS[selection], len(decision.options),
+                           options_mask(decision.options)))
+        self._n_shard_decisions += 1
+        if len(self._rows) == self.buffer_size:
+            self._flush_decisions()
+
+    def end_game(self, game, victory_point_count):
+        '''Record the end of a game, and detach the recorder from it.
+        Called by Game.play_game.
+
+        Args:
+            game (Game): The game.
+            victory_point_count (dict): The final score of each player.
+        '''
+        record = self._game
+        record['game_over'] = game.check_game_over()
+        record['n_turns'] = game.n_turns
+        for seat, player in enumerate(game.players):
+            record['scores'][seat] = victory_point_count[str(player.player_id)]
+        record['n_decisions'] = (self._n_shard_decisions -
+                                 int(record['first_decision']))
+        self._game_file.write(record.tobytes())
+
+        self._game = None
+        game.recorder = None
+        if self._n_shard_decisions >= self.shard_size:
+            self._flush_decisions()
+            self._new_shard()
+
+    def _flush_decisions(self):
+        '''Write the buffered decisions to the current shard.'''
+        n_rows = len(self._rows)
+        if n_rows == 0:
+            return
+        records = np.zeros(n_rows, dtype=DECISION_DTYPE)
+        for field, values in zip(DECISION_DTYPE.names, zip(*self._rows)):
+            records[field] = values
+        records['observation'] = self._observations[:n_rows]
+        self._decision_file.write(records.tobytes())
+        self._rows = []
+
+    def _close_files(self):
+        '''Close the current shard's files, if any.'''
+        if self._decision_file is not None:
+            self._decision_file.close()
+            self._game_file.close()
+
+    def close(self):
+        '''Write out everything recorded, and close the files.'''
+        if self._decision_file is None:
+            return
+        self._flush_decisions()
+        self._close_files()
+        self._decision_file = None
+        self._game_file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class TrajectoryReader(object):
+    def __init__(self, directory):
+        '''Reads the shards written by TrajectoryWriters into a directory.
+        Each shard's files are memory-mapped, so records are only read
+        from disk when they are used, and are returned as read-only
+        NumPy views. `shard_paths` holds the path of each shard, without
+        the file extension.
+
+        Args:
+            directory (str): The directory holding the shards.
+        '''
+        self.directory = directory
+        self.shards = []
+        self.shard_paths = []
+        for game_path in sorted(glob.glob(os.path.join(directory, '*.games'))):
+            shard_path = game_path[:-len('.games')]
+            self.shards.append((_memmap(game_path, GAME_DTYPE),
+                                _memmap(shard_path + '.decisions',
+                                        DECISION_DTYPE)))
+            self.shard_paths.append(shard_path)
+
+    @property
+    def n_games(self):
+        '''int: The number of games recorded.'''
+        return sum(len(games) for games, _ in self.shards)
+
+    @property
+    def n_decisions(self):
+        '''int: The number of decisions recorded in finished games.'''
+        return sum(int(games['n_decisions'].sum()) for games, _ in self.shards)
+
+    def iter_games(self):
+        '''Iterate over the games recorded, shard by shard.
+
+        Yields:
+            game (numpy.void): The game's GAME_DTYPE record.
+            decisions (numpy.ndarray): View of the game's DECISION_DTYPE
+            records, in the order they were made.
+        '''
+        for games, decisions in self.shards:
+            for game in games:
+                first = int(game['first_decision'])
+                yield game, decisions[first:first + int(game['n_decisions'])]
+
+    def find_game(self, game_id):
+        '''Find a game by its game_id.
+
+        Return:
+            game (numpy.void): The game's record.
+            decisions (numpy.ndarray): View of the game's decisions.
+        '''
+        shard, index = self.locate_game(game_id)
+        games, decisions = self.shards[shard]
+        game = games[index]
+        first = int(game['first_decision'])
+        return game, decisions[first:first + int(game['n_decisions'])]
+
+    def locate_game(self, game_id):
+        '''Find which shard a game is in.
+
+        Return:
+            shard (int): The index of the shard.
+            index (int): The index of the game's record in the shard.
+        '''
+        for shard, (games, _) in enumerate(self.shards):
+            matches = np.flatnonzero(games['game_id'] == game_id)
+            if len(matches):
+                return shard, int(matches[0])
+        raise KeyError('No game with game_id {}.'.format(game_id))
+
+
+def _memmap(path, dtype):
+    '''Memory-map a file of fixed-width records, read-only. Empty files
+    can not be mapped, and give an empty array instead.'''
+    n_records = os.path.getsize(path) // dtype.itemsize
+    if n_records == 0:
+        return np.zeros(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r', shape=(n_records,))
@@ -0,0 +1,209 @@
+"""Collects statistics on the shape of the game tree: how many decisions
+games have and how many options each has, to size search budgets.
+
+A TreeStats attached to a game with TreeStats.start_game is passed every
+decision the game asks an agent for (see Game.run_steps), which covers
+the action and buy phases as well as the decisions asked for by cards.
+For each game it counts:
+
+- the number of options of each decision, by kind of decision (the
+  branching factor),
+- the number of decisions in each turn,
+- the number of turns.
+
+These are kept as distributions (dicts of value: count) for all games
+('all'), and for the games played with each kingdom card, keyed by the
+card's name.
+"""
+import json
+
+from dominion.env import DECISION_KINDS
+from dominion.game import BASE_CARDS
+
+
+class TreeStats(object):
+    def __init__(self):
+        '''Game tree statistics, keyed by group: 'all' for every game,
+        or the name of a kingdom card for the games played with it.
+
+        - `n_games`: The number of games.
+        - `game_lengths`: The distribution of the number of turns per
+          game.
+        - `turn_decisions`: The distribution of the number of decisions
+          per turn.
+        - `option_counts`: For each kind of decision, the distribution
+          of its number of options.
+
+        Statistics collected separately (e.g. by different worker
+        processes) can be combined with `merge`.
+        '''
+        self.n_games = {}
+        self.game_lengths = {}
+        self.turn_decisions = {}
+        self.option_counts = {}
+        self._groups = None
+        self._game_options = None
+        self._game_turns = None
+
+    def start_game(self, game):
+        '''Start collecting statistics for a game: the TreeStats is
+        attached to the game, which then passes it every decision made in
+        run_steps, and calls end_game at the end of play_game.
+
+        Args:
+            game (Game): The game, before it is played.
+        '''
+        self._groups = ['all'] + sorted(card_name for card_name
+                                        in game.supply_piles.cards
+                                        if card_name not in BASE_CARDS)
+        self._game_options = dict((kind, {}) for kind in DECISION_KINDS)
+        self._game_turns = {}
+        game.tree_stats = self
+
+    def record_decision(self, game, decision):
+        '''Count a decision. Called by Game.run_steps.
+
+        Args:
+            game (Game): The game.
+            decision (Decision): The decision.
+        '''
+        counts = self._game_options[decision.kind]
+        n_options = len(decision.options)
+        counts[n_options] = counts.get(n_options, 0) + 1
+        turns = self._game_turns
+        turns[game.n_turns] = turns.get(game.n_turns, 0) + 1
+
+    def end_game(self, game):
+        '''Add the statistics of a game to those of its groups, and
+        detach the TreeStats from it. Called by Game.play_game.
+
+        Args:
+            game (Game): The game.
+        '''
+        turn_decisions = {}
+        for turn in range(game.n_turns):
+            n_decisions = self._game_turns.get(turn, 0)
+            turn_decisions[n_decisions] = turn_decisions.get(n_decisions,
+                                                             0) + 1
+
+        for group in self._groups:
+            self.n_games[group] = self.n_games.get(group, 0) + 1
+            lengths = self.game_lengths.setdefault(group, {})
+            lengths[game.n_turns] = lengths.get(game.n_turns, 0) + 1
+            _add_counts(self.turn_decisions.setdefault(group, {}),
+                        turn_decisions)
+            option_counts = self.option_counts.setdefault(group, {})
+            for kind, counts in self._game_options.items():
+                if counts:
+                    _add_counts(option_counts.setdefault(kind, {}), counts)
+
+        self._groups = None
+        self._game_options = None
+        self._game_turns = None
+        game.tree_stats = None
+
+    def merge(self, other):
+        '''Add the statistics collected by another TreeStats to this one.
+
+        Args:
+            other (TreeStats): The statistics to merge in.
+        '''
+        for group, n_games in other.n_games.items():
+            self.n_games[group] = self.n_games.get(group, 0) + n_games
+            _add_counts(self.game_lengths.setdefault(group, {}),
+                        other.game_lengths[group])
+            _add_counts(self.turn_decisions.setdefault(group, {}),
+                        other.turn_decisions[group])
+            option_counts = self.option_counts.setdefault(group, {})
+            for kind, counts in other.option_counts[group].items():
+                _add_counts(option_counts.setdefault(kind, {}), counts)
+
+    def report(self):
+        '''Summarize the statistics of each group.
+
+        Return:
+            report (dict): Keyed by group, with the number of 'games',
+            the mean, min and max of the 'turns_per_game' and the
+            'decisions_per_turn', the mean 'decisions_per_game', and for
+            each kind of decision in 'kinds', the mean number of
+            'decisions_per_game' and the mean, min and max number of
+            'options'.
+        '''
+        report = {}
+        for group, n_games in self.n_games.items():
+            kinds = {}
+            for kind in DECISION_KINDS:
+                counts = self.option_counts[group].get(kind)
+                if not counts:
+                    continue
+                kinds[kind] = {
+                    'decisions_per_game':
+                        float(sum(counts.values())) / n_games,
+                    'options': _summary(counts)}
+            turn_decisions = self.turn_decisions[group]
+            n_decisions = sum(value * count for value, count
+                              in turn_decisions.items())
+            report[group] = {
+                'games': n_games,
+                'turns_per_game': _summary(self.game_lengths[group]),
+                'decisions_per_turn': _summary(turn_decisions),
+                'decisions_per_game': float(n_decisions) / n_games,
+                'kinds': kinds}
+        return report
+
+    def display(self):
+        '''Print out the report: the branching factor of each kind of
+        decision over all games, then a line per kingdom card.'''
+        if 'all' not in self.n_games:
+            print('No games played.')
+            return
+
+        report = self.report()
+        summary = report.pop('all')
+        print('Games: {}'.format(summary['games']))
+        for name in ('turns_per_game', 'decisions_per_turn'):
+            print('{}: mean {:.1f}, min {}, max {}'.format(
+                name.replace('_', ' ').capitalize(), summary[name]['mean'],
+                summary[name]['min'], summary[name]['max']))
+        print('{:<10} {:>16} {:>14} {:>12}'.format(
+            'Decision', 'per game', 'options mean', 'options max'))
+        for kind in DECISION_KINDS:
+            if kind in summary['kinds']:
+                stats = summary['kinds'][kind]
+                print('{:<10} {:>16.1f} {:>14.2f} {:>12}'.format(
+                    kind, stats['decisions_per_game'],
+                    stats['options']['mean'], stats['options']['max']))
+
+        print('{:<16} {:>8} {:>14} {:>18} {:>16}'.format(
+            'Kingdom card', 'games', 'turns/game', 'decisions/turn',
+            'decisions/game'))
+        for card_name in sorted(report):
+            stats = report[card_name]
+            print('{:<16} {:>8} {:>14.1f} {:>18.2f} {:>16.1f}'.format(
+                card_name, stats['games'], stats['turns_per_game']['mean'],
+                stats['decisions_per_turn']['mean'],
+                stats['decisions_per_game']))
+
+    def save(self, path):
+        '''Write the report to a file, as JSON.
+
+        Args:
+            path (str): The file to write.
+        '''
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2, sort_keys=True)
+
+
+def _add_counts(totals, counts):
+    '''Add a distribution stored as a dict of value: count to another.'''
+    for value, count in counts.items():
+        totals[value] = totals.get(value, 0) + count
+
+
+def _summary(value_counts):
+    '''Mean, min and max of a distribution stored as a dict of value:
+    count.'''
+    total = sum(value_counts.values())
+    mean = float(sum(value * count for value, count
+                     in value_counts.items())) / total
+    return {'mean': mean, 'min': min(value_counts), 'max': max(value_counts)}
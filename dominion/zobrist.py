@@ -0,0 +1,40 @@
+"""Random keys for hashing game states.
+
+The state is hashed Zobrist-style, with a random 64-bit key for each card
+in each zone (the supply piles, the cards a player owns, and their hand).
+Since a zone can hold several copies of a card, the hash of a zone is the
+sum of the keys of the cards in it, so a card moving in or out only adds
+or subtracts its key. Deck, Hand and SupplyPiles keep their hashes up to
+date as cards move, and Game.state_hash combines them.
+"""
+import random
+
+from dominion.cards import N_CARDS
+
+# Hashes are reduced to 64 bits with this mask.
+MASK = 2 ** 64 - 1
+
+# The keys are drawn from a fixed seed, so that hashes are the same in
+# every process and every run.
+_rng = random.Random(20170705)
+
+
+def _keys(n):
+    '''Draw n random 64-bit keys.'''
+    return [_rng.getrandbits(64) for _ in range(n)]
+
+
+# Keys for each card, indexed by card id
+SUPPLY_KEYS = _keys(N_CARDS)
+OWNED_KEYS = _keys(N_CARDS)
+HAND_KEYS = _keys(N_CARDS)
+
+# Odd multipliers which mix each seat's hashes into the game's hash, so
+# that swapping two players' cards changes the hash. Up to 4 players.
+SEAT_MULTIPLIERS = [key | 1 for key in _keys(4)]
+
+# Keys for whose turn it is, the phase, and the current player's actions,
+# buys and coins (which are multiplied by the count).
+CURRENT_PLAYER_KEYS = _keys(4)
+PHASE_KEYS = dict(zip([None, 'action', 'buy'], _keys(3)))
+TURN_STATE_KEYS = dict(zip(['actions', 'buys', 'coins'], _keys(3)))
@@ -6,11 +6,16 @@ setup(
     name='Dominion',
     version='0.0',
     py_modules=['play_game'],
+    python_requires='>=3.7',
     install_requires=[
         'Click',
+        'numpy',
     ],
+    extras_require={
+        'dev': ['pytest'],
+    },
     entry_points='''
         [console_scripts]
-        dominion=dominion.play_game:play_game
+        dominion=dominion.play_game:cli
     ''',
 )
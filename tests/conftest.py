@@ -0,0 +1,75 @@
+"""Helpers shared by the tests."""
+import random
+
+import pytest
+
+from dominion.game import Game
+
+
+def _game_state(game):
+    '''Everything that makes up the state of a game, including the order
+    of the piles and of the tallies kept alongside them, in a form that
+    can be compared with ==.'''
+    supply_piles = game.supply_piles
+    players = []
+    for player in game.players:
+        deck = player.deck
+        hand = player.hand
+        players.append((list(deck.draw_pile), list(deck.discard_pile),
+                        deck.count_vector.tolist(), deck.n_cards,
+                        deck.n_gardens, deck.card_victory_points,
+                        deck.zobrist_hash, list(hand.hand),
+                        list(hand.card_counts.items()),
+                        hand.count_vector.tolist(), hand.coins,
+                        hand.n_actions, hand.zobrist_hash,
+                        sorted(player.turn_state.items())))
+    return (list(supply_piles.counts.items()),
+            supply_piles.count_vector.tolist(), supply_piles.n_empty_piles,
+            supply_piles.zobrist_hash, list(supply_piles._index_names),
+            list(supply_piles._index_costs), players, game.current_player,
+            game.phase, game.n_turns, game.rng.getstate(), game.state_hash)
+
+
+def _seed_agents(game, seed):
+    '''Give every player's RandomAgent a random number generator seeded
+    from seed, so that two copies of a game make the same choices.'''
+    for seat, player in enumerate(game.players):
+        player.agent.rng = random.Random(seed * 10 + seat)
+
+
+def _play_decisions(game, rng, n_decisions):
+    '''Make up to n_decisions random decisions with apply_decision, and
+    return the options chosen.'''
+    selections = []
+    for _ in range(n_decisions):
+        if game.check_game_over():
+            break
+        selection = rng.choice(game.valid_decisions())
+        _seed_agents(game, len(selections))
+        game.apply_decision(selection)
+        selections.append(selection)
+    return selections
+
+
+@pytest.fixture
+def game_state():
+    return _game_state
+
+
+@pytest.fixture
+def seed_agents():
+    return _seed_agents
+
+
+@pytest.fixture
+def play_decisions():
+    return _play_decisions
+
+
+@pytest.fixture(params=range(40))
+def mid_game(request):
+    '''A three player game with random cards, part way through.'''
+    game = Game(n_players=3, seed=request.param)
+    _play_decisions(game, random.Random(request.param), 40 + request.param)
+    game.clear_undo_log()
+    return game
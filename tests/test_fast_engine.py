@@ -0,0 +1,32 @@
+"""Tests that the fast engine plays the same games as the full engine."""
+import functools
+
+from dominion.agent import RuleAgent
+from dominion.fast_engine import default_kingdom, simulate_fast
+from dominion.simulation import simulate
+from dominion.strategy import BIG_MONEY_ULTIMATE, SMITHY_BIG_MONEY
+
+
+def _mean(value_counts):
+    return float(sum(value * count for value, count
+                     in value_counts.items())) / sum(value_counts.values())
+
+
+def test_fast_engine_matches_full_engine():
+    strategies = [SMITHY_BIG_MONEY, BIG_MONEY_ULTIMATE]
+    fast = simulate_fast(strategies, 10000, seed=0)
+    full = simulate(1000, card_set=default_kingdom(strategies),
+                    agent_factories={
+                        'Player 0': functools.partial(RuleAgent,
+                                                      SMITHY_BIG_MONEY),
+                        'Player 1': functools.partial(RuleAgent,
+                                                      BIG_MONEY_ULTIMATE)},
+                    n_workers=1, seed=0)
+
+    # The standard error of the full engine's win rate is about 0.012.
+    assert abs(fast.wins['Player 0'] / fast.n_games -
+               full.wins['Player 0'] / full.n_games) < 0.05
+    assert abs(_mean(fast.game_lengths) - _mean(full.game_lengths)) < 1.5
+    for player_id in ('Player 0', 'Player 1'):
+        assert abs(_mean(fast.scores[player_id]) -
+                   _mean(full.scores[player_id])) < 1.5
@@ -0,0 +1,134 @@
+"""Tests for how MCTSAgent applies options to its clones of the game."""
+import random
+
+from dominion.agent import Agent, MCTSAgent
+from dominion.cards import Copper, Estate, Gold, Smithy, Spy, ThroneRoom
+from dominion.game import Game
+
+KINGDOM = ['Throne Room', 'Smithy', 'Spy', 'Village', 'Market']
+
+
+class ScriptedAgent(Agent):
+    '''Agent which selects the named option whenever it is offered, and
+    otherwise the first option.'''
+    def __init__(self, choice):
+        super(ScriptedAgent, self).__init__()
+        self.choice = choice
+
+    def _select(self, options):
+        if self.choice in options:
+            return self.choice
+        return options[0]
+
+    select_action = select_buy = select_gain = _select
+    select_discard = select_trash = select_shuffle = _select
+
+
+def new_game(hand, agents=None):
+    '''A two player game at the start of the first player's action phase,
+    with the given cards in their hand.'''
+    game = Game(n_players=2, agents=agents, card_set=KINGDOM, seed=1)
+    player = game.players[0]
+    game.valid_decisions()
+    player.deck.discard_pile += player.hand.hand
+    player.hand.set_cards(hand)
+    player.deck._recount(player.hand.hand)
+    return game
+
+
+def test_throne_room_plays_card_twice(game_state):
+    agent = MCTSAgent(rng=random.Random(0))
+    game = new_game([ThroneRoom(), Smithy(), Copper(), Copper(), Estate()],
+                    agents={'mcts': agent})
+
+    # The engine playing Throne Room on Smithy
+    played = game.clone({'mcts': ScriptedAgent('Smithy')})
+    played.run_steps(played._play_card(played.players[0], ThroneRoom()))
+
+    # The agent's clone, as it is when asked which card to play
+    searched = game.clone()
+    searched.players[0].hand.discard_card(ThroneRoom())
+    agent._apply_option(searched, searched.players[0], 'throne_room',
+                        'Smithy')
+
+    assert len(searched.players[0].hand.hand) == 3 + 6
+    assert searched.players[0].turn_state['actions'] == 0
+    assert game_state(searched) == game_state(played)
+
+
+def test_throne_room_decision_is_searched_as_throne_room():
+    kinds = []
+
+    class RecordingAgent(MCTSAgent):
+        def _apply_option(self, game, player, kind, option, target=None):
+            kinds.append(kind)
+            super(RecordingAgent, self)._apply_option(game, player, kind,
+                                                      option, target)
+
+    agent = RecordingAgent(n_rollouts=4, max_rollout_turns=2,
+                           rng=random.Random(0))
+    game = new_game([ThroneRoom(), Smithy(), Copper(), Copper(), Estate()],
+                    agents={'mcts': agent})
+    game.run_steps(game._play_card(game.players[0], ThroneRoom()))
+    assert kinds and set(kinds) == {'throne_room'}
+
+
+def test_spy_discards_from_revealed_deck():
+    agent = MCTSAgent(rng=random.Random(0))
+    game = new_game([Spy(), Gold(), Copper(), Copper(), Estate()],
+                    agents={'mcts': agent})
+    player, opponent = game.players
+    opponent.deck.draw_pile.append(Gold())
+
+    for option, discarded in (('keep_card', True), ('Gold', False)):
+        clone = game.clone()
+        clone_player, clone_opponent = clone.players
+        agent._apply_option(clone, clone_player, 'discard', option,
+                            target=clone_opponent)
+        assert clone_player.hand.hand == player.hand.hand
+        assert clone_player.deck.discard_pile == player.deck.discard_pile
+        if discarded:
+            assert clone_opponent.deck.discard_pile[-1] is Gold()
+            assert clone_opponent.deck.draw_pile == \
+                opponent.deck.draw_pile[:-1]
+        else:
+            assert clone_opponent.deck.draw_pile == opponent.deck.draw_pile
+
+    top_card = player.deck.draw_pile[-1]
+    for option, discarded in (('keep_card', False), (top_card.name, True)):
+        clone = game.clone()
+        clone_player = clone.players[0]
+        agent._apply_option(clone, clone_player, 'discard', option,
+                            target=clone_player)
+        assert clone_player.hand.hand == player.hand.hand
+        assert (len(clone_player.deck.draw_pile) <
+                len(player.deck.draw_pile)) == discarded
+
+
+def test_determinize_keeps_revealed_card():
+    agent = MCTSAgent(rng=random.Random(0))
+    game = new_game([Spy(), Copper(), Copper(), Copper(), Estate()],
+                    agents={'mcts': agent})
+    game.players[1].deck.draw_pile.append(Gold())
+    for seed in range(10):
+        clone = game.clone()
+        agent._determinize(clone, 0, random.Random(seed), revealed=1)
+        assert clone.players[1].deck.draw_pile[-1] is Gold()
+
+
+def test_spy_decision_passes_target():
+    targets = []
+
+    class RecordingAgent(MCTSAgent):
+        def _apply_option(self, game, player, kind, option, target=None):
+            if kind == 'discard':
+                targets.append(game.players.index(target))
+            super(RecordingAgent, self)._apply_option(game, player, kind,
+                                                      option, target)
+
+    agent = RecordingAgent(n_rollouts=4, max_rollout_turns=2,
+                           rng=random.Random(0))
+    game = new_game([Spy(), Copper(), Copper(), Copper(), Estate()],
+                    agents={'mcts': agent})
+    game.run_steps(game._play_card(game.players[0], Spy()))
+    assert sorted(set(targets)) == [0, 1]
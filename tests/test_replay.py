@@ -0,0 +1,53 @@
+"""Tests for replaying recorded games, and seeking with keyframes."""
+import pytest
+
+from dominion.replay import Replay, build_keyframe_index, replay_game
+from dominion.simulation import simulate
+from dominion.trajectory import TrajectoryReader
+
+
+@pytest.fixture(scope='module')
+def record_dir(tmpdir_factory):
+    '''A directory of recorded games, with keyframes every 5 turns.'''
+    directory = str(tmpdir_factory.mktemp('games'))
+    simulate(12, n_players=3, n_workers=1, chunksize=4, seed=11,
+             record_dir=directory)
+    build_keyframe_index(directory, interval=5)
+    return directory
+
+
+def test_replay_matches_recorded_scores(record_dir):
+    for game, decisions in TrajectoryReader(record_dir).iter_games():
+        replay = Replay(game, decisions)
+        scores = replay.play()
+        assert [scores[player_id] for player_id in sorted(scores)] == \
+            replay.scores
+
+
+def test_keyframe_seek_matches_replay_from_start(record_dir, game_state):
+    reader = TrajectoryReader(record_dir)
+    for game, decisions in reader.iter_games():
+        with_keyframes = replay_game(record_dir, int(game['game_id']))
+        from_start = Replay(game, decisions)
+        assert with_keyframes.keyframes
+        for turn in range(0, from_start.n_turns, 3):
+            seeked = with_keyframes.seek(turn)
+            replayed = from_start.seek(turn)
+            assert game_state(seeked) == game_state(replayed)
+            assert seeked.valid_decisions() == replayed.valid_decisions()
+
+
+def test_turn_steps_match_replay_from_start(record_dir):
+    game_id = int(next(TrajectoryReader(record_dir).iter_games())[0]
+                  ['game_id'])
+    with_keyframes = replay_game(record_dir, game_id)
+    game, decisions = TrajectoryReader(record_dir).find_game(game_id)
+    from_start = Replay(game, decisions)
+    for turn in (0, 7, 21):
+        steps = [(decision.kind, decision.options, selection)
+                 for _, decision, selection
+                 in with_keyframes.turn_steps(turn)]
+        assert steps == [(decision.kind, decision.options, selection)
+                         for _, decision, selection
+                         in from_start.turn_steps(turn)]
+        assert steps
@@ -0,0 +1,27 @@
+"""Tests for deriving the seeds of games and agents from a base seed."""
+import random
+
+from dominion.game import Game, agent_seed, split_seed
+
+
+def test_agent_streams_differ_from_game_streams():
+    # With a batch seed of 0, game n is seeded with n, which used to also
+    # be the seed of the agent in seat n of game 0.
+    game_seeds = set(split_seed(0, index) for index in range(8))
+    agent_seeds = set(agent_seed(split_seed(0, index), seat)
+                      for index in range(8) for seat in range(4))
+    assert len(agent_seeds) == 32
+    assert not game_seeds & agent_seeds
+
+    game_stream = random.Random(split_seed(0, 1)).random()
+    agent_stream = random.Random(agent_seed(split_seed(0, 0), 1)).random()
+    assert game_stream != agent_stream
+
+
+def test_seeded_games_are_reproducible():
+    def play(seed):
+        game = Game(n_players=3, seed=seed)
+        scores = game.play_game()
+        return game.n_turns, sorted(scores.items())
+
+    assert play(split_seed(5, 2)) == play(split_seed(5, 2))
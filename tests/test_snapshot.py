@@ -0,0 +1,30 @@
+"""Tests for Game.snapshot, Game.restore and Game.clone."""
+import random
+
+
+def test_restore_matches_live_game(mid_game, game_state, play_decisions):
+    options = mid_game.valid_decisions()
+    state = game_state(mid_game)
+    snapshot = mid_game.snapshot()
+
+    play_decisions(mid_game, random.Random(1), 30)
+    mid_game.clear_undo_log()
+    mid_game.restore(snapshot)
+
+    assert game_state(mid_game) == state
+    assert mid_game.valid_decisions() == options
+
+
+def test_restored_game_plays_on_like_clone(mid_game, game_state,
+                                          play_decisions):
+    clone = mid_game.clone()
+    restored = mid_game.clone()
+    snapshot = mid_game.snapshot()
+    play_decisions(restored, random.Random(2), 30)
+    restored.clear_undo_log()
+    restored.restore(snapshot)
+
+    for game in (mid_game, clone, restored):
+        play_decisions(game, random.Random(3), 60)
+    assert game_state(restored) == game_state(mid_game)
+    assert game_state(clone) == game_state(mid_game)
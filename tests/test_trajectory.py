@@ -0,0 +1,102 @@
+"""Tests for recording games with TrajectoryWriter and reading them back
+with TrajectoryReader."""
+import pytest
+
+from dominion.env import DECISION_KINDS
+from dominion.game import BASE_CARDS, Game
+from dominion.trajectory import (CARD_SETS, TrajectoryReader,
+                                 TrajectoryWriter, decode_options,
+                                 kingdom_cards)
+
+
+class DecisionLog(object):
+    '''Stands in for a TrajectoryWriter, to check what it is passed.'''
+    def __init__(self, writer):
+        self.writer = writer
+        self.decisions = []
+
+    def record_decision(self, game, decision, selection):
+        self.decisions.append((game.n_turns, decision.player.player_id,
+                               decision.kind, sorted(decision.options),
+                               selection,
+                               decision.player.hand.count_vector.tolist()))
+        self.writer.record_decision(game, decision, selection)
+
+    def end_game(self, game, victory_point_count):
+        self.writer.end_game(game, victory_point_count)
+
+
+def play_recorded_games(directory, n_games, **writer_args):
+    '''Play and record games, returning what the writer was given.'''
+    played = []
+    with TrajectoryWriter(str(directory), **writer_args) as writer:
+        for game_id in range(n_games):
+            card_set = ('random', 'base', ['Witch', 'Moat', 'Cellar'])[
+                game_id % 3]
+            game = Game(n_players=2 + game_id % 3, card_set=card_set,
+                        seed=1000 + game_id)
+            writer.start_game(game, game_id=10 * game_id)
+            log = DecisionLog(writer)
+            game.recorder = log
+            scores = game.play_game()
+            played.append((game, [scores[str(player.player_id)]
+                                  for player in game.players],
+                           log.decisions))
+    return played
+
+
+@pytest.mark.parametrize('shard_size', [100, 1000000])
+def test_reader_returns_what_was_written(tmpdir, shard_size):
+    played = play_recorded_games(tmpdir, 9, shard_size=shard_size,
+                                 buffer_size=64)
+    reader = TrajectoryReader(str(tmpdir))
+    assert reader.n_games == len(played)
+    assert reader.n_decisions == sum(len(log) for _, _, log in played)
+    if shard_size == 100:
+        assert len(reader.shards) > 1
+
+    records = list(reader.iter_games())
+    for (game, scores, log), (record, decisions) in zip(played, records):
+        assert int(record['seed']) == game.seed
+        assert record['seeded'] == 1
+        assert int(record['n_players']) == game.n_players
+        assert int(record['n_turns']) == game.n_turns
+        assert bool(record['game_over']) == game.check_game_over()
+        assert record['scores'][:game.n_players].tolist() == scores
+        if isinstance(game.card_set, str):
+            assert CARD_SETS[record['card_set']] == game.card_set
+        else:
+            assert CARD_SETS[record['card_set']] == 'list'
+        assert set(kingdom_cards(record['kingdom'])) == \
+            set(game.supply_piles.cards) - set(BASE_CARDS)
+
+        assert len(decisions) == len(log)
+        seats = [player.player_id for player in game.players]
+        for decision, (turn, player_id, kind, options, selection,
+                       hand) in zip(decisions, log):
+            assert decision['game_id'] == record['game_id']
+            assert int(decision['turn']) == turn
+            assert seats[decision['seat']] == player_id
+            assert DECISION_KINDS[decision['kind']] == kind
+            assert sorted(decode_options(decision['options'])) == options
+            assert int(decision['n_options']) == len(options)
+            assert decode_options(1 << int(decision['choice'])) == \
+                [selection]
+            assert decision['observation'][-len(hand):].tolist() == hand
+
+
+def test_find_game(tmpdir):
+    play_recorded_games(tmpdir, 6, shard_size=100)
+    reader = TrajectoryReader(str(tmpdir))
+    for record, decisions in reader.iter_games():
+        found, found_decisions = reader.find_game(int(record['game_id']))
+        assert found == record
+        assert (found_decisions == decisions).all()
+    with pytest.raises(KeyError):
+        reader.find_game(1)
+
+
+def test_seed_out_of_range(tmpdir):
+    with TrajectoryWriter(str(tmpdir)) as writer:
+        with pytest.raises(ValueError):
+            writer.start_game(Game(n_players=2, seed=-1))
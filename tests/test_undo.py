@@ -0,0 +1,39 @@
+"""Tests for Game.apply_decision and Game.undo_decision."""
+import random
+
+
+def test_undo_restores_game(mid_game, game_state, play_decisions):
+    state = game_state(mid_game)
+    selections = play_decisions(mid_game, random.Random(1), 30)
+    for _ in selections:
+        mid_game.undo_decision()
+    assert game_state(mid_game) == state
+
+
+def test_undo_each_decision(mid_game, game_state, seed_agents):
+    rng = random.Random(2)
+    for step in range(30):
+        if mid_game.check_game_over():
+            break
+        options = mid_game.valid_decisions()
+        state = game_state(mid_game)
+        for selection in options:
+            seed_agents(mid_game, step)
+            mid_game.apply_decision(selection)
+            mid_game.undo_decision()
+            assert game_state(mid_game) == state
+            assert mid_game.valid_decisions() == options
+        seed_agents(mid_game, step)
+        mid_game.apply_decision(rng.choice(options))
+
+
+def test_replayed_decisions_match(mid_game, game_state, play_decisions):
+    clone = mid_game.clone()
+    selections = play_decisions(mid_game, random.Random(3), 30)
+    state = game_state(mid_game)
+    for _ in selections:
+        mid_game.undo_decision()
+    play_decisions(mid_game, random.Random(3), 30)
+    play_decisions(clone, random.Random(3), 30)
+    assert game_state(mid_game) == state
+    assert game_state(clone) == state
@@ -0,0 +1,50 @@
+"""Tests for the incremental hash of the game state, Game.state_hash."""
+import random
+
+from dominion.game import Game
+
+
+def test_hash_of_clone_and_restore(mid_game, play_decisions):
+    state_hash = mid_game.state_hash
+    snapshot = mid_game.snapshot()
+    assert mid_game.clone().state_hash == state_hash
+
+    play_decisions(mid_game, random.Random(1), 10)
+    mid_game.clear_undo_log()
+    mid_game.restore(snapshot)
+    assert mid_game.state_hash == state_hash
+
+
+def test_hash_after_undo(mid_game, play_decisions):
+    state_hash = mid_game.state_hash
+    selections = play_decisions(mid_game, random.Random(2), 20)
+    for _ in selections:
+        mid_game.undo_decision()
+    assert mid_game.state_hash == state_hash
+
+
+def test_incremental_hash_matches_recomputed(mid_game, play_decisions):
+    for _ in range(10):
+        play_decisions(mid_game, random.Random(3), 5)
+        mid_game.clear_undo_log()
+        recomputed = mid_game.clone()
+        recomputed.restore(mid_game.snapshot())
+        assert recomputed.state_hash == mid_game.state_hash
+
+
+def test_hash_ignores_pile_order(mid_game):
+    clone = mid_game.clone()
+    for player in clone.players:
+        random.Random(4).shuffle(player.deck.draw_pile)
+        player.deck.discard_pile.reverse()
+    assert clone.state_hash == mid_game.state_hash
+
+
+def test_hash_changes_with_state():
+    game = Game(n_players=2, card_set='base', seed=5)
+    hashes = set()
+    for _ in range(50):
+        hashes.add(game.state_hash)
+        options = game.valid_decisions()
+        game.apply_decision(options[-1])
+    assert len(hashes) == 50